@@ -1,15 +1,46 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from app.responses import FastJSONResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
-from app.database import get_db_connection
-import requests
+from datetime import datetime
 import os
+import re
+from app.bulk_import import import_attractions, iter_stream_lines
+from app.database import db_connection
+from app.http_cache import CACHE_MAX_AGE_ATTRACTIONS, cached_json, make_etag, not_modified
+from app.geo import HAVERSINE_SQL, cells_for_bbox, lng_ranges, radius_bbox
+from app.image_service import enqueue_image_fill
+from app.shared_cache import SharedCache
+from app.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, build_rows, decode_cursor, decode_offset_cursor, encode_offset_cursor, page,
+    parse_fields, select_list,
+)
 
 router = APIRouter(prefix="/attractions", tags=["Attractions"])
 
-UNSPLASH_ACCESS_KEY = os.getenv("UNSPLASH_ACCESS_KEY")
-UNSPLASH_URL = "https://api.unsplash.com/search/photos"
+# Rendered listing pages, shared across workers and dropped per country on
+# writes. The TTL bounds staleness from writes made outside this app.
+ATTRACTIONS_CACHE_SIZE = int(os.getenv("ATTRACTIONS_CACHE_SIZE", "128"))
+ATTRACTIONS_CACHE_TTL = float(os.getenv("ATTRACTIONS_CACHE_TTL", "60"))
+attractions_cache = SharedCache("attractions", maxsize=ATTRACTIONS_CACHE_SIZE, ttl=ATTRACTIONS_CACHE_TTL)
+# Countries (largest first) whose first listing page is loaded at startup; 0 disables
+ATTRACTIONS_WARMUP_COUNTRIES = int(os.getenv("ATTRACTIONS_WARMUP_COUNTRIES", "20"))
+SUMMARY_CACHE_KEY = "_summary"
+
+SPATIAL_MAX_LIMIT = 1000
+SPATIAL_MAX_RADIUS_KM = 1000
+
+SEARCH_MAX_LIMIT = 100
+# Ranked results are paged by offset; deep pages get expensive, so cap them
+SEARCH_MAX_OFFSET = int(os.getenv("SEARCH_MAX_OFFSET", "1000"))
+# pg_trgm word_similarity a name needs to count as a fuzzy match (0..1)
+SEARCH_FUZZY_THRESHOLD = float(os.getenv("SEARCH_FUZZY_THRESHOLD", "0.5"))
+SEARCH_MAX_TERMS = 8
+# Matches ranked per full-text query. Very common words can match a large
+# share of the table; ranking is then over the N lowest-id matches only
+# (the same N on every page) and the response says it was truncated.
+SEARCH_RANK_CANDIDATES = int(os.getenv("SEARCH_RANK_CANDIDATES", "5000"))
 
 
 # ---------------- Pydantic model ----------------
@@ -26,23 +57,10 @@ class AttractionCreate(BaseModel):
     status: Optional[str] = "available"
 
 
-# ---------------- Helper: Fetch Unsplash images ----------------
-def fetch_images_from_unsplash(query: str, per_page: int = 4):
-    if not UNSPLASH_ACCESS_KEY:
-        return []
-    try:
-        response = requests.get(
-            UNSPLASH_URL,
-            headers={"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"},
-            params={"query": query, "per_page": per_page}
-        )
-        if response.status_code != 200:
-            return []
-
-        data = response.json()
-        return [img["urls"]["regular"] for img in data.get("results", [])]
-    except Exception:
-        return []
+def invalidate_country(country: str):
+    """Drop a country's cached listing pages and the summary after a write."""
+    attractions_cache.invalidate(f"{country}:")
+    attractions_cache.invalidate(SUMMARY_CACHE_KEY)
 
 
 # ---------------- Add Attraction ----------------
@@ -50,90 +68,526 @@ def fetch_images_from_unsplash(query: str, per_page: int = 4):
 def add_attraction(attraction: AttractionCreate):
     """
     Add a new attraction to the database.
-    If no images are provided, fetch from Unsplash automatically.
+    If no images are provided, they are fetched from Unsplash in the background.
+    """
+    images = [attraction.image1, attraction.image2, attraction.image3, attraction.image4]
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            cur.execute("""
+                INSERT INTO attractions (country, name, lat, lng, description, image1, image2, image3, image4, status)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (country, name) DO NOTHING
+                RETURNING id;
+            """, (
+                attraction.country, attraction.name, attraction.lat, attraction.lng,
+                attraction.description, images[0], images[1], images[2], images[3], attraction.status
+            ))
+            inserted = cur.fetchone()
+
+            if not inserted:
+                conn.rollback()
+                cur.execute("SELECT id FROM attractions WHERE country=%s AND name=%s;", (attraction.country, attraction.name))
+                existing = cur.fetchone()
+                return FastJSONResponse({"message": "Attraction already exists", "id": existing[0] if existing else None})
+
+            new_id = inserted[0]
+            conn.commit()
+            invalidate_country(attraction.country)
+
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=f"Error adding attraction: {str(e)}")
+
+        finally:
+            cur.close()
+
+    # Fill image1..image4 from Unsplash without blocking the insert
+    images_pending = not any(images) and enqueue_image_fill(new_id, attraction.name)
+    return FastJSONResponse({"message": "Attraction added successfully", "id": new_id, "images_pending": images_pending})
+
+
+# ---------------- Bulk Import ----------------
+@router.post("/bulk")
+async def bulk_import(request: Request, format: Optional[str] = Query(None, pattern="^(jsonl|csv)$")):
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
+    Stream-import attractions from a JSON Lines or CSV request body.
+    Existing (country, name) pairs are skipped. The format defaults to CSV
+    when the Content-Type is text/csv and to JSON Lines otherwise.
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "jsonl")
+    chunks = request.stream()
+
+    def run():
+        with db_connection() as conn:
+            result = import_attractions(conn, iter_stream_lines(chunks), fmt)
+        if result["inserted"]:
+            attractions_cache.invalidate()  # may span many countries
+        return result
 
     try:
-        cur.execute("SELECT id FROM attractions WHERE country=%s AND name=%s;", (attraction.country, attraction.name))
-        existing = cur.fetchone()
-        if existing:
-            return JSONResponse({"message": "Attraction already exists", "id": existing[0]})
-
-        # Fetch Unsplash images if not given
-        images = [attraction.image1, attraction.image2, attraction.image3, attraction.image4]
-        if not any(images):
-            fetched_images = fetch_images_from_unsplash(attraction.name)
-            images = fetched_images + [None] * (4 - len(fetched_images))
-
-        cur.execute("""
-            INSERT INTO attractions (country, name, lat, lng, description, image1, image2, image3, image4, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id;
-        """, (
-            attraction.country, attraction.name, attraction.lat, attraction.lng,
-            attraction.description, images[0], images[1], images[2], images[3], attraction.status
-        ))
-
-        new_id = cur.fetchone()[0]
-        conn.commit()
-        return JSONResponse({"message": "Attraction added successfully", "id": new_id})
+        result = await run_in_threadpool(run)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing attractions: {str(e)}")
+    return FastJSONResponse({"message": "Import finished", **result})
+
+
+# ---------------- Spatial queries ----------------
+def _find_near(center_lat, center_lng, bbox, limit, radius_km=None):
+    """
+    Attractions inside ``bbox`` (optionally also within ``radius_km`` of the
+    center), nearest to the center first. The grid_cell index narrows the
+    scan to the cells overlapping the box.
+    """
+    min_lat, min_lng, max_lat, max_lng = bbox
+    params = {"lat": center_lat, "lng": center_lng, "min_lat": min_lat, "max_lat": max_lat,
+              "radius": radius_km, "limit": limit}
 
+    lng_clauses = []
+    for i, (lo, hi) in enumerate(lng_ranges(min_lng, max_lng)):
+        params[f"lng_lo{i}"], params[f"lng_hi{i}"] = lo, hi
+        lng_clauses.append(f"lng BETWEEN %(lng_lo{i})s AND %(lng_hi{i})s")
+    clauses = ["lat BETWEEN %(min_lat)s AND %(max_lat)s", f"({' OR '.join(lng_clauses)})"]
+
+    cells = cells_for_bbox(min_lat, min_lng, max_lat, max_lng)
+    if cells is not None:
+        params["cells"] = cells
+        clauses.append("grid_cell = ANY(%(cells)s)")
+
+    with db_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"""
+                SELECT * FROM (
+                    SELECT id, country, name, lat, lng, description, image1, image2, image3, image4, status,
+                           {HAVERSINE_SQL} AS distance_km
+                    FROM attractions
+                    WHERE {' AND '.join(clauses)}
+                ) nearby
+                {"WHERE distance_km <= %(radius)s" if radius_km is not None else ""}
+                ORDER BY distance_km
+                LIMIT %(limit)s;
+            """, params)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+
+    return [{
+        "id": r[0],
+        "country": r[1],
+        "name": r[2],
+        "lat": r[3],
+        "lng": r[4],
+        "description": r[5],
+        "images": [img for img in r[6:10] if img],
+        "status": r[10],
+        "distance_km": round(r[11], 3),
+    } for r in rows]
+
+
+@router.get("/nearby")
+def get_attractions_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(50, gt=0, le=SPATIAL_MAX_RADIUS_KM),
+    limit: int = Query(100, ge=1, le=SPATIAL_MAX_LIMIT),
+):
+    """
+    Attractions within ``radius_km`` of a point, nearest first.
+    """
+    try:
+        attractions = _find_near(lat, lng, radius_bbox(lat, lng, radius_km), limit, radius_km)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching attractions: {str(e)}")
+    return FastJSONResponse({"attractions": attractions, "count": len(attractions)})
+
+
+@router.get("/within")
+def get_attractions_within(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lng: float = Query(..., ge=-180, le=180),
+    limit: int = Query(200, ge=1, le=SPATIAL_MAX_LIMIT),
+):
+    """
+    Attractions inside a map viewport, nearest to its center first.
+    ``min_lng > max_lng`` denotes a viewport crossing the antimeridian.
+    """
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must not exceed max_lat")
+
+    center_lat = (min_lat + max_lat) / 2
+    center_lng = (min_lng + max_lng) / 2 if min_lng <= max_lng else ((min_lng + max_lng + 360) / 2 + 180) % 360 - 180
+    try:
+        attractions = _find_near(center_lat, center_lng, (min_lat, min_lng, max_lat, max_lng), limit)
     except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Error adding attraction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fetching attractions: {str(e)}")
+    return FastJSONResponse({"attractions": attractions, "count": len(attractions)})
+
 
-    finally:
-        cur.close()
-        conn.close()
+# ---------------- Search ----------------
+_trigram_available = None
+
+
+def search_terms(q: str) -> list:
+    """Lowercased words of a search query, punctuation stripped."""
+    return re.findall(r"[^\W_]+", q.lower())[:SEARCH_MAX_TERMS]
+
+
+def prefix_tsquery(terms: list) -> str:
+    """
+    to_tsquery input requiring every term, the last one as a prefix
+    ("eiffel tow" finds "Eiffel Tower" while the user is still typing).
+    Only the last term is a prefix: short prefixes expand to many lexemes.
+    """
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+def _has_trigram(cur) -> bool:
+    global _trigram_available
+    if _trigram_available is None:
+        cur.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm');")
+        _trigram_available = cur.fetchone()[0]
+    return _trigram_available
+
+
+def search_attractions(q: str, country=None, limit: int = 20, offset: int = 0, mode=None):
+    """
+    Ranked attractions matching ``q``, as (results, mode, truncated). Full-text search
+    over name and description first; when that finds nothing on the first
+    page and pg_trgm is installed, fall back to fuzzy matching on names so
+    typos still find something. ``mode`` pins later pages to the first
+    page's choice. ``truncated`` is set when more than SEARCH_RANK_CANDIDATES
+    rows matched and only those were ranked.
+    """
+    terms = search_terms(q)
+    params = {"tsquery": prefix_tsquery(terms), "q": " ".join(terms), "country": country,
+              "limit": limit, "offset": offset}
+    country_clause = "AND country = %(country)s" if country else ""
+    columns = "id, country, name, lat, lng, description, image1, image2, image3, image4, status"
+
+    with db_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        try:
+            rows = []
+            truncated = False
+            if mode != "fuzzy" or not _has_trigram(cur):
+                mode = "fulltext"
+                # Rank on (id, search_vector) only; full rows are read for the page alone.
+                # Candidates are taken in id order so every page ranks the same set;
+                # one extra is read to tell whether the cap cut anything off.
+                cur.execute(f"""
+                    WITH matches AS (
+                        SELECT id, search_vector FROM attractions
+                        WHERE search_vector @@ to_tsquery('english', %(tsquery)s) {country_clause}
+                        ORDER BY id
+                        LIMIT %(candidates)s + 1
+                    )
+                    SELECT {columns}, ranked.score, ranked.matched
+                    FROM (
+                        SELECT id, ts_rank_cd(search_vector, query) AS score, (SELECT count(*) FROM matches) AS matched
+                        FROM (SELECT * FROM matches ORDER BY id LIMIT %(candidates)s) candidates,
+                             to_tsquery('english', %(tsquery)s) query
+                        ORDER BY score DESC, id
+                        LIMIT %(limit)s OFFSET %(offset)s
+                    ) ranked
+                    JOIN attractions USING (id)
+                    ORDER BY ranked.score DESC, id;
+                """, {**params, "candidates": SEARCH_RANK_CANDIDATES})
+                rows = cur.fetchall()
+                truncated = bool(rows) and rows[0][12] > SEARCH_RANK_CANDIDATES
+            if mode == "fuzzy" or (not rows and not offset and _has_trigram(cur)):
+                mode = "fuzzy"
+                cur.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true);",
+                            (str(SEARCH_FUZZY_THRESHOLD),))
+                cur.execute(f"""
+                    SELECT {columns}, word_similarity(%(q)s, name) AS score
+                    FROM attractions
+                    WHERE %(q)s <%% name {country_clause}
+                    ORDER BY score DESC, id
+                    LIMIT %(limit)s OFFSET %(offset)s;
+                """, params)
+                rows = cur.fetchall()
+            conn.commit()
+        finally:
+            cur.close()
+
+    return [{
+        "id": r[0],
+        "country": r[1],
+        "name": r[2],
+        "lat": r[3],
+        "lng": r[4],
+        "description": r[5],
+        "images": [img for img in r[6:10] if img],
+        "status": r[10],
+        "score": round(r[11], 4),
+    } for r in rows], mode, truncated
+
+
+@router.get("/search")
+def search(
+    q: str = Query(..., min_length=2, max_length=200),
+    country: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = Query(None),
+):
+    """
+    Search attractions across countries by name and description, best
+    match first. Words match as prefixes; typos fall back to fuzzy name
+    matching (``mode`` says which was used). Page with ``next_cursor``.
+    ``truncated`` is true when a very common query matched more rows than
+    are ranked (SEARCH_RANK_CANDIDATES).
+    """
+    if not search_terms(q):
+        raise HTTPException(status_code=400, detail="Query must contain letters or digits")
+    offset, state = decode_offset_cursor(cursor, SEARCH_MAX_OFFSET)
+    try:
+        results, mode, truncated = search_attractions(q, country, limit + 1, offset, state.get("mode"))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching attractions: {str(e)}")
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        if offset + limit <= SEARCH_MAX_OFFSET:
+            next_cursor = encode_offset_cursor(offset + limit, mode=mode)
+    return FastJSONResponse({"query": q, "mode": mode, "results": results, "truncated": truncated,
+                             "next_cursor": next_cursor})
+
+
+# ---------------- Per-country Summary ----------------
+def fetch_summaries() -> list:
+    """
+    Count, bounding box and centroid per country from attraction_summaries
+    (kept current by triggers, see migration 9), largest country first.
+    """
+    with db_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT country, attraction_count, min_lat, min_lng, max_lat, max_lng,
+                       degrees(atan2(sum_z, sqrt(sum_x * sum_x + sum_y * sum_y))), degrees(atan2(sum_y, sum_x)),
+                       last_modified
+                FROM attraction_summaries
+                ORDER BY attraction_count DESC, country;
+            """)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+
+    return [{
+        "country": r[0],
+        "count": r[1],
+        "bbox": [r[2], r[3], r[4], r[5]],
+        "centroid": {"lat": round(r[6], 5), "lng": round(r[7], 5)},
+        "last_modified": r[8].isoformat(),
+    } for r in rows]
+
+
+def _summary_signature() -> tuple:
+    """(countries, latest last_modified) on the primary; cheap next to the full summary."""
+    with db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT count(*), max(last_modified) FROM attraction_summaries;")
+            signature = cur.fetchone()
+        finally:
+            cur.close()
+    return signature
+
+
+def _summary_entry() -> dict:
+    """
+    The cached summary response. Built from a replica, but only cached when
+    it matches the primary's signature: a lagging replica's copy would
+    otherwise be served to every client until the TTL.
+    """
+    entry = attractions_cache.get(SUMMARY_CACHE_KEY)
+    if entry is None:
+        summaries = fetch_summaries()
+        content = {"countries": summaries, "count": len(summaries)}
+        entry = {"etag": make_etag("summary", *(f"{s['country']}@{s['last_modified']}" for s in summaries)),
+                 "content": content}
+        seen = (len(summaries), max((datetime.fromisoformat(s["last_modified"]) for s in summaries), default=None))
+        if seen == _summary_signature():
+            attractions_cache.set(SUMMARY_CACHE_KEY, entry)
+    return entry
+
+
+@router.get("/summary")
+def get_attraction_summaries(request: Request):
+    """
+    Attraction count, bounding box ``[min_lat, min_lng, max_lat, max_lng]``
+    and centroid for every country that has attractions, in one call.
+    Enough to draw the world map without listing each country.
+    """
+    try:
+        entry = _summary_entry()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching attraction summaries: {str(e)}")
+    return cached_json(request, entry["content"], CACHE_MAX_AGE_ATTRACTIONS, etag=entry["etag"])
 
 
 # ---------------- Get Attractions by Country ----------------
+# Output field -> columns selected for it
+ATTRACTION_COLUMNS = {
+    "id": ("id",),
+    "name": ("name",),
+    "lat": ("lat",),
+    "lng": ("lng",),
+    "description": ("description",),
+    "images": ("image1", "image2", "image3", "image4"),
+    "status": ("status",),
+}
+ATTRACTION_CONVERT = {"images": lambda imgs: [img for img in imgs if img]}
+
+
+def _read_page(cur, country_name: str, after, limit: int, selected: list):
+    # Keyset pagination over the (country, id) index
+    cur.execute(f"""
+        SELECT {select_list(selected, ATTRACTION_COLUMNS)}
+        FROM attractions
+        WHERE country=%s AND id > %s
+        ORDER BY id
+        LIMIT %s;
+    """, (country_name, after or 0, limit + 1))
+    return page(build_rows(cur.fetchall(), selected, ATTRACTION_COLUMNS, ATTRACTION_CONVERT), limit)
+
+
+def fetch_attractions_page(country_name: str, after=None, limit: int = DEFAULT_PAGE_SIZE, selected=None):
+    """
+    One page of a country's attractions ordered by id, starting after row id
+    ``after``. Returns (attractions, next_cursor).
+    """
+    selected = selected or list(ATTRACTION_COLUMNS)
+    with db_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        try:
+            return _read_page(cur, country_name, after, limit, selected)
+        finally:
+            cur.close()
+
+
+def fetch_page_and_version(country_name: str, after, limit: int, selected: list):
+    """
+    ``fetch_attractions_page`` plus the country's version, read from one
+    snapshot of the same (possibly replica) server. Returns
+    (attractions, next_cursor, version).
+    """
+    with db_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;")
+            cur.execute("SELECT version FROM attraction_versions WHERE country=%s;", (country_name,))
+            row = cur.fetchone()
+            attractions, next_cursor = _read_page(cur, country_name, after, limit, selected)
+            conn.commit()
+        finally:
+            cur.close()
+    return attractions, next_cursor, row[0] if row else 0
+
+
+def attractions_version(country_name: str, primary: bool = False) -> int:
+    """Change counter for a country's attractions (see migration 7); 0 if never written."""
+    with db_connection(readonly=not primary) as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT version FROM attraction_versions WHERE country=%s;", (country_name,))
+            row = cur.fetchone()
+        finally:
+            cur.close()
+    return row[0] if row else 0
+
+
+def _page_cache_key(country_name: str, after, limit: int, selected: list) -> str:
+    return f"{country_name}:{after}:{limit}:{','.join(selected)}"
+
+
+def _page_etag(country_name: str, version: int, after, limit: int, selected: list) -> str:
+    return make_etag("attractions", country_name, version, after, limit, ",".join(selected))
+
+
+def _load_page(country_name: str, after, limit: int, selected: list, version: int) -> dict:
+    """
+    Read one listing page (from a replica when there is one) and store it
+    in ``attractions_cache``. ``version`` is the primary's: a page that a
+    lagging replica built from an older version is returned but not cached,
+    since it would be served to every client until the TTL. A write can
+    also land after ``version`` was read and have its invalidation run
+    before the page is stored, so the primary's version is read again
+    afterwards and the page dropped if it moved on.
+    """
+    attractions, next_cursor, seen = fetch_page_and_version(country_name, after, limit, selected)
+    if not attractions and after is None:
+        content = {
+            "country": country_name,
+            "attractions": [],
+            "next_cursor": None,
+            "message": "No attractions available yet for this country"
+        }
+    else:
+        content = {"country": country_name, "attractions": attractions, "next_cursor": next_cursor}
+    entry = {"etag": _page_etag(country_name, seen, after, limit, selected), "content": content}
+    if seen != version:
+        return entry
+    key = _page_cache_key(country_name, after, limit, selected)
+    attractions_cache.set(key, entry)
+    if attractions_version(country_name, primary=True) != version:
+        attractions_cache.invalidate(key)
+    return entry
+
+
+def warm_attractions_cache(top_n: int = ATTRACTIONS_WARMUP_COUNTRIES) -> int:
+    """
+    Load the summaries and the default first page of the ``top_n`` largest
+    countries into ``attractions_cache``, so the first requests after a
+    deploy are not cold. Returns the number of countries loaded.
+    """
+    countries = [s["country"] for s in _summary_entry()["content"]["countries"][:top_n]]
+    selected = list(ATTRACTION_COLUMNS)
+    for country in countries:
+        _load_page(country, None, DEFAULT_PAGE_SIZE, selected, attractions_version(country, primary=True))
+    return len(countries)
+
+
 @router.get("/{country_name}")
-def get_attractions(country_name: str):
+def get_attractions(
+    request: Request,
+    country_name: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated subset, e.g. id,name,lat,lng"),
+):
     """
-    Fetch all attractions for a specific country.
+    Fetch attractions for a specific country, one page at a time (ordered
+    by id). Follow ``next_cursor`` until it is null.
     Returns a clear JSON even if no data exists.
+
+    The ETag comes from the country's version counter, so a matching
+    If-None-Match is answered with 304 without reading any attractions.
+    Rendered pages are kept in ``attractions_cache`` with their ETag.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
+    after = decode_cursor(cursor)
+    selected = parse_fields(fields, ATTRACTION_COLUMNS)
+    cached = attractions_cache.get(_page_cache_key(country_name, after, limit, selected))
+    if cached is not None:
+        return cached_json(request, cached["content"], CACHE_MAX_AGE_ATTRACTIONS, etag=cached["etag"])
 
     try:
-        cur.execute("""
-            SELECT id, name, lat, lng, description, image1, image2, image3, image4, status
-            FROM attractions
-            WHERE country=%s;
-        """, (country_name,))
-        rows = cur.fetchall()
-
-        if not rows:
-            return JSONResponse({
-                "country": country_name,
-                "attractions": [],
-                "message": "No attractions available yet for this country"
-            })
-
-        attractions = []
-        for r in rows:
-            attractions.append({
-                "id": r[0],
-                "name": r[1],
-                "lat": r[2],
-                "lng": r[3],
-                "description": r[4],
-                "images": [img for img in r[5:9] if img],
-                "status": r[9]
-            })
-
-        return JSONResponse({"country": country_name, "attractions": attractions})
-
+        # Read the version before the rows, so the ETag is never newer than the page
+        version = attractions_version(country_name, primary=True)
+        unchanged = not_modified(request, _page_etag(country_name, version, after, limit, selected),
+                                 CACHE_MAX_AGE_ATTRACTIONS)
+        if unchanged:
+            return unchanged
+        entry = _load_page(country_name, after, limit, selected, version)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching attractions: {str(e)}")
-
-    finally:
-        cur.close()
-        conn.close()
+    return cached_json(request, entry["content"], CACHE_MAX_AGE_ATTRACTIONS, etag=entry["etag"])
 
 
 # ---------------- Delete Attraction ----------------
@@ -142,24 +596,23 @@ def delete_attraction(attraction_id: int):
     """
     Delete an attraction by ID.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
+    with db_connection() as conn:
+        cur = conn.cursor()
 
-    try:
-        cur.execute("SELECT id FROM attractions WHERE id=%s;", (attraction_id,))
-        if not cur.fetchone():
-            raise HTTPException(status_code=404, detail="Attraction not found")
-
-        cur.execute("DELETE FROM attractions WHERE id=%s RETURNING id;", (attraction_id,))
-        deleted = cur.fetchone()
-        conn.commit()
+        try:
+            cur.execute("DELETE FROM attractions WHERE id=%s RETURNING id, country;", (attraction_id,))
+            deleted = cur.fetchone()
+            conn.commit()
+            if deleted:
+                invalidate_country(deleted[1])
 
-        return JSONResponse({"message": f"Attraction {deleted[0]} deleted successfully", "id": deleted[0]})
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=f"Error deleting attraction: {str(e)}")
 
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Error deleting attraction: {str(e)}")
+        finally:
+            cur.close()
 
-    finally:
-        cur.close()
-        conn.close()
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Attraction not found")
+    return FastJSONResponse({"message": f"Attraction {deleted[0]} deleted successfully", "id": deleted[0]})
@@ -1,15 +1,14 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, status
 from datetime import datetime, timedelta
-from app.database import get_db_connection
+from app.database import db_connection
+from app.hashing import check_password, hash_password, hash_stats
+from app.security import JWT_SECRET, ALGORITHM, auth_stats, bearer_token, revoke_token, verify_token
 from pydantic import BaseModel
-import bcrypt
+from starlette.concurrency import run_in_threadpool
 import jwt
-import os
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-JWT_SECRET = os.environ["JWT_SECRET"] # fallback for local
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 6
 
 
@@ -28,43 +27,61 @@ class TokenInput(BaseModel):
     access_token: str
 
 
-# ---------- REGISTER ----------
-@router.post("/register", status_code=status.HTTP_201_CREATED)
-def register_user(user: RegisterRequest):
-    conn = get_db_connection()
-    cur = conn.cursor()
+# ---------- DB helpers (run in the threadpool) ----------
+def _email_taken(email: str) -> bool:
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM users WHERE email = %s;", (email,))
+        exists = cur.fetchone()
+        cur.close()
+    return exists is not None
+
+
+def _insert_user(email: str, password_hash: str):
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO users (email, password_hash) VALUES (%s, %s) ON CONFLICT (email) DO NOTHING RETURNING id;",
+            (email, password_hash),
+        )
+        inserted = cur.fetchone()
+        conn.commit()
+        cur.close()
+    return inserted
+
 
-    cur.execute("SELECT * FROM users WHERE email = %s;", (user.email,))
-    if cur.fetchone():
+def _load_credentials(email: str):
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, password_hash FROM users WHERE email = %s;", (email,))
+        user_data = cur.fetchone()
         cur.close()
-        conn.close()
+    return user_data
+
+
+# ---------- REGISTER ----------
+@router.post("/register", status_code=status.HTTP_201_CREATED)
+async def register_user(user: RegisterRequest):
+    if await run_in_threadpool(_email_taken, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_pw = bcrypt.hashpw(user.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-    cur.execute("INSERT INTO users (email, password_hash) VALUES (%s, %s);", (user.email, hashed_pw))
-    conn.commit()
+    # Hashing runs in the bcrypt process pool, not on a request thread
+    hashed_pw = await hash_password(user.password)
 
-    cur.close()
-    conn.close()
+    if not await run_in_threadpool(_insert_user, user.email, hashed_pw):
+        raise HTTPException(status_code=400, detail="Email already registered")
     return {"message": "User registered successfully ✅"}
 
 
 # ---------- LOGIN ----------
 @router.post("/login")
-def login_user(user: LoginRequest):
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    cur.execute("SELECT id, password_hash FROM users WHERE email = %s;", (user.email,))
-    user_data = cur.fetchone()
-    cur.close()
-    conn.close()
-
+async def login_user(user: LoginRequest):
+    user_data = await run_in_threadpool(_load_credentials, user.email)
     if not user_data:
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
     user_id, password_hash = user_data
-    if not bcrypt.checkpw(user.password.encode("utf-8"), password_hash.encode("utf-8")):
+    if not await check_password(user.password, password_hash):
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
     # Generate JWT token
@@ -86,15 +103,24 @@ def get_current_user(token_input: TokenInput):
     Decode access token and return user info.
     Used in Swagger or internal calls.
     """
-    jwt_token = token_input.access_token.strip()
-
-    try:
-        payload = jwt.decode(jwt_token, JWT_SECRET, algorithms=[ALGORITHM])
-        user_id = payload.get("user_id")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-        return {"user_id": user_id}
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    payload = verify_token(token_input.access_token.strip())
+    user_id = payload.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    return {"user_id": user_id}
+
+
+# ---------- LOGOUT ----------
+@router.post("/logout")
+def logout_user(authorization: str = Header(...)):
+    """
+    Revoke the Bearer token so it is rejected until it expires.
+    """
+    revoke_token(bearer_token(authorization))
+    return {"message": "Logged out"}
+
+
+# ---------- TOKEN CACHE STATS ----------
+@router.get("/cache/stats")
+def get_auth_stats():
+    return {**auth_stats(), "hashing": hash_stats()}
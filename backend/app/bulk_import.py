@@ -0,0 +1,187 @@
+import codecs
+import csv
+import io
+import json
+import os
+
+import anyio.from_thread
+
+# Rows buffered in memory before each COPY into the staging table
+BULK_BATCH_ROWS = int(os.getenv("BULK_BATCH_ROWS", "5000"))
+MAX_REPORTED_ERRORS = 10
+
+COLUMNS = ("country", "name", "lat", "lng", "description", "image1", "image2", "image3", "image4", "status")
+# VARCHAR limits of the attractions table; longer values would fail the whole COPY
+MAX_LENGTHS = {"country": 100, "name": 200, "status": 50}
+OPTIONAL_COLUMNS = ("description", "image1", "image2", "image3", "image4")
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+# ---------------- Parsing ----------------
+def iter_jsonl(lines):
+    for lineno, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield lineno, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield lineno, InvalidRecord(f"invalid JSON: {e.msg}")
+
+
+def iter_csv(lines):
+    reader = csv.DictReader(lines)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _text(record, col):
+    value = record.get(col)
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        raise InvalidRecord(f"{col} must be a string")
+    if "\x00" in value:
+        raise InvalidRecord(f"{col} contains a NUL character")
+    value = value.strip() if col in MAX_LENGTHS else value
+    if col in MAX_LENGTHS and len(value) > MAX_LENGTHS[col]:
+        raise InvalidRecord(f"{col} is longer than {MAX_LENGTHS[col]} characters")
+    return value
+
+
+def to_row(record) -> tuple:
+    """Validate one parsed record and return it in COLUMNS order."""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRecord("expected an object")
+
+    country = _text(record, "country")
+    name = _text(record, "name")
+    if not country or not name:
+        raise InvalidRecord("country and name are required")
+    try:
+        lat = float(record["lat"])
+        lng = float(record["lng"])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidRecord("lat and lng must be numbers")
+    # Also rejects nan and inf, which compare false
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise InvalidRecord("lat and lng must be within -90..90 and -180..180")
+
+    optional = [_text(record, col) for col in OPTIONAL_COLUMNS]
+    status = _text(record, "status") or "available"
+    return (country, name, lat, lng, *optional, status)
+
+
+def iter_stream_lines(chunks):
+    """
+    Turn an async iterator of byte chunks (e.g. ``request.stream()``) into a
+    sync iterator of text lines. Must run in a worker thread started by anyio.
+
+    Lines end at "\n" only (a "\r" before it is dropped), like the CLI
+    reading the file: ``str.splitlines`` would also break on U+2028 and
+    other separators that JSON strings may contain.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    while True:
+        try:
+            chunk = anyio.from_thread.run(chunks.__anext__)
+        except StopAsyncIteration:
+            break
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield (line[:-1] if line.endswith("\r") else line) + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+# ---------------- Loading ----------------
+def _copy_batch(cur, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    # COPY csv treats unquoted empty fields as NULL
+    writer.writerows(["" if v is None else v for v in row] for row in rows)
+    buf.seek(0)
+    cur.copy_expert(f"COPY attractions_staging ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def import_attractions(conn, lines, fmt="jsonl", batch_rows=None):
+    """
+    Stream attractions from ``lines`` (JSON Lines or CSV with a header) into
+    the attractions table. Rows are COPYed into a temporary staging table in
+    batches, then inserted with one ON CONFLICT DO NOTHING statement that
+    skips (country, name) pairs already present or repeated in the input.
+    Memory use is bounded by the batch size. Runs in a single transaction.
+    """
+    batch_rows = batch_rows or BULK_BATCH_ROWS
+    records = iter_csv(lines) if fmt == "csv" else iter_jsonl(lines)
+
+    received = 0
+    invalid = 0
+    errors = []
+    batch = []
+
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TEMP TABLE attractions_staging (
+                seq BIGSERIAL,
+                country VARCHAR(100) NOT NULL,
+                name VARCHAR(200) NOT NULL,
+                lat FLOAT NOT NULL,
+                lng FLOAT NOT NULL,
+                description TEXT,
+                image1 TEXT,
+                image2 TEXT,
+                image3 TEXT,
+                image4 TEXT,
+                status VARCHAR(50)
+            ) ON COMMIT DROP;
+        """)
+
+        for lineno, record in records:
+            received += 1
+            try:
+                batch.append(to_row(record))
+            except InvalidRecord as e:
+                invalid += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": lineno, "error": str(e)})
+                continue
+            if len(batch) >= batch_rows:
+                _copy_batch(cur, batch)
+                batch = []
+        if batch:
+            _copy_batch(cur, batch)
+
+        # First occurrence wins for duplicates inside the input
+        cur.execute(f"""
+            INSERT INTO attractions ({', '.join(COLUMNS)})
+            SELECT {', '.join(COLUMNS)} FROM (
+                SELECT DISTINCT ON (country, name) *
+                FROM attractions_staging
+                ORDER BY country, name, seq
+            ) s
+            ON CONFLICT (country, name) DO NOTHING;
+        """)
+        inserted = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return {
+        "received": received,
+        "inserted": inserted,
+        "skipped": received - invalid - inserted,
+        "invalid": invalid,
+        "errors": errors,
+    }
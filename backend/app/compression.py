@@ -0,0 +1,173 @@
+import os
+import zlib
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Responses smaller than this go out uncompressed (not worth the CPU)
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# Mid levels: most of the size win for a fraction of the max-level CPU
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# Bodies at least this large are compressed in a worker thread, off the event loop
+COMPRESS_THREAD_MIN_SIZE = 128 * 1024
+# Already compressed or streamed media; compressing these again only costs CPU
+EXCLUDED_MEDIA_TYPES = ("image/avif", "image/gif", "image/jpeg", "image/png", "image/webp", "audio/", "video/",
+                        "font/woff", "application/zip", "application/gzip", "application/x-gzip",
+                        "application/grpc", "text/event-stream")
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """{coding: q} from an Accept-Encoding header."""
+    codings = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding.strip().lower()] = q
+    return codings
+
+
+def choose_encoding(header: str):
+    """Preferred supported coding the client accepts: br, then gzip, else None."""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = None
+    for coding in supported:
+        q = accepted.get(coding, wildcard)
+        if q > 0 and (best is None or q > best[1]):
+            best = (coding, q)
+    return best[0] if best else None
+
+
+class CompressionResponder:
+    """
+    Compress one response with ``encoding`` ("br", "gzip", or None to only
+    add Vary). The start message is held back until the first body chunk
+    shows whether the response is big enough to be worth compressing.
+    Pre-encoded, partial and excluded media type responses pass through.
+    """
+
+    def __init__(self, app, encoding, minimum_size, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.send = None
+        self.start = None
+        self.passthrough = False
+        self.started = False
+        self._compressor = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] == 206
+                or media_type.startswith(EXCLUDED_MEDIA_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+        if kind != "http.response.body" or self.passthrough:
+            if kind == "http.response.pathsend" and not self.passthrough:
+                await self.send(self.start)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.started:
+            message["body"] = await self.compress(body, more_body)
+            await self.send(message)
+            return
+
+        self.started = True
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        if self.encoding and (more_body or len(body) >= self.minimum_size):
+            message["body"] = await self.compress(body, more_body)
+            headers["Content-Encoding"] = self.encoding
+            if more_body or self.start.get("trailers", False):
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(message["body"]))
+        await self.send(self.start)
+        await self.send(message)
+
+    async def compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= COMPRESS_THREAD_MIN_SIZE:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self.encoding == "br":
+            if self._compressor is None:
+                self._compressor = brotli.Compressor(quality=self.brotli_quality)
+            out = self._compressor.process(body)
+            return out + (self._compressor.flush() if more_body else self._compressor.finish())
+        if self._compressor is None:
+            self._compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        out = self._compressor.compress(body)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses of at least ``minimum_size`` bytes with brotli (when
+    the ``brotli`` package is installed) or gzip, whichever the client
+    prefers. Small, pre-encoded and already compressed media responses
+    go out as they are; every other response gets ``Vary: Accept-Encoding``.
+
+    A compressed body is a different representation, so a strong ETag
+    is turned into a weak one (as nginx does). If-None-Match still
+    matches because it uses weak comparison.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_SIZE, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        responder = CompressionResponder(
+            self.app, encoding, self.minimum_size, gzip_level=self.gzip_level, brotli_quality=self.brotli_quality
+        )
+
+        async def send_weak_etag(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if "content-encoding" in headers and etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+            await send(message)
+
+        await responder(scope, receive, send_weak_etag)
@@ -1,16 +1,547 @@
+import contextvars
+import hashlib
+import itertools
 import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
 import psycopg2
+from psycopg2 import extensions
+
+from app.metrics import record_db_query
+from app.shared_cache import SharedCache
 
 # Get database URL from environment variable
 DATABASE_URL = os.environ.get("DATABASE_URL")
+# Read replicas (comma-separated URLs). Read-only blocks go round-robin to the
+# healthy ones; writes, and a client's reads right after its writes, to the primary.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# A replica that failed is left out of rotation for this long, then tried again
+DB_REPLICA_RETRY_AFTER = float(os.getenv("DB_REPLICA_RETRY_AFTER", "10"))
+# Replicas more than DB_REPLICA_MAX_LAG seconds behind are left out too;
+# lag is measured at most every DB_REPLICA_CHECK_INTERVAL seconds per replica
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+# After a client commits, its reads stay on the primary for this long
+DB_READ_YOUR_WRITES_WINDOW = float(os.getenv("DB_READ_YOUR_WRITES_WINDOW", "5"))
+# Print every routing decision (replicas leaving/rejoining rotation are always printed)
+DB_ROUTING_LOG = os.getenv("DB_ROUTING_LOG", "") == "1"
+
+# Pool settings (all overridable from the environment)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Connections idle for longer than this are pinged before being handed out
+DB_POOL_HEALTHCHECK_AFTER = float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout."""
+
+
+class TimedCursor(extensions.cursor):
+    """Cursor that reports each statement's duration to app.metrics."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+
+class TrackedConnection(extensions.connection):
+    """Connection that remembers whether anything was committed on it (for read-your-writes)."""
 
-def get_db_connection():
-    if not DATABASE_URL:
+    committed = False
+
+    def commit(self):
+        super().commit()
+        self.committed = True
+
+
+def get_db_connection(url=None):
+    """
+    Open a brand-new connection to the primary (or to ``url``). Used by the
+    pools and by one-off scripts.
+    """
+    url = url or DATABASE_URL
+    if not url:
         print("DATABASE_URL not set in environment!")
         return None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
+        conn = psycopg2.connect(url, connection_factory=TrackedConnection, cursor_factory=TimedCursor)
         return conn
     except Exception as e:
         print("Database connection error:", e)
         return None
+
+
+# ---------------- Connection pool ----------------
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Connections are created lazily up to ``max_size``; callers block for at
+    most ``timeout`` seconds when the pool is exhausted. Connections that sat
+    idle longer than ``check_after`` seconds are pinged before reuse so stale
+    sockets (server restarts, idle kills) are replaced transparently.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, check_after=30.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size settings")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+
+        self._idle = deque()  # (conn, returned_at)
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Stats
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._waiting = 0
+
+    def open(self):
+        """Pre-create ``min_size`` connections."""
+        for _ in range(self.min_size):
+            conn = self._new_connection()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def _new_connection(self):
+        conn = self._connect()
+        if conn is None:
+            raise psycopg2.OperationalError("Could not open a database connection")
+        return conn
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self.check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            conn = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                self._waiting += 1
+                try:
+                    while not self._idle and self._size >= self.max_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                f"No database connection available within {timeout:.1f}s"
+                            )
+                        self._cond.wait(remaining)
+                        if self._closed:
+                            raise PoolTimeout("Connection pool is closed")
+                finally:
+                    self._waiting -= 1
+
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    idle_for = time.monotonic() - returned_at
+                else:
+                    # Reserve a slot and create the connection outside the lock
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, idle_for):
+                self._discard(conn)
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._in_use += 1
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        with self._cond:
+            self._in_use -= 1
+
+        if not discard and not conn.closed:
+            try:
+                # Never hand out a connection with an open transaction
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or conn.closed or self._closed:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            # putconn rolls back anything the caller left uncommitted
+            self.putconn(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_time_total_ms": round(self._wait_total * 1000, 3),
+                "wait_time_avg_ms": round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_time_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+# ---------------- Read replicas ----------------
+# 0 when the replica has replayed everything it received (an idle primary
+# would otherwise look like growing lag), NULL -> 0 on a server that isn't a replica
+REPLICA_LAG_SQL = """
+    SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                         ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0);
+"""
+
+
+def _display_name(url: str) -> str:
+    """host:port/dbname, without credentials, for logs and stats."""
+    parsed = urlparse(url)
+    host = parsed.hostname or dict(p.split("=", 1) for p in parsed.query.split("&") if "=" in p).get("host", "local")
+    return f"{host}{f':{parsed.port}' if parsed.port else ''}{parsed.path or ''}"
+
+
+class Replica:
+    """
+    One read replica: its pool and health. A connection failure or too much
+    replication lag takes it out of rotation for ``retry_after`` seconds;
+    the next read after that tries it again.
+    """
+
+    def __init__(self, url, pool, retry_after=DB_REPLICA_RETRY_AFTER, max_lag=DB_REPLICA_MAX_LAG,
+                 check_interval=DB_REPLICA_CHECK_INTERVAL):
+        self.name = _display_name(url)
+        self.pool = pool
+        self.retry_after = retry_after
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.down_until = None
+        self.lag = None
+        self._checked_at = None
+        self.failures = 0
+
+    @property
+    def available(self) -> bool:
+        return self.down_until is None or time.monotonic() >= self.down_until
+
+    def mark_down(self, reason):
+        self.failures += 1
+        if self.down_until is None:
+            print(f"⚠️ Replica {self.name} out of rotation for {self.retry_after:.0f}s: {reason}")
+        self.down_until = time.monotonic() + self.retry_after
+
+    def mark_up(self):
+        if self.down_until is not None:
+            print(f"✅ Replica {self.name} back in rotation")
+            self.down_until = None
+
+    def lag_ok(self, conn) -> bool:
+        """Measure replication lag on ``conn`` if due; False if the replica is too far behind."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return True
+        self._checked_at = now
+        cur = conn.cursor()
+        try:
+            cur.execute(REPLICA_LAG_SQL)
+            self.lag = float(cur.fetchone()[0])
+        finally:
+            cur.close()
+        conn.rollback()
+        if self.lag > self.max_lag:
+            self.mark_down(f"{self.lag:.1f}s behind the primary")
+            return False
+        return True
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "available": self.available,
+            "lag_seconds": self.lag,
+            "failures": self.failures,
+            **self.pool.stats(),
+        }
+
+
+# The client a request runs for (set by ReadYourWritesMiddleware) and the
+# clients that committed recently, shared across workers like other caches
+_client_key = contextvars.ContextVar("db_client_key", default=None)
+_recent_writers = SharedCache("db_pins", maxsize=10_000, ttl=DB_READ_YOUR_WRITES_WINDOW)
+
+_routes = Counter()  # (target, reason) -> checkouts
+_routes_lock = threading.Lock()
+
+
+def _count_route(target: str, reason: str):
+    with _routes_lock:
+        _routes[target, reason] += 1
+    if DB_ROUTING_LOG:
+        print(f"db route: {target} ({reason}) client={_client_key.get()}")
+
+
+class ReadYourWritesMiddleware:
+    """
+    Tag each request with its client (bearer token, else IP address) so a
+    client's reads go to the primary for DB_READ_YOUR_WRITES_WINDOW seconds
+    after it commits, instead of to a replica that may not have the write yet.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _replicas:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        client = (headers.get(b"authorization") or headers.get(b"x-forwarded-for", b"").split(b",")[0].strip()
+                  or (scope.get("client") or ("",))[0].encode())
+        token = _client_key.set(hashlib.sha256(client).hexdigest()[:24])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _client_key.reset(token)
+
+
+_replicas = []
+_next_replica = itertools.count()
+
+
+def _pick_replica(readonly: bool):
+    """(replica or None for the primary, reason)."""
+    if not readonly:
+        return None, "write"
+    if not _replicas:
+        return None, "no_replica"
+    client = _client_key.get()
+    if client is not None and _recent_writers.get(client) is not None:
+        return None, "read_your_writes"
+    start = next(_next_replica)
+    for i in range(len(_replicas)):
+        replica = _replicas[(start + i) % len(_replicas)]
+        if replica.available:
+            return replica, "read"
+    return None, "replicas_down"
+
+
+def _checkout_replica(replica):
+    """A connection from ``replica``, or None after taking it out of rotation."""
+    try:
+        conn = replica.pool.getconn()
+    except psycopg2.OperationalError as e:
+        replica.mark_down(e)
+        return None
+    try:
+        healthy = replica.lag_ok(conn)
+    except psycopg2.Error as e:
+        replica.pool.putconn(conn, discard=True)
+        replica.mark_down(e)
+        return None
+    if not healthy:
+        replica.pool.putconn(conn)
+        return None
+    replica.mark_up()
+    return conn
+
+
+_pool = None
+
+
+def init_pool():
+    """Create the shared pool. Called from ``main.lifespan`` at startup."""
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(
+            get_db_connection,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            timeout=DB_POOL_TIMEOUT,
+            check_after=DB_POOL_HEALTHCHECK_AFTER,
+        )
+        _pool.open()
+        for url in DATABASE_REPLICA_URLS:
+            replica = Replica(url, ConnectionPool(
+                lambda url=url: get_db_connection(url),
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT,
+                check_after=DB_POOL_HEALTHCHECK_AFTER,
+            ))
+            try:
+                replica.pool.open()
+            except Exception as e:
+                replica.mark_down(e)
+            _replicas.append(replica)
+        if _replicas:
+            print(f"✅ Routing reads to {len(_replicas)} replica(s): {', '.join(r.name for r in _replicas)}")
+    return _pool
+
+
+def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+    for replica in _replicas:
+        replica.pool.close()
+    _replicas.clear()
+
+
+def get_pool():
+    return _pool
+
+
+@contextmanager
+def db_connection(readonly=False):
+    """
+    Check out a connection for the duration of the ``with`` block.
+
+    ``readonly=True`` marks a block that only reads: with replicas configured
+    it goes round-robin to an available one, unless this client committed
+    within DB_READ_YOUR_WRITES_WINDOW. Everything else uses the primary.
+
+    Uses the shared pools when running and falls back to a one-off primary
+    connection otherwise (scripts, tests without the app lifespan).
+    """
+    if _pool is not None:
+        replica, reason = _pick_replica(readonly)
+        conn = _checkout_replica(replica) if replica is not None else None
+        if conn is None:
+            if replica is not None:
+                reason = "replica_failed"
+            _count_route("primary", reason)
+            with _pool.connection() as conn:
+                try:
+                    yield conn
+                finally:
+                    client = _client_key.get()
+                    if conn.committed and client is not None:
+                        _recent_writers.set(client, True)
+                    conn.committed = False
+            return
+
+        _count_route("replica", reason)
+        try:
+            yield conn
+        except psycopg2.OperationalError as e:
+            if conn.closed:  # lost the server, not e.g. a statement timeout
+                replica.mark_down(e)
+            raise
+        finally:
+            replica.pool.putconn(conn)
+        return
+
+    conn = get_db_connection()
+    if conn is None:
+        raise psycopg2.OperationalError("Could not open a database connection")
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_db():
+    """FastAPI dependency yielding a pooled connection."""
+    with db_connection() as conn:
+        yield conn
+
+
+def pool_stats():
+    """Primary pool usage, plus each replica's pool and health and the routing counts."""
+    if _pool is None:
+        return {"enabled": False}
+    with _routes_lock:
+        routes = [{"target": target, "reason": reason, "count": count} for (target, reason), count in sorted(_routes.items())]
+    return {"enabled": True, **_pool.stats(), "replicas": [r.stats() for r in _replicas], "routes": routes}
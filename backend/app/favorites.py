@@ -1,51 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from app.database import get_db_connection
-import jwt, os
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+import os
+from app.database import db_connection
+from app.security import get_current_user
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, build_rows, decode_cursor, page, parse_fields, select_list
 
 router = APIRouter(prefix="/favorites", tags=["Favorites"])
 
-JWT_SECRET = os.environ["JWT_SECRET"]
-ALGORITHM = "HS256"
-
-# ---------------- Auth helper ----------------
-def get_current_user(authorization: str = Header(...)):
-    """Extract user_id from Bearer token"""
-    try:
-        if not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Invalid authorization header")
-        token = authorization.split(" ")[1]
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-        return payload.get("user_id")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+# Most IDs accepted by one batch add/remove call
+FAVORITES_BATCH_MAX = int(os.getenv("FAVORITES_BATCH_MAX", "500"))
 
 # ---------------- GET Favorites ----------------
+FAVORITE_COLUMNS = {
+    "id": ("f.id",),
+    "attraction_id": ("f.attraction_id",),
+    "name": ("a.name",),
+    "description": ("a.description",),
+    "image": ("a.image1",),
+}
+# ?expand=true: the full attraction record, so clients don't refetch it by country
+EXPANDED_FAVORITE_COLUMNS = {
+    **FAVORITE_COLUMNS,
+    "country": ("a.country",),
+    "lat": ("a.lat",),
+    "lng": ("a.lng",),
+    "images": ("a.image1", "a.image2", "a.image3", "a.image4"),
+    "status": ("a.status",),
+}
+FAVORITE_CONVERT = {"images": lambda imgs: [img for img in imgs if img]}
+
+
 @router.get("/")
-def get_favorites(user_id: int = Depends(get_current_user)):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-            SELECT f.id, a.name, a.description, a.image1
-            FROM favorites f
-            JOIN attractions a ON f.attraction_id = a.id
-            WHERE f.user_id = %s;
-        """, (user_id,))
-        rows = cur.fetchall()
-        favorites = []
-        for row in rows:
-            favorites.append({
-                "id": row[0],
-                "name": row[1],
-                "description": row[2],
-                "image": row[3],
-            })
-        return {"favorites": favorites}
-    finally:
-        cur.close()
-        conn.close()
+def get_favorites(
+    user_id: int = Depends(get_current_user),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    expand: bool = Query(False),
+):
+    after = decode_cursor(cursor)
+    columns = EXPANDED_FAVORITE_COLUMNS if expand else FAVORITE_COLUMNS
+    selected = parse_fields(fields, columns)
+    with db_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"""
+                SELECT {select_list(selected, columns)}
+                FROM favorites f
+                JOIN attractions a ON f.attraction_id = a.id
+                WHERE f.user_id = %s AND f.id > %s
+                ORDER BY f.id
+                LIMIT %s;
+            """, (user_id, after or 0, limit + 1))
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+    favorites, next_cursor = page(build_rows(rows, selected, columns, FAVORITE_CONVERT), limit)
+    return {"favorites": favorites, "next_cursor": next_cursor}
 
 # ---------------- ADD Favorite ----------------
 @router.post("/")
@@ -53,36 +64,108 @@ def add_favorite(payload: dict, user_id: int = Depends(get_current_user)):
     attraction_id = payload.get("attraction_id")
     if not attraction_id:
         raise HTTPException(status_code=400, detail="Missing attraction_id")
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT id FROM favorites WHERE user_id=%s AND attraction_id=%s;", (user_id, attraction_id))
-        if cur.fetchone():
-            raise HTTPException(status_code=400, detail="Already in favorites")
+    with db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO favorites (user_id, attraction_id) VALUES (%s, %s)
+                ON CONFLICT (user_id, attraction_id) DO NOTHING
+                RETURNING id;
+                """,
+                (user_id, attraction_id),
+            )
+            inserted = cur.fetchone()
+            if not inserted:
+                raise HTTPException(status_code=400, detail="Already in favorites")
+            conn.commit()
+            return {"message": "Added to favorites", "id": inserted[0]}
+        finally:
+            cur.close()
+
+# ---------------- Batch ADD / REMOVE ----------------
+# ids are sent as int[]; anything outside SERIAL's range can't exist and would fail the cast
+MAX_ID = 2**31 - 1
+
+
+def _id_list(payload: dict, key: str, required: bool = True) -> list:
+    ids = payload.get(key)
+    if ids is None and not required:
+        return []
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise HTTPException(status_code=400, detail=f"{key} must be a non-empty list of integers")
+    if len(ids) > FAVORITES_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {FAVORITES_BATCH_MAX} {key} per request")
+    if not all(1 <= i <= MAX_ID for i in ids):
+        raise HTTPException(status_code=400, detail=f"{key} must be between 1 and {MAX_ID}")
+    return list(dict.fromkeys(ids))
+
+
+@router.post("/batch")
+def add_favorites(payload: dict, user_id: int = Depends(get_current_user)):
+    """
+    Add several attractions in one statement. IDs that are already favorites
+    or don't exist are reported under ``skipped`` instead of failing the call.
+    """
+    attraction_ids = _id_list(payload, "attraction_ids")
+    with db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            # Joining attractions drops unknown IDs before they hit the foreign key
+            cur.execute(
+                """
+                INSERT INTO favorites (user_id, attraction_id)
+                SELECT %s, a.id
+                FROM unnest(%s::int[]) AS t(attraction_id)
+                JOIN attractions a ON a.id = t.attraction_id
+                ON CONFLICT (user_id, attraction_id) DO NOTHING
+                RETURNING id, attraction_id;
+                """,
+                (user_id, attraction_ids),
+            )
+            added = [{"id": row[0], "attraction_id": row[1]} for row in cur.fetchall()]
+            conn.commit()
+        finally:
+            cur.close()
+    added_ids = {f["attraction_id"] for f in added}
+    return {"added": added, "skipped": [i for i in attraction_ids if i not in added_ids]}
+
 
-        cur.execute(
-            "INSERT INTO favorites (user_id, attraction_id) VALUES (%s, %s) RETURNING id;",
-            (user_id, attraction_id),
-        )
-        new_id = cur.fetchone()[0]
-        conn.commit()
-        return {"message": "Added to favorites", "id": new_id}
-    finally:
-        cur.close()
-        conn.close()
+@router.post("/batch/remove")
+def remove_favorites(payload: dict, user_id: int = Depends(get_current_user)):
+    """Remove favorites by favorite ``ids`` and/or ``attraction_ids`` in one statement."""
+    ids = _id_list(payload, "ids", required=False)
+    attraction_ids = _id_list(payload, "attraction_ids", required=False)
+    if not ids and not attraction_ids:
+        raise HTTPException(status_code=400, detail="Missing ids or attraction_ids")
+    with db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                DELETE FROM favorites
+                WHERE user_id = %s AND (id = ANY(%s::int[]) OR attraction_id = ANY(%s::int[]))
+                RETURNING id, attraction_id;
+                """,
+                (user_id, ids, attraction_ids),
+            )
+            removed = [{"id": row[0], "attraction_id": row[1]} for row in cur.fetchall()]
+            conn.commit()
+        finally:
+            cur.close()
+    return {"removed": removed}
 
 # ---------------- DELETE Favorite ----------------
 @router.delete("/{favorite_id}")
 def remove_favorite(favorite_id: int, user_id: int = Depends(get_current_user)):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("DELETE FROM favorites WHERE id=%s AND user_id=%s RETURNING id;", (favorite_id, user_id))
-        deleted = cur.fetchone()
-        if not deleted:
-            raise HTTPException(status_code=404, detail="Favorite not found")
-        conn.commit()
-        return {"message": "Removed successfully", "id": deleted[0]}
-    finally:
-        cur.close()
-        conn.close()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM favorites WHERE id=%s AND user_id=%s RETURNING id;", (favorite_id, user_id))
+            deleted = cur.fetchone()
+            if not deleted:
+                raise HTTPException(status_code=404, detail="Favorite not found")
+            conn.commit()
+            return {"message": "Removed successfully", "id": deleted[0]}
+        finally:
+            cur.close()
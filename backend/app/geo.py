@@ -0,0 +1,81 @@
+import math
+
+# Fixed lat/lng grid backing attractions.grid_cell (see migration 5, which
+# must use the same cell size). 0.5° cells: 360 rows x 720 columns.
+GRID_CELL_DEG = 0.5
+GRID_ROWS = int(180 / GRID_CELL_DEG)
+GRID_COLS = int(360 / GRID_CELL_DEG)
+
+# Above this many cells the cell list stops paying off; filter on lat/lng only
+MAX_GRID_CELLS = 4096
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+
+
+def _row(lat: float) -> int:
+    return min(max(math.floor((lat + 90) / GRID_CELL_DEG), 0), GRID_ROWS - 1)
+
+
+def _col(lng: float) -> int:
+    return min(max(math.floor((lng + 180) / GRID_CELL_DEG), 0), GRID_COLS - 1)
+
+
+def grid_cell(lat: float, lng: float) -> int:
+    """Cell id of a point; mirrors the generated grid_cell column."""
+    return _row(lat) * GRID_COLS + _col(lng)
+
+
+def lng_ranges(min_lng: float, max_lng: float) -> list:
+    """
+    Longitude intervals covered by a box. ``min_lng > max_lng`` means the box
+    crosses the antimeridian and is split in two.
+    """
+    if min_lng <= max_lng:
+        return [(min_lng, max_lng)]
+    return [(min_lng, 180.0), (-180.0, max_lng)]
+
+
+def cells_for_bbox(min_lat: float, min_lng: float, max_lat: float, max_lng: float):
+    """All grid cells intersecting the box, or None if there are too many."""
+    ranges = lng_ranges(min_lng, max_lng)
+    rows = range(_row(min_lat), _row(max_lat) + 1)
+    col_spans = [range(_col(lo), _col(hi) + 1) for lo, hi in ranges]
+    if len(rows) * sum(len(cols) for cols in col_spans) > MAX_GRID_CELLS:
+        return None
+    return [row * GRID_COLS + col for row in rows for cols in col_spans for col in cols]
+
+
+def radius_bbox(lat: float, lng: float, radius_km: float) -> tuple:
+    """
+    (min_lat, min_lng, max_lat, max_lng) enclosing a circle. Crossing the
+    antimeridian yields min_lng > max_lng; reaching a pole spans all longitudes.
+    """
+    dlat = radius_km / KM_PER_DEG_LAT
+    min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if min_lat <= -90 or max_lat >= 90 or cos_lat <= 1e-9:
+        return min_lat, -180.0, max_lat, 180.0
+
+    dlng = radius_km / (KM_PER_DEG_LAT * cos_lat)
+    if dlng >= 180:
+        return min_lat, -180.0, max_lat, 180.0
+    min_lng = lng - dlng if lng - dlng >= -180 else lng - dlng + 360
+    max_lng = lng + dlng if lng + dlng <= 180 else lng + dlng - 360
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+# Same formula in SQL, against the attractions lat/lng columns
+HAVERSINE_SQL = (
+    f"2 * {EARTH_RADIUS_KM} * asin(sqrt(least(1.0, "
+    "power(sin(radians(lat - %(lat)s) / 2), 2) "
+    "+ cos(radians(%(lat)s)) * cos(radians(lat)) * power(sin(radians(lng - %(lng)s) / 2), 2))))"
+)
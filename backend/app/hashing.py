@@ -0,0 +1,119 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+from starlette.concurrency import run_in_threadpool
+
+# bcrypt cost factor for new hashes; existing hashes keep the cost they were made with
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes dedicated to hashing; 0 hashes on the request threadpool instead
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Hashes running or queued before new ones are turned away
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(max(HASH_WORKERS, 1) * 8)))
+
+_executor = None
+_pending = 0
+_stats = {"completed": 0, "rejected": 0, "hash_time_total_ms": 0.0}
+
+
+class HashPoolBusy(Exception):
+    """Raised when the hashing queue is full. ``retry_after`` is in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+# ---------------- Worker functions (run in the pool processes) ----------------
+def _hashpw(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+def _noop():
+    return None
+
+
+# ---------------- Pool lifecycle ----------------
+def init_hash_pool():
+    """Start the hashing processes. Called from ``main.lifespan``."""
+    global _executor
+    if _executor is None and HASH_WORKERS > 0:
+        # spawn, not fork: the server process already runs threads
+        _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        for _ in range(HASH_WORKERS):
+            _executor.submit(_noop)
+
+
+def close_hash_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def _restart_hash_pool():
+    global _executor
+    broken, _executor = _executor, None
+    broken.shutdown(wait=False, cancel_futures=True)
+    init_hash_pool()
+
+
+def _retry_after() -> int:
+    # A full queue drains in about the time recent hashes took end to end
+    done = _stats["completed"]
+    avg = _stats["hash_time_total_ms"] / done / 1000 if done else 1.0
+    return max(1, math.ceil(avg))
+
+
+async def _run(fn, *args):
+    global _pending
+    if _pending >= HASH_QUEUE_LIMIT:
+        _stats["rejected"] += 1
+        raise HashPoolBusy(_retry_after())
+
+    _pending += 1
+    started = time.perf_counter()
+    try:
+        if _executor is None:
+            return await run_in_threadpool(fn, *args)
+        try:
+            return await asyncio.wrap_future(_executor.submit(fn, *args))
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool and retry once
+            print("⚠️ Hashing pool broken, restarting it")
+            _restart_hash_pool()
+            return await asyncio.wrap_future(_executor.submit(fn, *args))
+    finally:
+        _pending -= 1
+        _stats["completed"] += 1
+        _stats["hash_time_total_ms"] += (time.perf_counter() - started) * 1000
+
+
+async def hash_password(password: str) -> str:
+    return (await _run(_hashpw, password.encode("utf-8"), BCRYPT_ROUNDS)).decode("utf-8")
+
+
+async def check_password(password: str, password_hash: str) -> bool:
+    return await _run(_checkpw, password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+def hash_stats():
+    done = _stats["completed"]
+    return {
+        "workers": HASH_WORKERS,
+        "rounds": BCRYPT_ROUNDS,
+        "queue_limit": HASH_QUEUE_LIMIT,
+        "pending": _pending,
+        "completed": done,
+        "rejected": _stats["rejected"],
+        "avg_ms": round(_stats["hash_time_total_ms"] / done, 2) if done else 0.0,
+    }
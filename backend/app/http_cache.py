@@ -0,0 +1,72 @@
+import hashlib
+import os
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from app.responses import FastJSONResponse
+
+# Browser/CDN freshness per read endpoint, in seconds. Weather uses the time
+# left in the upstream's reporting interval instead.
+CACHE_MAX_AGE_ATTRACTIONS = int(os.getenv("CACHE_MAX_AGE_ATTRACTIONS", "60"))
+CACHE_MAX_AGE_LOCATION = int(os.getenv("CACHE_MAX_AGE_LOCATION", "86400"))
+CACHE_MAX_AGE_IMAGES = int(os.getenv("CACHE_MAX_AGE_IMAGES", "86400"))
+# Proxied thumbnails: an attraction's image slot is never rewritten once set
+CACHE_MAX_AGE_IMAGE_PROXY = int(os.getenv("CACHE_MAX_AGE_IMAGE_PROXY", str(365 * 86400)))
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from a response body (bytes) or from version identifiers."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison, so a W/ prefix is ignored."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def _cache_headers(etag: str, max_age: int, immutable: bool = False) -> dict:
+    cache_control = f"public, max-age={max(int(max_age), 0)}" + (", immutable" if immutable else "")
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(request: Request, etag: str, max_age: int, immutable: bool = False):
+    """A 304 response when the client already holds ``etag``, else None."""
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=_cache_headers(etag, max_age, immutable))
+    return None
+
+
+def cached_json(request: Request, content, max_age: int, etag: str = None):
+    """
+    JSON response with ETag and Cache-Control, or 304 if If-None-Match
+    already names it. Without ``etag`` the ETag is a hash of the rendered body.
+    """
+    response = FastJSONResponse(content)
+    etag = etag or make_etag(response.body)
+    return not_modified(request, etag, max_age) or _with_headers(response, etag, max_age)
+
+
+def _with_headers(response, etag: str, max_age: int):
+    response.headers.update(_cache_headers(etag, max_age))
+    return response
+
+
+def cached_file(request: Request, path: str, media_type: str, etag: str, max_age: int):
+    """
+    File streamed from disk (``http.response.pathsend`` where the server
+    supports it) with immutable caching headers, or 304.
+    """
+    return not_modified(request, etag, max_age, immutable=True) or FileResponse(
+        path, media_type=media_type, headers=_cache_headers(etag, max_age, immutable=True)
+    )
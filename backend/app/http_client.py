@@ -0,0 +1,287 @@
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+from app.metrics import Histogram, record_upstream_call
+
+# Shared outbound HTTP client settings. httpcore's pool bookkeeping grows
+# quadratically with the number of connections, so keep the pool modest and
+# queue excess requests on a semaphore instead of inside the pool.
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+
+# Upstream responses worth retrying (transport errors and timeouts always are)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_client = None
+_gate = None
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+
+class ResponseTooLarge(httpx.HTTPError):
+    """Raised once a body streamed with ``max_bytes`` (or its Content-Length) goes over the limit."""
+
+
+class UpstreamBusy(Exception):
+    """
+    Raised without calling the upstream while ``max_concurrent`` calls to it
+    are already in flight; answered with 429 (see ``main``) rather than queued.
+    """
+
+    def __init__(self, upstream: str, retry_after: int = 1):
+        super().__init__(f"Too many concurrent {upstream} requests")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class Upstream:
+    """
+    Policy and health for one upstream service: timeout, bounded retries with
+    full-jitter exponential backoff, a circuit breaker and a concurrency cap.
+
+    After ``failure_threshold`` consecutive failed calls the breaker opens and
+    calls fail fast with CircuitOpenError for ``reset_timeout`` seconds. Then
+    one trial call is let through (half-open): success closes the breaker,
+    failure opens it again.
+
+    At most ``max_concurrent`` calls (0: unlimited) are in flight per worker;
+    further calls fail fast with UpstreamBusy so a slow upstream can't tie
+    up every request.
+    """
+
+    def __init__(self, name, timeout=HTTP_TIMEOUT, retries=2, backoff_base=0.1, backoff_max=2.0,
+                 failure_threshold=5, reset_timeout=30.0, max_concurrent=0):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_concurrent = max_concurrent
+
+        self.latency = Histogram()
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self.calls = 0
+        self.failures = 0
+        self.retried = 0
+        self.short_circuited = 0
+        self.in_flight = 0
+        self.shed = 0
+
+    @classmethod
+    def from_env(cls, name, prefix, **defaults):
+        """Read ``<prefix>_TIMEOUT`` / ``_RETRIES`` / ``_FAILURE_THRESHOLD`` / ``_RESET_TIMEOUT`` / ``_MAX_CONCURRENT``."""
+        env = {
+            "timeout": ("TIMEOUT", float),
+            "retries": ("RETRIES", int),
+            "failure_threshold": ("FAILURE_THRESHOLD", int),
+            "reset_timeout": ("RESET_TIMEOUT", float),
+            "max_concurrent": ("MAX_CONCURRENT", int),
+        }
+        for key, (suffix, cast) in env.items():
+            value = os.getenv(f"{prefix}_{suffix}")
+            if value is not None:
+                defaults[key] = cast(value)
+        return cls(name, **defaults)
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            self.short_circuited += 1
+            raise CircuitOpenError(f"{self.name} circuit open, failing fast")
+        if state == "half_open":
+            self._trial_in_flight = True
+
+    def record(self, ok: bool):
+        self._trial_in_flight = False
+        self.calls += 1
+        if ok:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"⚠️ Circuit opened for {self.name} after {self.consecutive_failures} failures")
+            self.opened_at = time.monotonic()
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "timeout": self.timeout,
+            "retries": self.retries,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retried": self.retried,
+            "short_circuited": self.short_circuited,
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "shed": self.shed,
+            "consecutive_failures": self.consecutive_failures,
+            "latency": self.latency.summary(),
+        }
+
+
+UPSTREAMS = {
+    "restcountries": Upstream.from_env("restcountries", "RESTCOUNTRIES", timeout=5.0, retries=2, max_concurrent=32),
+    "open_meteo": Upstream.from_env("open_meteo", "OPEN_METEO", timeout=5.0, retries=2, max_concurrent=32),
+    # Unsplash rate-limits per hour; one retry is plenty
+    "unsplash": Upstream.from_env("unsplash", "UNSPLASH", timeout=5.0, retries=1, max_concurrent=8),
+    # Original image files behind the thumbnail proxy (a CDN; larger bodies)
+    "image_origin": Upstream.from_env("image_origin", "IMAGE_ORIGIN", timeout=10.0, retries=1, max_concurrent=16),
+}
+
+
+def init_http_client(transport=None):
+    """Create the shared AsyncClient. Called from ``main.lifespan`` at startup."""
+    global _client, _gate
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+            ),
+            transport=transport,
+        )
+        _gate = asyncio.Semaphore(HTTP_MAX_CONNECTIONS)
+    return _client
+
+
+async def close_http_client():
+    global _client, _gate
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _gate = None
+
+
+def get_http_client():
+    """Return the shared client, creating it lazily outside the app lifespan."""
+    return _client if _client is not None else init_http_client()
+
+
+async def _get(url, max_bytes=None, **kwargs):
+    client = get_http_client()
+    async with _gate:
+        if max_bytes is None:
+            return await client.get(url, **kwargs)
+        return await _get_capped(client, url, max_bytes, **kwargs)
+
+
+async def _get_capped(client, url, max_bytes, params=None, headers=None, timeout=httpx.USE_CLIENT_DEFAULT, **kwargs):
+    """Stream the body and stop reading as soon as it goes over ``max_bytes``."""
+    request = client.build_request("GET", url, params=params, headers=headers, timeout=timeout)
+    response = await client.send(request, stream=True, **kwargs)
+    try:
+        declared = response.headers.get("content-length", "")
+        if declared.isdigit() and int(declared) > max_bytes:
+            raise ResponseTooLarge(f"Response is {declared} bytes, over {max_bytes}")
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if len(body) > max_bytes:
+                raise ResponseTooLarge(f"Response is over {max_bytes} bytes")
+    finally:
+        await response.aclose()
+    # The body is already decoded, so drop the headers describing the encoded one
+    headers = [(k, v) for k, v in response.headers.multi_items()
+               if k.lower() not in ("content-encoding", "content-length")]
+    return httpx.Response(response.status_code, headers=headers, content=bytes(body), request=request)
+
+
+async def http_get(url, upstream=None, **kwargs):
+    """
+    GET through the shared client, waiting for a free connection slot first.
+
+    With ``upstream`` (a key of UPSTREAMS) the call uses that upstream's
+    timeout, is retried on transport errors and 429/5xx responses, and goes
+    through its circuit breaker and concurrency cap. The last response is
+    returned even if it is an error status; callers keep their own status
+    handling.
+
+    With ``max_bytes`` the body is streamed and the request fails with
+    ResponseTooLarge as soon as it is known to be bigger than that.
+    """
+    if upstream is None:
+        return await _get(url, **kwargs)
+
+    policy = UPSTREAMS[upstream]
+    if policy.max_concurrent and policy.in_flight >= policy.max_concurrent:
+        policy.shed += 1
+        raise UpstreamBusy(upstream)
+    policy.before_call()
+    kwargs.setdefault("timeout", policy.timeout)
+
+    policy.in_flight += 1
+    try:
+        return await _get_with_retries(policy, url, **kwargs)
+    except asyncio.CancelledError:
+        # Caller gave up (e.g. its own deadline); says nothing about upstream health
+        policy._trial_in_flight = False
+        raise
+    finally:
+        policy.in_flight -= 1
+
+
+def _observe(policy, seconds):
+    policy.latency.observe(seconds)
+    record_upstream_call(seconds)
+
+
+async def _get_with_retries(policy, url, **kwargs):
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            response = await _get(url, **kwargs)
+        except httpx.TransportError:
+            _observe(policy, time.perf_counter() - started)
+            if attempt >= policy.retries:
+                policy.record(False)
+                raise
+        except ResponseTooLarge:
+            # The upstream answered fine; the response just isn't wanted
+            _observe(policy, time.perf_counter() - started)
+            policy.record(True)
+            raise
+        except Exception:
+            policy.record(False)
+            raise
+        else:
+            _observe(policy, time.perf_counter() - started)
+            if response.status_code not in RETRY_STATUSES:
+                policy.record(True)
+                return response
+            if attempt >= policy.retries:
+                policy.record(False)
+                return response
+
+        attempt += 1
+        policy.retried += 1
+        await asyncio.sleep(policy.backoff(attempt))
+
+
+def upstream_stats():
+    return {name: policy.stats() for name, policy in UPSTREAMS.items()}
@@ -0,0 +1,296 @@
+import asyncio
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
+import time
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.database import db_connection
+from app.http_client import ResponseTooLarge, http_get
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: without Pillow the original is stored for every width
+    Image = None
+
+# Thumbnails of attraction images, resized once and kept on local disk.
+#   blobs/ab/<sha256 of the bytes>.jpg   content-addressed, shared by identical images
+#   index/cd/<sha256 of the URL>-<width> names the blob for one source URL and width
+IMAGE_PROXY_DIR = os.getenv("IMAGE_PROXY_DIR", os.path.join(tempfile.gettempdir(), "travel-snapshot-images"))
+# Disk budget for blobs; least recently served are removed beyond it
+IMAGE_PROXY_MAX_BYTES = int(os.getenv("IMAGE_PROXY_MAX_BYTES", str(512 * 1024 * 1024)))
+IMAGE_PROXY_WIDTHS = tuple(sorted({int(w) for w in os.getenv("IMAGE_PROXY_WIDTHS", "160,320,640").split(",")}))
+IMAGE_PROXY_QUALITY = int(os.getenv("IMAGE_PROXY_QUALITY", "80"))
+IMAGE_PROXY_MAX_ORIGIN_BYTES = int(os.getenv("IMAGE_PROXY_MAX_ORIGIN_BYTES", str(20 * 1024 * 1024)))
+IMAGE_PROXY_MAX_REDIRECTS = int(os.getenv("IMAGE_PROXY_MAX_REDIRECTS", "3"))
+# Image URLs are user-supplied (POST /attractions), so only these hosts are fetched,
+# including on redirects; "*" allows any
+IMAGE_PROXY_ALLOWED_HOSTS = {
+    h.strip().lower() for h in os.getenv("IMAGE_PROXY_ALLOWED_HOSTS", "images.unsplash.com,plus.unsplash.com").split(",")
+    if h.strip()
+}
+# Served blobs get their mtime refreshed (for LRU order) at most this often
+TOUCH_INTERVAL = 60
+# Eviction frees space down to this share of the budget, so it doesn't run on every store
+EVICT_TO = 0.9
+
+IMAGE_COLUMNS = ("image1", "image2", "image3", "image4")
+
+_locks = {}  # url -> [lock, requests holding or waiting for it]
+_stats = {"hits": 0, "misses": 0, "origin_fetches": 0, "origin_errors": 0}
+
+
+def pick_width(requested: int) -> int:
+    """Smallest configured width that covers ``requested`` (the largest if none does)."""
+    for width in IMAGE_PROXY_WIDTHS:
+        if width >= requested:
+            return width
+    return IMAGE_PROXY_WIDTHS[-1]
+
+
+def host_allowed(url: str) -> bool:
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https"):
+        return False
+    return "*" in IMAGE_PROXY_ALLOWED_HOSTS or (parsed.hostname or "") in IMAGE_PROXY_ALLOWED_HOSTS
+
+
+# ---------------- Disk cache ----------------
+class ThumbnailCache:
+    """
+    Content-addressed thumbnail store with size-based LRU eviction. Safe to
+    share between worker processes: files are written to a temp name and
+    renamed into place, and a blob missing from under an index entry is
+    just a miss.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._size = None  # bytes in blobs/, scanned on first use
+        self.evictions = 0
+
+    def _index_path(self, url: str, width: int) -> str:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.root, "index", key[:2], f"{key}-{width}")
+
+    def _blob_path(self, name: str) -> str:
+        return os.path.join(self.root, "blobs", name[:2], name)
+
+    def lookup(self, url: str, width: int):
+        """(path, digest, media_type) of a stored thumbnail, or None."""
+        try:
+            with open(self._index_path(url, width)) as f:
+                name = f.read().strip()
+            path = self._blob_path(name)
+            mtime = os.stat(path).st_mtime
+        except (FileNotFoundError, ValueError):
+            return None
+        if time.time() - mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+        digest, _, ext = name.partition(".")
+        return path, digest, mimetypes.types_map.get(f".{ext}", "application/octet-stream")
+
+    def store(self, url: str, thumbnails: dict):
+        """Store ``{width: (bytes, extension)}`` for ``url``, then evict if over budget."""
+        added = 0
+        for width, (data, ext) in thumbnails.items():
+            name = f"{hashlib.sha256(data).hexdigest()}{ext}"
+            path = self._blob_path(name)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+                added += len(data)
+            else:
+                os.utime(path)
+            _write_atomic(self._index_path(url, width), name.encode())
+        if self._size is None:
+            self._scan()
+        else:
+            self._size += added
+        if self._size > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_TO))
+
+    def _scan(self) -> list:
+        blobs = []
+        for dirpath, _, filenames in os.walk(os.path.join(self.root, "blobs")):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                blobs.append((st.st_mtime, st.st_size, path))
+        self._size = sum(size for _, size, _ in blobs)
+        return blobs
+
+    def evict(self, target: int) -> int:
+        """Remove least recently served blobs until at most ``target`` bytes remain."""
+        removed = 0
+        for _, size, path in sorted(self._scan()):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            removed += 1
+        self.evictions += removed
+        return removed
+
+    def stats(self):
+        return {"dir": self.root, "bytes": self._size, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+thumbnail_cache = ThumbnailCache(IMAGE_PROXY_DIR, IMAGE_PROXY_MAX_BYTES)
+
+
+# ---------------- Resizing ----------------
+def make_thumbnails(data: bytes, content_type: str, widths=IMAGE_PROXY_WIDTHS) -> dict:
+    """
+    ``{width: (bytes, extension)}`` for each width, never upscaling. JPEG
+    unless the image has transparency (then PNG). Without Pillow every width
+    gets the original bytes.
+    """
+    if Image is None:
+        ext = mimetypes.guess_extension(content_type.partition(";")[0].strip()) or ".bin"
+        return {width: (data, ext) for width in widths}
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        # Let the JPEG decoder downscale while decoding; far cheaper than a full decode
+        img.draft("RGB", (max(widths), img.height * max(widths) // max(img.width, 1)))
+        img = ImageOps.exif_transpose(img)
+    except Exception as e:
+        raise ValueError(f"Unreadable image: {e}") from e
+
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    thumbnails = {}
+    for width in widths:
+        resized = img
+        if img.width > width:
+            resized = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS, reducing_gap=3.0)
+        out = io.BytesIO()
+        if has_alpha:
+            resized.save(out, "PNG")
+            thumbnails[width] = (out.getvalue(), ".png")
+        else:
+            resized.save(out, "JPEG", quality=IMAGE_PROXY_QUALITY, progressive=True)
+            thumbnails[width] = (out.getvalue(), ".jpg")
+    return thumbnails
+
+
+# ---------------- Proxy ----------------
+def _image_url(attraction_id: int, n: int):
+    """The attraction's n-th image (1-based, as in its ``images`` list)."""
+    with db_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT {', '.join(IMAGE_COLUMNS)} FROM attractions WHERE id = %s;", (attraction_id,))
+            row = cur.fetchone()
+        finally:
+            cur.close()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Attraction not found")
+    images = [img for img in row if img]
+    if n > len(images):
+        raise HTTPException(status_code=404, detail="Attraction has no such image")
+    return images[n - 1]
+
+
+def _resolve(attraction_id: int, n: int, width: int):
+    url = _image_url(attraction_id, n)
+    return url, thumbnail_cache.lookup(url, width)
+
+
+async def _fetch_original(url: str):
+    """
+    (bytes, content type) of the original image. Redirects are followed by
+    hand so every hop is checked against the allowed hosts, and the body is
+    streamed so an oversized image is dropped without being held in memory.
+    """
+    for _ in range(IMAGE_PROXY_MAX_REDIRECTS + 1):
+        if not host_allowed(url):
+            raise HTTPException(status_code=403, detail="Image host not allowed")
+        _stats["origin_fetches"] += 1
+        try:
+            response = await http_get(url, upstream="image_origin", max_bytes=IMAGE_PROXY_MAX_ORIGIN_BYTES)
+        except ResponseTooLarge:
+            _stats["origin_errors"] += 1
+            raise HTTPException(status_code=502, detail="Image too large")
+        except httpx.HTTPError as e:
+            _stats["origin_errors"] += 1
+            raise HTTPException(status_code=502, detail=f"Image origin request failed: {e}")
+        if not response.is_redirect:
+            break
+        url = str(response.url.join(response.headers["location"]))
+    else:
+        _stats["origin_errors"] += 1
+        raise HTTPException(status_code=502, detail="Too many image origin redirects")
+
+    content_type = response.headers.get("content-type", "")
+    if response.status_code != 200 or not content_type.startswith("image/"):
+        _stats["origin_errors"] += 1
+        raise HTTPException(status_code=502, detail=f"Image origin returned {response.status_code} ({content_type})")
+    return response.content, content_type
+
+
+async def get_thumbnail(attraction_id: int, n: int, requested_width: int):
+    """
+    (path, digest, media_type, cached) for the attraction's n-th image at
+    the configured width covering ``requested_width``; ``cached`` is False
+    when this call fetched the original. On a miss the original is fetched
+    once and every width is stored; concurrent misses for the same URL in
+    this worker wait for that one fetch.
+    """
+    width = pick_width(requested_width)
+    url, hit = await run_in_threadpool(_resolve, attraction_id, n, width)
+    if hit:
+        _stats["hits"] += 1
+        return (*hit, True)
+
+    waiting = _locks.setdefault(url, [asyncio.Lock(), 0])
+    waiting[1] += 1
+    try:
+        async with waiting[0]:
+            hit = await run_in_threadpool(thumbnail_cache.lookup, url, width)
+            if hit:
+                _stats["hits"] += 1
+                return (*hit, True)
+            _stats["misses"] += 1
+            data, content_type = await _fetch_original(url)
+            try:
+                thumbnails = await run_in_threadpool(make_thumbnails, data, content_type)
+            except ValueError as e:
+                raise HTTPException(status_code=502, detail=str(e))
+            await run_in_threadpool(thumbnail_cache.store, url, thumbnails)
+            hit = await run_in_threadpool(thumbnail_cache.lookup, url, width)
+    finally:
+        waiting[1] -= 1
+        if not waiting[1]:
+            _locks.pop(url, None)
+    if hit is None:  # evicted straight away
+        raise HTTPException(status_code=500, detail="IMAGE_PROXY_MAX_BYTES is smaller than one image")
+    return (*hit, False)
+
+
+def proxy_stats():
+    return {**_stats, "widths": list(IMAGE_PROXY_WIDTHS), "pillow": Image is not None, **thumbnail_cache.stats()}
@@ -0,0 +1,199 @@
+import asyncio
+import os
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from app.shared_cache import SharedCache
+from app.database import db_connection
+from app.http_client import http_get
+
+UNSPLASH_ACCESS_KEY = os.getenv("UNSPLASH_ACCESS_KEY")
+UNSPLASH_URL = os.getenv("UNSPLASH_URL", "https://api.unsplash.com/search/photos")
+
+# Per-worker LRU (plus the shared tier, if configured) in front of the image_cache table
+IMAGE_LRU_SIZE = int(os.getenv("IMAGE_LRU_SIZE", "1024"))
+IMAGE_LRU_TTL = float(os.getenv("IMAGE_LRU_TTL", "3600"))
+# How long a persisted lookup is trusted before Unsplash is asked again
+IMAGE_CACHE_MAX_AGE_DAYS = int(os.getenv("IMAGE_CACHE_MAX_AGE_DAYS", "30"))
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", "1000"))
+
+image_lru = SharedCache("images", maxsize=IMAGE_LRU_SIZE, ttl=IMAGE_LRU_TTL)
+_stats = {"db_hits": 0, "upstream_calls": 0, "upstream_errors": 0, "filled": 0, "dropped": 0}
+
+_queue = None
+_worker = None
+_loop = None
+
+
+class ImageLookupError(Exception):
+    """Raised when Unsplash could not be queried."""
+
+
+def _cache_key(query: str, per_page: int) -> str:
+    return f"{' '.join(query.split()).casefold()}|{per_page}"
+
+
+# ---------------- Persistent cache table ----------------
+def _load_cached(key: str):
+    with db_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT urls FROM image_cache
+            WHERE query = %s AND fetched_at > NOW() - make_interval(days => %s);
+            """,
+            (key, IMAGE_CACHE_MAX_AGE_DAYS),
+        )
+        row = cur.fetchone()
+        cur.close()
+    return row[0] if row else None
+
+
+def _store_cached(key: str, urls: list):
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO image_cache (query, urls, fetched_at) VALUES (%s, %s, NOW())
+            ON CONFLICT (query) DO UPDATE SET urls = EXCLUDED.urls, fetched_at = EXCLUDED.fetched_at;
+            """,
+            (key, urls),
+        )
+        conn.commit()
+        cur.close()
+
+
+async def _fetch_from_unsplash(query: str, per_page: int) -> list:
+    _stats["upstream_calls"] += 1
+    try:
+        response = await http_get(
+            UNSPLASH_URL,
+            upstream="unsplash",
+            headers={"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"},
+            params={"query": query, "per_page": per_page},
+        )
+    except httpx.HTTPError as e:
+        _stats["upstream_errors"] += 1
+        raise ImageLookupError(f"Unsplash request failed: {e}") from e
+    if response.status_code != 200:
+        _stats["upstream_errors"] += 1
+        raise ImageLookupError(f"Unsplash returned {response.status_code}")
+    return [item["urls"]["regular"] for item in response.json().get("results", [])]
+
+
+async def lookup_images(query: str, per_page: int = 4) -> list:
+    """
+    Image URLs for ``query``: the LRU / shared cache, then the image_cache table, then
+    Unsplash. Fresh Unsplash results are written back to both layers.
+    """
+    key = _cache_key(query, per_page)
+    urls = await image_lru.aget(key)
+    if urls is not None:
+        return urls
+
+    try:
+        urls = await run_in_threadpool(_load_cached, key)
+    except Exception as e:
+        print("Image cache read failed:", e)
+        urls = None
+    if urls is not None:
+        _stats["db_hits"] += 1
+        await image_lru.aset(key, urls)
+        return urls
+
+    if not UNSPLASH_ACCESS_KEY:
+        return []
+
+    urls = await _fetch_from_unsplash(query, per_page)
+    await image_lru.aset(key, urls)
+    try:
+        await run_in_threadpool(_store_cached, key, urls)
+    except Exception as e:
+        print("Image cache write failed:", e)
+    return urls
+
+
+# ---------------- Background fill for new attractions ----------------
+def _fill_attraction_images(attraction_id: int, urls: list):
+    images = (urls + [None] * 4)[:4]
+    with db_connection() as conn:
+        cur = conn.cursor()
+        # Leave rows alone if someone set images in the meantime
+        cur.execute(
+            """
+            UPDATE attractions SET image1 = %s, image2 = %s, image3 = %s, image4 = %s
+            WHERE id = %s
+              AND image1 IS NULL AND image2 IS NULL AND image3 IS NULL AND image4 IS NULL
+            RETURNING country;
+            """,
+            (*images, attraction_id),
+        )
+        updated = cur.fetchone()
+        conn.commit()
+        cur.close()
+    if updated:
+        # Cached listings still show no images, and the summary's last_modified moved.
+        # Imported here: app.attractions imports this module.
+        from app.attractions import invalidate_country
+        invalidate_country(updated[0])
+
+
+async def _run_worker():
+    while True:
+        attraction_id, name = await _queue.get()
+        try:
+            urls = await lookup_images(name)
+            if urls:
+                await run_in_threadpool(_fill_attraction_images, attraction_id, urls)
+                _stats["filled"] += 1
+        except Exception as e:
+            print(f"Image fill failed for attraction {attraction_id}:", e)
+        finally:
+            _queue.task_done()
+
+
+def start_image_worker():
+    """Start the background fill worker. Called from ``main.lifespan``."""
+    global _queue, _worker, _loop
+    if _worker is None:
+        _loop = asyncio.get_running_loop()
+        _queue = asyncio.Queue(maxsize=IMAGE_QUEUE_SIZE)
+        _worker = asyncio.create_task(_run_worker())
+
+
+async def stop_image_worker():
+    global _queue, _worker, _loop
+    if _worker is not None:
+        _worker.cancel()
+        try:
+            await _worker
+        except asyncio.CancelledError:
+            pass
+        _queue = _worker = _loop = None
+
+
+def _put(item):
+    try:
+        _queue.put_nowait(item)
+    except (asyncio.QueueFull, AttributeError):
+        _stats["dropped"] += 1
+
+
+def enqueue_image_fill(attraction_id: int, name: str) -> bool:
+    """
+    Queue an attraction for image lookup. Safe to call from sync handlers
+    running in the threadpool. Returns False when the worker is not running.
+    """
+    if _loop is None or not UNSPLASH_ACCESS_KEY:
+        return False
+    _loop.call_soon_threadsafe(_put, (attraction_id, name))
+    return True
+
+
+def image_stats():
+    return {
+        "lru": image_lru.stats(),
+        **_stats,
+        "queued": _queue.qsize() if _queue is not None else 0,
+    }
@@ -1,25 +1,50 @@
-from fastapi import APIRouter, HTTPException
-import requests
-import os
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from app.http_cache import CACHE_MAX_AGE_IMAGE_PROXY, CACHE_MAX_AGE_IMAGES, cached_file, cached_json
+from app.image_proxy import IMAGE_PROXY_WIDTHS, get_thumbnail, proxy_stats
+from app.http_client import UpstreamBusy
+from app.image_service import lookup_images, image_stats, ImageLookupError
 
 router = APIRouter(prefix="/images", tags=["Images"])
 
-UNSPLASH_ACCESS_KEY = os.getenv("UNSPLASH_ACCESS_KEY", "your_access_key")
-UNSPLASH_URL = "https://api.unsplash.com/search/photos"
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    return {**image_stats(), "proxy": proxy_stats()}
+
+
+@router.get("/proxy/{attraction_id}/{n}")
+async def proxy_image(
+    request: Request,
+    attraction_id: int,
+    n: int = Path(..., ge=1, le=4, description="1-based position in the attraction's images list"),
+    w: int = Query(IMAGE_PROXY_WIDTHS[0], ge=1, le=4096, description="Wanted width in px"),
+):
+    """
+    An attraction image resized to the smallest of IMAGE_PROXY_WIDTHS that
+    covers ``w``, served from the local thumbnail cache. The ETag is the
+    content hash, and the response may be cached for good. ``X-Cache: hit``
+    marks answers that did not touch the origin, which the rate limiter
+    does not count.
+    """
+    path, digest, media_type, cached = await get_thumbnail(attraction_id, n, w)
+    response = cached_file(request, path, media_type, f'"{digest[:32]}"', CACHE_MAX_AGE_IMAGE_PROXY)
+    response.headers["X-Cache"] = "hit" if cached else "miss"
+    return response
+
 
 @router.get("/{query}")
-def get_images(query: str, per_page: int = 4):
+async def get_images(request: Request, query: str, per_page: int = 4):
     """
     Fetch 4–6 images from Unsplash for the given query
     """
     try:
-        headers = {"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"}
-        params = {"query": query, "per_page": per_page}
-        response = requests.get(UNSPLASH_URL, headers=headers, params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Error fetching images from Unsplash")
-        data = response.json()
-        image_urls = [item["urls"]["regular"] for item in data.get("results", [])]
-        return {"query": query, "images": image_urls}
+        image_urls = await lookup_images(query, per_page)
+        # Empty results (e.g. no Unsplash key yet) should not stick in browser caches
+        max_age = CACHE_MAX_AGE_IMAGES if image_urls else 60
+        return cached_json(request, {"query": query, "images": image_urls}, max_age)
+    except UpstreamBusy:
+        raise
+    except ImageLookupError:
+        raise HTTPException(status_code=500, detail="Error fetching images from Unsplash")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -1,51 +1,149 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
-import requests
+from fastapi import APIRouter, HTTPException, Request
+from app.shared_cache import SharedCache
+from app.http_cache import CACHE_MAX_AGE_LOCATION, cached_json
+from app.http_client import UpstreamBusy, http_get
+import httpx
+import json
+import os
 
 router = APIRouter(prefix="/location", tags=["Location"])
 
-RESTCOUNTRIES_URL = "https://restcountries.com/v3.1/name/"
+RESTCOUNTRIES_URL = os.getenv("RESTCOUNTRIES_URL", "https://restcountries.com/v3.1/name/")
+RESTCOUNTRIES_ALL_URL = os.getenv("RESTCOUNTRIES_ALL_URL", "https://restcountries.com/v3.1/all")
+RESTCOUNTRIES_FIELDS = "name,capital,flags,currencies,languages,latlng,region,population"
 
+# Per-name response cache (country data barely changes)
+COUNTRY_CACHE_TTL = float(os.getenv("COUNTRY_CACHE_TTL", "86400"))
+COUNTRY_CACHE_SIZE = int(os.getenv("COUNTRY_CACHE_SIZE", "512"))
+
+# Optional bulk preload at startup: "api" fetches every country once,
+# "snapshot" reads COUNTRY_SNAPSHOT_PATH (a saved /v3.1/all response, e.g.
+# curl "$RESTCOUNTRIES_ALL_URL?fields=$RESTCOUNTRIES_FIELDS"); without a path it is skipped.
+COUNTRY_SNAPSHOT_PATH = os.getenv("COUNTRY_SNAPSHOT_PATH", "")
+COUNTRY_PRELOAD = os.getenv("COUNTRY_PRELOAD", "").lower()
+if COUNTRY_PRELOAD == "snapshot" and not COUNTRY_SNAPSHOT_PATH:
+    COUNTRY_PRELOAD = ""
+
+country_cache = SharedCache("country", maxsize=COUNTRY_CACHE_SIZE, ttl=COUNTRY_CACHE_TTL)
+_country_index = {}
+_index_stats = {"source": None, "countries": 0, "hits": 0}
+
+
+# ---------------- Helpers ----------------
+def normalize_country_name(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def summarize_country(data: dict) -> dict:
+    """Reduce a REST Countries record to the fields the frontend uses."""
+    currencies = data.get("currencies", {})
+    return {
+        "name": data.get("name", {}).get("common"),
+        "capital": (data.get("capital") or [None])[0],
+        "flag": data.get("flags", {}).get("svg"),
+        "currency": list(currencies.keys())[0] if currencies else None,
+        "languages": list(data.get("languages", {}).values()) if data.get("languages") else [],
+        "latlng": data.get("latlng", [None, None]),
+        "region": data.get("region", "Unknown"),
+        "population": data.get("population", "N/A"),
+    }
+
+
+def build_country_index(countries: list) -> dict:
+    """Index summaries by normalized common and official name (what fullText matches)."""
+    index = {}
+    for data in countries:
+        summary = summarize_country(data)
+        names = data.get("name", {})
+        for name in (names.get("common"), names.get("official")):
+            if name:
+                index.setdefault(normalize_country_name(name), summary)
+    return index
+
+
+async def load_country_index(source: str) -> int:
+    """Replace the in-memory country index from the API or the saved snapshot."""
+    global _country_index
+    if source == "snapshot":
+        if not COUNTRY_SNAPSHOT_PATH:
+            raise ValueError("COUNTRY_SNAPSHOT_PATH is not set")
+        with open(COUNTRY_SNAPSHOT_PATH, encoding="utf-8") as f:
+            countries = json.load(f)
+    elif source == "api":
+        response = await http_get(RESTCOUNTRIES_ALL_URL, upstream="restcountries", params={"fields": RESTCOUNTRIES_FIELDS})
+        response.raise_for_status()
+        countries = response.json()
+    else:
+        raise ValueError(f"Unknown country preload source: {source!r}")
+
+    _country_index = build_country_index(countries)
+    _index_stats["source"] = source
+    _index_stats["countries"] = len(countries)
+    return len(countries)
+
+
+async def lookup_country(country_name: str) -> dict:
+    """
+    Resolve a country summary: local index first, then the TTL cache, then
+    REST Countries (exact match). Raises HTTPException on bad input / not found.
+    """
+    key = normalize_country_name(country_name)
+    if not key:
+        raise HTTPException(status_code=400, detail="Country name is required")
+
+    summary = _country_index.get(key)
+    if summary is not None:
+        _index_stats["hits"] += 1
+        return summary
+
+    summary = await country_cache.aget(key)
+    if summary is not None:
+        return summary
+
+    # ✅ Use fullText=true for exact match
+    response = await http_get(f"{RESTCOUNTRIES_URL}{country_name.strip()}", upstream="restcountries", params={"fullText": "true"})
+    if response.status_code != 200:
+        raise HTTPException(status_code=404, detail="Country not found")
+
+    summary = summarize_country(response.json()[0])
+    await country_cache.aset(key, summary)
+    return summary
+
+
+# ---------------- Cache stats / refresh ----------------
+@router.get("/cache/stats")
+def get_cache_stats():
+    return {"cache": country_cache.stats(), "index": dict(_index_stats)}
+
+
+@router.post("/cache/refresh")
+async def refresh_cache():
+    """
+    Drop cached lookups and reload the country index when a preload source is configured.
+    """
+    country_cache.clear()
+    source = _index_stats["source"] or COUNTRY_PRELOAD
+    if not source:
+        return {"message": "Country cache cleared", "countries": 0}
+    try:
+        count = await load_country_index(source)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Could not reload countries: {str(e)}")
+    return {"message": "Country cache refreshed", "source": source, "countries": count}
+
+
+# ---------------- Country lookup ----------------
 @router.get("/{country_name}")
-def get_country_info(country_name: str):
+async def get_country_info(request: Request, country_name: str):
     """
     Fetch detailed country info from REST Countries API (exact match).
     """
     try:
-        # Normalize input (capitalize first letter, handle special cases)
-        country_name = country_name.strip()
-        if not country_name:
-            raise HTTPException(status_code=400, detail="Country name is required")
-
-        # ✅ Use fullText=true for exact match
-        response = requests.get(f"{RESTCOUNTRIES_URL}{country_name}?fullText=true")
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=404, detail="Country not found")
-
-        data = response.json()[0]
-        name = data.get("name", {}).get("common")
-        capital = data.get("capital", [None])[0]
-        flag = data.get("flags", {}).get("svg")
-        currencies = data.get("currencies", {})
-        currency = list(currencies.keys())[0] if currencies else None
-        languages = list(data.get("languages", {}).values()) if data.get("languages") else []
-        latlng = data.get("latlng", [None, None])
-        region = data.get("region", "Unknown")
-        population = data.get("population", "N/A")
-
-        return JSONResponse({
-            "name": name,
-            "capital": capital,
-            "flag": flag,
-            "currency": currency,
-            "languages": languages,
-            "latlng": latlng,
-            "region": region,
-            "population": population
-        })
-
-    except requests.exceptions.RequestException:
+        return cached_json(request, await lookup_country(country_name), CACHE_MAX_AGE_LOCATION)
+
+    except (HTTPException, UpstreamBusy):
+        raise
+    except httpx.HTTPError:
         raise HTTPException(status_code=500, detail="External API request failed")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching country data: {str(e)}")
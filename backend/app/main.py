@@ -1,31 +1,81 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
+import anyio.to_thread
+import os
+import time
 
 # Import app modules
-from app.models import create_tables
+from app.migrations import run_migrations, rebuild_table, TABLE_MIGRATIONS
 from app.auth import router as auth_router
-from app.location import router as location_router
+from app.location import router as location_router, load_country_index, COUNTRY_PRELOAD
 from app.images import router as images_router
 from app.weather import router as weather_router
-from app.attractions import router as attractions_router
+from app.attractions import router as attractions_router, warm_attractions_cache, ATTRACTIONS_WARMUP_COUNTRIES
 from app.favorites import router as favorites_router
-from app.database import get_db_connection
+from app.snapshot import router as snapshot_router
+from app.database import init_pool, close_pool, pool_stats, PoolTimeout, ReadYourWritesMiddleware
+from app.http_client import init_http_client, close_http_client, upstream_stats, UPSTREAMS, UpstreamBusy
+from app.image_service import start_image_worker, stop_image_worker
+from app.hashing import init_hash_pool, close_hash_pool, HashPoolBusy
+from app.responses import FastJSONResponse
+from app.compression import CompressionMiddleware
+from app.metrics import MetricsMiddleware, render_prometheus
+from app.rate_limit import RateLimitMiddleware, rate_limit_stats
+from app.shared_cache import init_shared_cache, close_shared_cache, shared_cache_stats, invalidate
+from fastapi.responses import PlainTextResponse
 
+# Worker threads for the remaining sync (database) handlers
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
 
-# -------- Lifespan: Create Tables at Startup --------
+
+# -------- Lifespan: DB Pool, HTTP Client + Migrations at Startup --------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    init_http_client()
+    init_hash_pool()
+    init_shared_cache()
+    try:
+        init_pool()
+        print("✅ Database pool ready")
+    except Exception as e:
+        print("⚠️ Could not pre-open database connections:", e)
     try:
-        create_tables()
-        print("✅ Tables checked/created successfully")
+        run_migrations()
+        print("✅ Database schema up to date")
     except Exception as e:
-        print("⚠️ Could not create tables:", e)
+        print("⚠️ Could not run migrations:", e)
+    if COUNTRY_PRELOAD:
+        try:
+            count = await load_country_index(COUNTRY_PRELOAD)
+            print(f"✅ Preloaded {count} countries ({COUNTRY_PRELOAD})")
+        except Exception as e:
+            print("⚠️ Could not preload countries:", e)
+    if ATTRACTIONS_WARMUP_COUNTRIES > 0:
+        try:
+            started = time.perf_counter()
+            count = await run_in_threadpool(warm_attractions_cache)
+            print(f"✅ Warmed attraction summaries and {count} countries in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except Exception as e:
+            print("⚠️ Could not warm attraction caches:", e)
+    start_image_worker()
     yield
+    await stop_image_worker()
+    await close_http_client()
+    close_hash_pool()
+    close_shared_cache()
+    close_pool()
 
 
 # -------- App Setup --------
-app = FastAPI(title="Travel Snapshot API", lifespan=lifespan)
+app = FastAPI(title="Travel Snapshot API", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+
+# -------- Per-client rate limits (inside CORS so browsers can read the 429) --------
+app.add_middleware(RateLimitMiddleware)
 
 
 # -------- CORS Middleware --------
@@ -48,6 +98,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -------- Response Compression (brotli/gzip above COMPRESS_MIN_SIZE) --------
+app.add_middleware(CompressionMiddleware)
+
+# -------- Read-your-writes: pins a client's reads to the primary after it commits --------
+app.add_middleware(ReadYourWritesMiddleware)
+
+# -------- Metrics (outermost: sees the full request, sets Server-Timing) --------
+app.add_middleware(MetricsMiddleware)
+
+
+# -------- Pool exhaustion -> 503 --------
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": "Database busy, please retry"})
+
+
+# -------- Hashing queue full -> 429 --------
+@app.exception_handler(HashPoolBusy)
+async def hash_pool_busy_handler(request: Request, exc: HashPoolBusy):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many login attempts in progress, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+# -------- Upstream concurrency cap reached -> 429 --------
+@app.exception_handler(UpstreamBusy)
+async def upstream_busy_handler(request: Request, exc: UpstreamBusy):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"{exc}, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
 # -------- Include Routers --------
 app.include_router(auth_router)
@@ -56,6 +141,7 @@ app.include_router(images_router)
 app.include_router(weather_router)
 app.include_router(attractions_router)
 app.include_router(favorites_router)
+app.include_router(snapshot_router)
 
 
 # -------- Root Route --------
@@ -64,26 +150,58 @@ def root():
     return {"message": "🌍 Travel Snapshot Backend is running 🚀"}
 
 
+# -------- DB Pool Stats --------
+@app.get("/db/stats")
+def db_stats():
+    """Connection pool usage (primary and replicas), replica health and routing counts."""
+    return pool_stats()
+
+
+# -------- Prometheus Metrics --------
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(
+        render_prometheus(upstreams=UPSTREAMS, pool=pool_stats(), caches=shared_cache_stats()["caches"],
+                          rate_limits=rate_limit_stats()),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+# -------- Cache Stats --------
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Hit ratios per cache and per level (worker-local LRU, shared backend)."""
+    return shared_cache_stats()
+
+
+# -------- Upstream Stats --------
+@app.get("/upstreams/stats")
+def get_upstream_stats():
+    """Per-upstream circuit state, retries and latency percentiles."""
+    return upstream_stats()
+
+
+# -------- Rate Limit Stats --------
+@app.get("/ratelimit/stats")
+def get_rate_limit_stats():
+    """Rate limit rules with allowed/limited counts, and tracked clients."""
+    return rate_limit_stats()
+
+
 # -------- Drop Table (Admin Utility) --------
 @app.delete("/drop_table")
 def drop_table(table_name: str):
     """
-    Drop a table by name. ⚠️ Use carefully.
+    Drop a table by name and recreate it empty. ⚠️ Use carefully.
     Example: /drop_table?table_name=attractions
     """
-    allowed_tables = ["users", "favorites", "attractions"]
-    if table_name not in allowed_tables:
+    if table_name not in TABLE_MIGRATIONS:
         return {"error": f"Table '{table_name}' is not allowed to be dropped."}
 
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
-        cur.execute(f"DROP TABLE IF EXISTS {table_name} CASCADE;")
-        conn.commit()
-        return {"message": f"Table '{table_name}' dropped successfully"}
+        rebuild_table(table_name)
     except Exception as e:
-        conn.rollback()
         return {"error": f"Failed to drop table '{table_name}': {str(e)}"}
-    finally:
-        cur.close()
-        conn.close()
+    if table_name == "attractions":
+        invalidate("attractions")
+    return {"message": f"Table '{table_name}' dropped and recreated empty"}
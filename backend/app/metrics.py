@@ -0,0 +1,281 @@
+import bisect
+import contextvars
+import threading
+import time
+
+from starlette.datastructures import MutableHeaders
+
+# Latency bucket upper bounds in seconds (Prometheus-style, cumulative on export)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Thread-safe fixed-bucket histogram. ``observe`` is O(log buckets) and
+    memory is constant, so it can sit on every request path. Percentiles are
+    estimated by interpolating inside the bucket they fall in.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot: above the top bound
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def sum(self):
+        return self._sum
+
+    def cumulative(self):
+        """[(upper_bound, cumulative_count), ...] ending with ("+Inf", total)."""
+        with self._lock:
+            counts = list(self._counts)
+        out = []
+        running = 0
+        for bound, n in zip(self.buckets, counts):
+            running += n
+            out.append((bound, running))
+        out.append(("+Inf", running + counts[-1]))
+        return out
+
+    def percentile(self, pct: float) -> float:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+        if not total:
+            return 0.0
+        rank = total * pct / 100
+        running = 0
+        lower = 0.0
+        for i, n in enumerate(counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if n and running + n >= rank:
+                return lower + (upper - lower) * (rank - running) / n
+            running += n
+            lower = upper
+        return self.buckets[-1]
+
+    def summary(self):
+        """Count, mean and p50/p95/p99 in milliseconds."""
+        count = self._count
+        return {
+            "count": count,
+            "avg_ms": round(self._sum / count * 1000, 2) if count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p95_ms": round(self.percentile(95) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+        }
+
+
+# ---------------- Per-request accounting ----------------
+class RequestStats:
+    """
+    DB and upstream time spent on behalf of one request. A mutable object in
+    a contextvar, so work done in threadpool workers (which run in a copy of
+    the request's context) still lands on the same instance.
+    """
+
+    __slots__ = ("db_count", "db_seconds", "upstream_count", "upstream_seconds", "_lock")
+
+    def __init__(self):
+        self.db_count = 0
+        self.db_seconds = 0.0
+        self.upstream_count = 0
+        self.upstream_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_db(self, seconds: float):
+        with self._lock:
+            self.db_count += 1
+            self.db_seconds += seconds
+
+    def add_upstream(self, seconds: float):
+        with self._lock:
+            self.upstream_count += 1
+            self.upstream_seconds += seconds
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+db_query_latency = Histogram()
+_requests = {}  # (method, route, status) -> Histogram
+_requests_lock = threading.Lock()
+_in_flight = 0
+
+
+def record_db_query(seconds: float):
+    """Called by database.TimedCursor for every statement."""
+    db_query_latency.observe(seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.add_db(seconds)
+
+
+def record_upstream_call(seconds: float):
+    """Called by http_client for every upstream attempt."""
+    stats = _current.get()
+    if stats is not None:
+        stats.add_upstream(seconds)
+
+
+def _route_label(scope) -> str:
+    # Route templates, not raw paths, to keep label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _observe_request(method: str, route: str, status: int, seconds: float):
+    key = (method, route, status)
+    histogram = _requests.get(key)
+    if histogram is None:
+        with _requests_lock:
+            histogram = _requests.setdefault(key, Histogram())
+    histogram.observe(seconds)
+
+
+def server_timing(total_seconds: float, stats: RequestStats) -> str:
+    parts = [f"app;dur={total_seconds * 1000:.1f}"]
+    if stats.db_count:
+        parts.append(f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_count} queries"')
+    if stats.upstream_count:
+        parts.append(f'upstream;dur={stats.upstream_seconds * 1000:.1f};desc="{stats.upstream_count} calls"')
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: per-route latency histograms, in-flight gauge, and
+    a Server-Timing header with the request's DB and upstream time. Costs a
+    contextvar set, two clock reads and one histogram update per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        _in_flight += 1
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append("Server-Timing", server_timing(time.perf_counter() - started, stats))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _in_flight -= 1
+            _current.reset(token)
+            _observe_request(scope["method"], _route_label(scope), status, time.perf_counter() - started)
+
+
+# ---------------- Prometheus exposition ----------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels) -> list:
+    base = _labels(**labels)
+    sep = "," if base else ""
+    suffix = f"{{{base}}}" if base else ""
+    lines = [f'{name}_bucket{{{base}{sep}le="{bound}"}} {count}' for bound, count in histogram.cumulative()]
+    lines.append(f"{name}_sum{suffix} {histogram.sum}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
+
+
+def render_prometheus(upstreams: dict = None, pool: dict = None, caches: dict = None, rate_limits: dict = None) -> str:
+    """Text exposition format 0.0.4 for /metrics."""
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route template.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route, status), histogram in sorted(_requests.items()):
+        lines += _histogram_lines("http_request_duration_seconds", histogram, method=method, route=route, status=status)
+
+    lines += [
+        "# HELP http_requests_in_flight Requests currently being served.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {_in_flight}",
+        "# HELP db_query_duration_seconds Time per database statement.",
+        "# TYPE db_query_duration_seconds histogram",
+        *_histogram_lines("db_query_duration_seconds", db_query_latency),
+    ]
+
+    if upstreams:
+        lines += [
+            "# HELP upstream_request_duration_seconds Latency per upstream attempt.",
+            "# TYPE upstream_request_duration_seconds histogram",
+        ]
+        for name, policy in upstreams.items():
+            lines += _histogram_lines("upstream_request_duration_seconds", policy.latency, upstream=name)
+        lines += ["# HELP upstream_circuit_open 1 while the upstream's circuit breaker is open.",
+                  "# TYPE upstream_circuit_open gauge"]
+        lines += [f'upstream_circuit_open{{{_labels(upstream=name)}}} {int(policy.state == "open")}'
+                  for name, policy in upstreams.items()]
+        lines += ["# HELP upstream_requests_in_flight Calls in flight per upstream.",
+                  "# TYPE upstream_requests_in_flight gauge"]
+        lines += [f'upstream_requests_in_flight{{{_labels(upstream=name)}}} {policy.in_flight}'
+                  for name, policy in upstreams.items()]
+        lines += ["# HELP upstream_shed_total Calls refused because the upstream's concurrency cap was reached.",
+                  "# TYPE upstream_shed_total counter"]
+        lines += [f'upstream_shed_total{{{_labels(upstream=name)}}} {policy.shed}' for name, policy in upstreams.items()]
+
+    if pool:
+        lines += ["# HELP db_pool_connections Pool connections by state.", "# TYPE db_pool_connections gauge"]
+        lines += [f'db_pool_connections{{state="{state}"}} {pool.get(state, 0)}' for state in ("in_use", "idle", "waiting")]
+        if pool.get("routes"):
+            lines += ["# HELP db_checkouts_total Connection checkouts by target (primary/replica) and routing reason.",
+                      "# TYPE db_checkouts_total counter"]
+            lines += [f'db_checkouts_total{{{_labels(target=r["target"], reason=r["reason"])}}} {r["count"]}'
+                      for r in pool["routes"]]
+        if pool.get("replicas"):
+            lines += ["# HELP db_replica_available 1 while the replica is in the read rotation.",
+                      "# TYPE db_replica_available gauge"]
+            lines += [f'db_replica_available{{{_labels(replica=r["name"])}}} {int(r["available"])}'
+                      for r in pool["replicas"]]
+
+    if caches:
+        lines += ["# HELP cache_lookups_total Cache lookups by cache, level and result.",
+                  "# TYPE cache_lookups_total counter"]
+        for name, stats in caches.items():
+            for level, counts in stats["levels"].items():
+                for result, key in (("hit", "hits"), ("miss", "misses")):
+                    labels = _labels(cache=name, level=level, result=result)
+                    lines.append(f"cache_lookups_total{{{labels}}} {counts[key]}")
+
+    if rate_limits:
+        lines += ["# HELP rate_limit_requests_total Rate-limited route requests by rule and outcome.",
+                  "# TYPE rate_limit_requests_total counter"]
+        for rule in rate_limits["rules"]:
+            for result in ("allowed", "limited"):
+                lines.append(f'rate_limit_requests_total{{{_labels(rule=rule["prefix"], result=result)}}} {rule[result]}')
+
+    return "\n".join(lines) + "\n"
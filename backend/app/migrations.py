@@ -0,0 +1,327 @@
+from app.database import db_connection
+
+# Arbitrary key for pg_advisory_lock so only one worker migrates at a time
+MIGRATION_LOCK_ID = 72_410_001
+
+# (version, name, sql). Append only: never edit a migration once released.
+MIGRATIONS = [
+    (1, "base tables", """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS attractions (
+            id SERIAL PRIMARY KEY,
+            country VARCHAR(100) NOT NULL,
+            name VARCHAR(200) NOT NULL,
+            lat FLOAT NOT NULL,
+            lng FLOAT NOT NULL,
+            description TEXT,
+            image1 TEXT,
+            image2 TEXT,
+            image3 TEXT,
+            image4 TEXT,
+            status VARCHAR(50) DEFAULT 'available'
+        );
+
+        CREATE TABLE IF NOT EXISTS favorites (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            attraction_id INTEGER REFERENCES attractions(id) ON DELETE CASCADE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (2, "image cache", """
+        CREATE TABLE IF NOT EXISTS image_cache (
+            query TEXT PRIMARY KEY,
+            urls TEXT[] NOT NULL,
+            fetched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (3, "unique attractions per country", """
+        -- Point favorites at the surviving row before dropping duplicates
+        UPDATE favorites f SET attraction_id = d.keep_id
+        FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY country, name) AS keep_id FROM attractions
+        ) d
+        WHERE f.attraction_id = d.id AND d.id <> d.keep_id;
+
+        DELETE FROM attractions a USING attractions b
+        WHERE a.country = b.country AND a.name = b.name AND a.id > b.id;
+
+        -- Also serves WHERE country = %s lookups (leading column)
+        CREATE UNIQUE INDEX IF NOT EXISTS attractions_country_name_key ON attractions (country, name);
+    """),
+    (4, "unique favorites per user", """
+        DELETE FROM favorites a USING favorites b
+        WHERE a.user_id = b.user_id AND a.attraction_id = b.attraction_id AND a.id > b.id;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS favorites_user_attraction_key ON favorites (user_id, attraction_id);
+        -- ON DELETE CASCADE from attractions looks favorites up by attraction_id
+        CREATE INDEX IF NOT EXISTS favorites_attraction_id_idx ON favorites (attraction_id);
+    """),
+    (5, "attraction grid cells", """
+        -- 0.5 degree grid, must match app.geo.grid_cell
+        ALTER TABLE attractions ADD COLUMN IF NOT EXISTS grid_cell INTEGER GENERATED ALWAYS AS (
+            LEAST(GREATEST(floor((lat + 90) / 0.5)::int, 0), 359) * 720
+            + LEAST(GREATEST(floor((lng + 180) / 0.5)::int, 0), 719)
+        ) STORED;
+
+        CREATE INDEX IF NOT EXISTS attractions_grid_cell_idx ON attractions (grid_cell, lat, lng);
+    """),
+    (6, "keyset pagination indexes", """
+        -- Listings page by id within a country / user
+        CREATE INDEX IF NOT EXISTS attractions_country_id_idx ON attractions (country, id);
+        CREATE INDEX IF NOT EXISTS favorites_user_id_idx ON favorites (user_id, id);
+    """),
+    (7, "per-country attraction versions", """
+        -- Bumped once per statement for every country it touched; backs listing ETags
+        CREATE TABLE IF NOT EXISTS attraction_versions (
+            country VARCHAR(100) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 1
+        );
+        INSERT INTO attraction_versions (country)
+        SELECT DISTINCT country FROM attractions
+        ON CONFLICT (country) DO NOTHING;
+
+        CREATE OR REPLACE FUNCTION bump_attraction_versions() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO attraction_versions (country)
+                SELECT DISTINCT country FROM new_rows
+                ON CONFLICT (country) DO UPDATE SET version = attraction_versions.version + 1;
+            ELSIF TG_OP = 'UPDATE' THEN
+                INSERT INTO attraction_versions (country)
+                SELECT country FROM new_rows UNION SELECT country FROM old_rows
+                ON CONFLICT (country) DO UPDATE SET version = attraction_versions.version + 1;
+            ELSE
+                INSERT INTO attraction_versions (country)
+                SELECT DISTINCT country FROM old_rows
+                ON CONFLICT (country) DO UPDATE SET version = attraction_versions.version + 1;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Transition tables allow only one event per trigger
+        DROP TRIGGER IF EXISTS attractions_versions_insert ON attractions;
+        CREATE TRIGGER attractions_versions_insert AFTER INSERT ON attractions
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_attraction_versions();
+        DROP TRIGGER IF EXISTS attractions_versions_update ON attractions;
+        CREATE TRIGGER attractions_versions_update AFTER UPDATE ON attractions
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_attraction_versions();
+        DROP TRIGGER IF EXISTS attractions_versions_delete ON attractions;
+        CREATE TRIGGER attractions_versions_delete AFTER DELETE ON attractions
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_attraction_versions();
+    """),
+    (8, "attraction search", """
+        -- Names outrank descriptions. 'english' must match the to_tsquery in app.attractions
+        ALTER TABLE attractions ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED;
+        CREATE INDEX IF NOT EXISTS attractions_search_idx ON attractions USING GIN (search_vector);
+
+        -- Typo-tolerant fallback on names. pg_trgm is optional (it may not be
+        -- installed or allowed); search is then full-text only.
+        DO $$
+        BEGIN
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        EXCEPTION WHEN OTHERS THEN
+            RAISE NOTICE 'pg_trgm unavailable (%), fuzzy search disabled', SQLERRM;
+        END $$;
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+                CREATE INDEX IF NOT EXISTS attractions_name_trgm_idx ON attractions USING GIN (name gin_trgm_ops);
+            END IF;
+        END $$;
+    """),
+    (9, "per-country attraction summaries", """
+        -- Count, bounding box and centroid per country, kept current by the
+        -- statement triggers below. The centroid is the mean of unit vectors
+        -- (sum_x/y/z), which stays right for countries crossing the antimeridian.
+        CREATE TABLE IF NOT EXISTS attraction_summaries (
+            country VARCHAR(100) PRIMARY KEY,
+            attraction_count BIGINT NOT NULL,
+            min_lat FLOAT,
+            max_lat FLOAT,
+            min_lng FLOAT,
+            max_lng FLOAT,
+            sum_x FLOAT NOT NULL DEFAULT 0,
+            sum_y FLOAT NOT NULL DEFAULT 0,
+            sum_z FLOAT NOT NULL DEFAULT 0,
+            last_modified TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        INSERT INTO attraction_summaries
+            (country, attraction_count, min_lat, max_lat, min_lng, max_lng, sum_x, sum_y, sum_z)
+        SELECT country, count(*), min(lat), max(lat), min(lng), max(lng),
+               sum(cos(radians(lat)) * cos(radians(lng))), sum(cos(radians(lat)) * sin(radians(lng))),
+               sum(sin(radians(lat)))
+        FROM attractions
+        GROUP BY country
+        ON CONFLICT (country) DO NOTHING;
+
+        -- Updates count as removing the old rows and adding the new ones
+        CREATE OR REPLACE FUNCTION update_attraction_summaries() RETURNS trigger AS $$
+        DECLARE
+            edge_countries TEXT[];
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                WITH removed AS (
+                    SELECT country, count(*) AS n, min(lat) AS min_lat, max(lat) AS max_lat,
+                           min(lng) AS min_lng, max(lng) AS max_lng,
+                           sum(cos(radians(lat)) * cos(radians(lng))) AS sx,
+                           sum(cos(radians(lat)) * sin(radians(lng))) AS sy,
+                           sum(sin(radians(lat))) AS sz
+                    FROM old_rows
+                    GROUP BY country
+                ), updated AS (
+                    UPDATE attraction_summaries s
+                    SET attraction_count = s.attraction_count - r.n,
+                        sum_x = s.sum_x - r.sx, sum_y = s.sum_y - r.sy, sum_z = s.sum_z - r.sz,
+                        last_modified = now()
+                    FROM removed r
+                    WHERE s.country = r.country
+                    RETURNING s.country, r.min_lat <= s.min_lat OR r.max_lat >= s.max_lat
+                                         OR r.min_lng <= s.min_lng OR r.max_lng >= s.max_lng AS on_edge
+                )
+                SELECT array_agg(country) FILTER (WHERE on_edge) INTO edge_countries FROM updated;
+
+                -- A bounding box can't shrink incrementally: rescan countries that lost an edge row
+                IF edge_countries IS NOT NULL THEN
+                    UPDATE attraction_summaries s
+                    SET min_lat = b.min_lat, max_lat = b.max_lat, min_lng = b.min_lng, max_lng = b.max_lng
+                    FROM (
+                        SELECT country, min(lat) AS min_lat, max(lat) AS max_lat, min(lng) AS min_lng, max(lng) AS max_lng
+                        FROM attractions
+                        WHERE country = ANY(edge_countries)
+                        GROUP BY country
+                    ) b
+                    WHERE s.country = b.country;
+                END IF;
+            END IF;
+
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO attraction_summaries AS s
+                    (country, attraction_count, min_lat, max_lat, min_lng, max_lng, sum_x, sum_y, sum_z)
+                SELECT country, count(*), min(lat), max(lat), min(lng), max(lng),
+                       sum(cos(radians(lat)) * cos(radians(lng))), sum(cos(radians(lat)) * sin(radians(lng))),
+                       sum(sin(radians(lat)))
+                FROM new_rows
+                GROUP BY country
+                ON CONFLICT (country) DO UPDATE
+                SET attraction_count = s.attraction_count + EXCLUDED.attraction_count,
+                    min_lat = LEAST(s.min_lat, EXCLUDED.min_lat), max_lat = GREATEST(s.max_lat, EXCLUDED.max_lat),
+                    min_lng = LEAST(s.min_lng, EXCLUDED.min_lng), max_lng = GREATEST(s.max_lng, EXCLUDED.max_lng),
+                    sum_x = s.sum_x + EXCLUDED.sum_x, sum_y = s.sum_y + EXCLUDED.sum_y, sum_z = s.sum_z + EXCLUDED.sum_z,
+                    last_modified = now();
+            END IF;
+
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM attraction_summaries WHERE attraction_count <= 0;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS attractions_summaries_insert ON attractions;
+        CREATE TRIGGER attractions_summaries_insert AFTER INSERT ON attractions
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION update_attraction_summaries();
+        DROP TRIGGER IF EXISTS attractions_summaries_update ON attractions;
+        CREATE TRIGGER attractions_summaries_update AFTER UPDATE ON attractions
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION update_attraction_summaries();
+        DROP TRIGGER IF EXISTS attractions_summaries_delete ON attractions;
+        CREATE TRIGGER attractions_summaries_delete AFTER DELETE ON attractions
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION update_attraction_summaries();
+    """),
+]
+
+
+def run_migrations():
+    """
+    Apply pending migrations in order, each in its own transaction, and
+    record them in schema_migrations. Returns the versions applied.
+    """
+    applied_now = []
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_ID,))
+        try:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            conn.commit()
+
+            cur.execute("SELECT version FROM schema_migrations;")
+            applied = {row[0] for row in cur.fetchall()}
+
+            for version, name, sql in MIGRATIONS:
+                if version in applied:
+                    continue
+                try:
+                    cur.execute(sql)
+                    cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);", (version, name))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied_now.append(version)
+                print(f"✅ Applied migration {version}: {name}")
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID,))
+            conn.commit()
+            cur.close()
+    return applied_now
+
+
+# Migrations that build each droppable table; rebuild_table re-runs them
+TABLE_MIGRATIONS = {
+    "users": (1,),
+    "attractions": (1, 3, 5, 6, 7, 8, 9),
+    "favorites": (1, 4, 6),
+    "image_cache": (2,),
+}
+# Tables whose foreign keys point at a dropped table; CASCADE would only drop
+# the constraint, so they are dropped and rebuilt along with it
+DROPPED_WITH = {"users": ("favorites",), "attractions": ("favorites",)}
+
+
+def rebuild_table(table_name: str) -> list:
+    """
+    Drop ``table_name`` (and DROPPED_WITH it) and recreate it empty by
+    forgetting and re-running the migrations that built it. Returns the
+    versions re-applied.
+    """
+    tables = (table_name, *DROPPED_WITH.get(table_name, ()))
+    versions = sorted({version for table in tables for version in TABLE_MIGRATIONS[table]})
+    with db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"DROP TABLE IF EXISTS {', '.join(tables)} CASCADE;")
+            if table_name == "attractions":
+                # Derived from attractions. Versions keep counting rather than restart,
+                # so an ETag handed out before the drop can never match again.
+                cur.execute("TRUNCATE attraction_summaries;")
+                cur.execute("UPDATE attraction_versions SET version = version + 1;")
+            cur.execute("DELETE FROM schema_migrations WHERE version = ANY(%s);", (versions,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return run_migrations()
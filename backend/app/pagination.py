@@ -0,0 +1,115 @@
+import base64
+import json
+import os
+
+from fastapi import HTTPException
+
+# Page size when a listing is requested without ?limit=, and the hard cap
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "500"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+
+def _encode(state: dict) -> str:
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> dict:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(state, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return state
+
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque cursor pointing just past the row with id ``last_id``."""
+    return _encode({"after": last_id})
+
+
+def decode_cursor(cursor):
+    """Row id to continue after, or None for the first page."""
+    if not cursor:
+        return None
+    after = _decode(cursor).get("after")
+    if not isinstance(after, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return after
+
+
+def encode_offset_cursor(offset: int, **state) -> str:
+    """
+    Cursor for ranked results, which have no stable key to continue after.
+    Extra ``state`` (e.g. which query produced the first page) rides along.
+    """
+    return _encode({"offset": offset, **state})
+
+
+def decode_offset_cursor(cursor, max_offset: int):
+    """(offset, state) from an offset cursor, or (0, {}) for the first page."""
+    if not cursor:
+        return 0, {}
+    state = _decode(cursor)
+    offset = state.pop("offset", None)
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset > max_offset:
+        raise HTTPException(status_code=400, detail=f"Results past {max_offset} are not available; refine the query")
+    return offset, state
+
+
+def parse_fields(fields, columns: dict) -> list:
+    """
+    Validate a comma-separated ``fields=`` projection against ``columns``
+    (output field -> SQL expressions). ``id`` is always included since the
+    cursor is built from it. Returns the output fields in ``columns`` order.
+    """
+    if not fields:
+        return list(columns)
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(columns)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(columns)}",
+        )
+    requested.add("id")
+    return [f for f in columns if f in requested]
+
+
+def select_list(selected: list, columns: dict) -> str:
+    return ", ".join(expr for field in selected for expr in columns[field])
+
+
+def build_rows(rows, selected: list, columns: dict, convert=None) -> list:
+    """
+    Turn result tuples back into dicts. Fields backed by several columns
+    (e.g. images) are passed to ``convert[field]`` as a tuple.
+    """
+    convert = convert or {}
+    items = []
+    for row in rows:
+        item = {}
+        i = 0
+        for field in selected:
+            width = len(columns[field])
+            if field in convert:
+                item[field] = convert[field](row[i:i + width])
+            else:
+                item[field] = row[i]
+            i += width
+        items.append(item)
+    return items
+
+
+def page(items: list, limit: int):
+    """
+    Trim an over-fetched list (``limit + 1`` rows) to ``limit`` and return it
+    with the cursor for the next page, or None when this is the last page.
+    """
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(items[-1]["id"])
@@ -0,0 +1,163 @@
+import math
+import os
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+from app.responses import FastJSONResponse
+from app.security import bearer_token, verify_token
+
+# Per-client token buckets by path prefix: "<prefix>=<requests per second>/<burst>",
+# comma-separated; the longest matching prefix applies, unmatched paths are
+# not limited. Buckets live in each worker, so with N workers a client may get
+# up to N times the rate unless the load balancer keeps it on one worker.
+# Responses marked "X-Cache: hit" hand their token back, so the image proxy
+# rule only meters thumbnails that had to be fetched from the origin.
+RATE_LIMIT_RULES = os.getenv(
+    "RATE_LIMIT_RULES",
+    "/images/proxy/=50/500,/images/=1/10,/weather=5/30,/location/=5/30,/snapshot/=5/30",
+)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+# Buckets kept per worker; the least recently seen clients are dropped first
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+
+
+def parse_rules(spec: str) -> list:
+    """[(prefix, rate, burst)] from RATE_LIMIT_RULES, longest prefix first."""
+    rules = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        prefix, _, limit = item.strip().rpartition("=")
+        rate, _, burst = limit.partition("/")
+        if not prefix or float(rate) <= 0:
+            raise ValueError(f"Invalid rate limit rule: {item!r}")
+        rules.append((prefix, float(rate), float(burst or rate)))
+    return sorted(rules, key=lambda rule: len(rule[0]), reverse=True)
+
+
+class RateLimiter:
+    """
+    Token buckets per (rule, client): each holds up to ``burst`` tokens and
+    refills at ``rate`` per second; a request takes one token or is refused
+    with the seconds until one is available. Only used from the event loop,
+    so no locking.
+    """
+
+    def __init__(self, rules: list, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rules = rules
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # (prefix, client) -> [tokens, updated_at]
+        self.allowed = {prefix: 0 for prefix, _, _ in rules}
+        self.limited = {prefix: 0 for prefix, _, _ in rules}
+        self.refunded = {prefix: 0 for prefix, _, _ in rules}
+
+    def rule_for(self, path: str):
+        for rule in self.rules:
+            if path.startswith(rule[0]):
+                return rule
+        return None
+
+    def acquire(self, rule, client: str, now: float = None) -> float:
+        """0 if the request may proceed, else seconds until it could."""
+        prefix, rate, burst = rule
+        now = time.monotonic() if now is None else now
+        key = (prefix, client)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            self.allowed[prefix] += 1
+            return 0.0
+        self.limited[prefix] += 1
+        return (1 - bucket[0]) / rate
+
+    def refund(self, rule, client: str):
+        """Give back the token taken for a request that turned out cheap."""
+        prefix, _, burst = rule
+        bucket = self._buckets.get((prefix, client))
+        if bucket is not None:
+            bucket[0] = min(burst, bucket[0] + 1)
+            self.refunded[prefix] += 1
+
+    def stats(self):
+        return {
+            "enabled": RATE_LIMIT_ENABLED,
+            "clients": len(self._buckets),
+            "rules": [
+                {"prefix": prefix, "rate": rate, "burst": burst,
+                 "allowed": self.allowed[prefix], "limited": self.limited[prefix],
+                 "refunded": self.refunded[prefix]}
+                for prefix, rate, burst in self.rules
+            ],
+        }
+
+
+limiter = RateLimiter(parse_rules(RATE_LIMIT_RULES))
+
+
+def client_id(scope) -> str:
+    """``user:<id>`` for a valid bearer token, else ``ip:<address>``."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            try:
+                user_id = verify_token(bearer_token(value.decode("latin-1"))).get("user_id")
+            except HTTPException:
+                break
+            if user_id:
+                return f"user:{user_id}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """
+    Answer 429 with Retry-After once a client has used up its bucket for the
+    route, instead of queueing its requests behind everyone else's. Clients
+    are identified by the user in their JWT, else by IP address (run uvicorn
+    with --proxy-headers behind a proxy so that is the real client's).
+    """
+
+    def __init__(self, app, limiter: RateLimiter = limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        rule = self.limiter.rule_for(scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = client_id(scope)
+        wait = self.limiter.acquire(rule, client)
+        if not wait:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and (b"x-cache", b"hit") in message.get("headers", []):
+                    self.limiter.refund(rule, client)
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+            return
+        response = FastJSONResponse(
+            {"detail": "Too many requests, please retry later"},
+            status_code=429,
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+        await response(scope, receive, send)
+
+
+def rate_limit_stats():
+    return limiter.stats()
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import threading
+import time
+
+import jwt
+from fastapi import Header, HTTPException
+
+from app.cache import TTLCache
+
+JWT_SECRET = os.environ["JWT_SECRET"]
+ALGORITHM = "HS256"
+
+# Verified tokens, keyed by sha256 of the token and expiring at its exp
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Lifetime for tokens that carry no exp claim
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+# token hash -> exp (epoch seconds); kept only until the token would expire anyway.
+# In-process: with several workers each one only knows its own logouts.
+_revoked = {}
+_revoked_lock = threading.Lock()
+_stats = {"verifications": 0, "verify_time_total_ms": 0.0, "failures": 0, "revoked_rejections": 0}
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _is_revoked(key: str) -> bool:
+    exp = _revoked.get(key)
+    return exp is not None and exp > time.time()
+
+
+def revoke_token(token: str):
+    """Reject ``token`` from now on, until its expiry."""
+    payload = verify_token(token)
+    key = token_key(token)
+    now = time.time()
+    with _revoked_lock:
+        for stale in [k for k, exp in _revoked.items() if exp <= now]:
+            del _revoked[stale]
+        _revoked[key] = payload.get("exp", now + TOKEN_CACHE_TTL)
+    token_cache.delete(key)
+
+
+def verify_token(token: str) -> dict:
+    """
+    Claims of a valid, unrevoked token. Tokens verified before are served
+    from the cache until they expire, skipping the signature check.
+    """
+    key = token_key(token)
+    if _is_revoked(key):
+        _stats["revoked_rejections"] += 1
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
+    started = time.perf_counter()
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        _stats["failures"] += 1
+        raise HTTPException(status_code=401, detail="Token expired")
+    except jwt.InvalidTokenError:
+        _stats["failures"] += 1
+        raise HTTPException(status_code=401, detail="Invalid token")
+    finally:
+        _stats["verifications"] += 1
+        _stats["verify_time_total_ms"] += (time.perf_counter() - started) * 1000
+
+    ttl = payload["exp"] - time.time() if "exp" in payload else None
+    token_cache.set(key, payload, ttl=ttl)
+    return payload
+
+
+def bearer_token(authorization: str) -> str:
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid authorization header")
+    return authorization[len("Bearer "):].strip()
+
+
+# ---------------- Dependency ----------------
+def get_current_user(authorization: str = Header(...)) -> int:
+    """Extract user_id from the Bearer token"""
+    payload = verify_token(bearer_token(authorization))
+    user_id = payload.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    return user_id
+
+
+def auth_stats():
+    verifications = _stats["verifications"]
+    return {
+        "cache": token_cache.stats(),
+        **_stats,
+        "verify_time_total_ms": round(_stats["verify_time_total_ms"], 3),
+        "verify_time_avg_ms": round(_stats["verify_time_total_ms"] / verifications, 4) if verifications else 0.0,
+        "revoked": len(_revoked),
+    }
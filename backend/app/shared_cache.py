@@ -0,0 +1,474 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+
+from starlette.concurrency import run_in_threadpool
+
+from app.cache import TTLCache
+from app.responses import dumps, loads
+
+try:
+    import redis
+except ImportError:  # optional: only needed for redis:// URLs
+    redis = None
+
+# Shared tier behind the per-worker LRUs. Empty: per-worker caches only.
+#   sqlite:////var/tmp/app-cache.db  (one host; four slashes = absolute path)
+#   redis://localhost:6379/0         (any Redis-compatible server)
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+# How often SQLite-backed workers look for invalidations (Redis pushes them)
+CACHE_INVALIDATION_POLL = float(os.getenv("CACHE_INVALIDATION_POLL", "0.5"))
+INVALIDATION_CHANNEL = "cache-invalidations"
+
+
+# ---------------- Backends ----------------
+class SQLiteBackend:
+    """
+    Entries plus an append-only invalidation log in one SQLite file, shared
+    by the workers on a host. Subscribers poll the log for new rows.
+    """
+
+    name = "sqlite"
+    _PURGE_EVERY = 1000  # writes between sweeps of expired entries
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS invalidations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prefix TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+        """)
+
+    def _conn(self):
+        # sqlite3 connections must stay on the thread that made them
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")  # readers don't block the writer
+            conn.execute("PRAGMA synchronous=OFF;")  # a cache: losing the last writes on a crash is fine
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get_many(self, keys: list) -> dict:
+        """key -> (value bytes, seconds left) for the live entries among ``keys``."""
+        now = time.time()
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self._conn().execute(
+                f"SELECT key, value, expires_at FROM entries WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?;",
+                (*chunk, now),
+            ).fetchall()
+            found.update((key, (value, expires_at - now)) for key, value, expires_at in rows)
+        return found
+
+    def set_many(self, entries: list):
+        """Store (key, value bytes, ttl seconds) triples."""
+        now = time.time()
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?);",
+            [(key, value, now + ttl) for key, value, ttl in entries],
+        )
+        with self._lock:
+            self._writes += len(entries)
+            purge = self._writes >= self._PURGE_EVERY
+            if purge:
+                self._writes = 0
+        if purge:
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?;", (now,))
+            conn.execute("DELETE FROM invalidations WHERE created_at < ?;", (now - 3600,))
+
+    def delete_prefix(self, prefix: str):
+        # Range form so the primary key index is used
+        self._conn().execute("DELETE FROM entries WHERE key >= ? AND key < ?;", (prefix, prefix + "\U0010ffff"))
+
+    def publish(self, prefix: str):
+        self._conn().execute("INSERT INTO invalidations (prefix, created_at) VALUES (?, ?);", (prefix, time.time()))
+
+    def subscribe(self):
+        return _SQLiteSubscription(self)
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class _SQLiteSubscription:
+    def __init__(self, backend: SQLiteBackend):
+        self._backend = backend
+        self._closed = threading.Event()
+        row = backend._conn().execute("SELECT COALESCE(MAX(id), 0) FROM invalidations;").fetchone()
+        self._last_id = row[0]
+
+    def poll(self, timeout: float) -> list:
+        """Prefixes published since the last poll; waits up to ``timeout`` when there are none."""
+        rows = self._backend._conn().execute(
+            "SELECT id, prefix FROM invalidations WHERE id > ? ORDER BY id;", (self._last_id,)
+        ).fetchall()
+        if not rows:
+            self._closed.wait(timeout)
+            return []
+        self._last_id = rows[-1][0]
+        return [prefix for _, prefix in rows]
+
+    def close(self):
+        self._closed.set()
+
+
+class RedisBackend:
+    """Entries as Redis keys with a TTL; invalidations over pub/sub."""
+
+    name = "redis"
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_many(self, keys: list) -> dict:
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+            pipe.pttl(key)
+        replies = pipe.execute()
+        found = {}
+        for key, value, pttl in zip(keys, replies[::2], replies[1::2]):
+            if value is not None:
+                found[key] = (value, pttl / 1000 if pttl > 0 else None)
+        return found
+
+    def set_many(self, entries: list):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value, ttl in entries:
+            pipe.set(key, value, px=max(int(ttl * 1000), 1))
+        pipe.execute()
+
+    def delete_prefix(self, prefix: str):
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", prefix) + "*"
+        batch = []
+        for key in self.client.scan_iter(match=pattern, count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                self.client.unlink(*batch)
+                batch = []
+        if batch:
+            self.client.unlink(*batch)
+
+    def publish(self, prefix: str):
+        self.client.publish(INVALIDATION_CHANNEL, prefix)
+
+    def subscribe(self):
+        return _RedisSubscription(self.client)
+
+    def close(self):
+        self.client.close()
+
+
+class _RedisSubscription:
+    def __init__(self, client):
+        # Subscribe confirmations are skipped in poll; with ignore_subscribe_messages
+        # get_message would return None for them and end the drain early
+        self._pubsub = client.pubsub()
+        self._pubsub.subscribe(INVALIDATION_CHANNEL)
+
+    def poll(self, timeout: float) -> list:
+        prefixes = []
+        message = self._pubsub.get_message(timeout=timeout)
+        while message is not None:
+            if message["type"] == "message":
+                data = message["data"]
+                prefixes.append(data.decode() if isinstance(data, bytes) else data)
+            message = self._pubsub.get_message(timeout=0)
+        return prefixes
+
+    def close(self):
+        self._pubsub.close()
+
+
+def make_backend(url: str):
+    """Backend for a SHARED_CACHE_URL (SQLAlchemy-style sqlite:/// paths), or None when empty."""
+    if not url:
+        return None
+    scheme, _, rest = url.partition("://")
+    if scheme == "sqlite":
+        return SQLiteBackend(rest[1:] if rest.startswith("/") else rest)
+    if scheme in ("redis", "rediss", "unix"):
+        if redis is None:
+            raise RuntimeError("SHARED_CACHE_URL is a Redis URL but the redis package is not installed")
+        client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        client.ping()
+        return RedisBackend(client)
+    raise ValueError(f"Unsupported SHARED_CACHE_URL scheme: {scheme}")
+
+
+# ---------------- Two-level cache ----------------
+_backend = None
+_subscription = None
+_listener = None
+_stopping = threading.Event()
+_caches = weakref.WeakSet()
+_stats = {"invalidations_sent": 0, "invalidations_received": 0}
+
+
+class SharedCache:
+    """
+    This worker's LRU (a ``TTLCache``) in front of the shared backend from
+    SHARED_CACHE_URL, so workers reuse each other's results. Values must be
+    JSON-serializable. Without a backend it is just the LRU.
+
+    Keys live under ``namespace``. ``invalidate(prefix)`` drops matching
+    keys here and in the backend and tells every other worker to drop its
+    local copies. The ``a*`` methods keep backend I/O off the event loop.
+    """
+
+    def __init__(self, namespace: str, maxsize=1024, ttl=300.0, backend=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._backend = backend  # None: the process-wide backend, if any
+        self._lock = threading.Lock()
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_errors = 0
+        _caches.add(self)
+
+    @property
+    def backend(self):
+        return self._backend if self._backend is not None else _backend
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _count(self, hits=0, misses=0, errors=0):
+        with self._lock:
+            self.shared_hits += hits
+            self.shared_misses += misses
+            self.shared_errors += errors
+
+    # ---- reads ----
+    def _local_lookup(self, keys):
+        found, missing = {}, {}
+        for key in keys:
+            full = self._key(key)
+            value = self.local.get(full)
+            if value is not None:
+                found[key] = value
+            else:
+                missing[full] = key
+        return found, missing
+
+    def _load(self, missing: dict) -> dict:
+        """Fetch local misses (full key -> key) from the backend and keep them locally."""
+        backend = self.backend
+        if not missing or backend is None:
+            return {}
+        try:
+            entries = backend.get_many(list(missing))
+        except Exception:
+            self._count(errors=1, misses=len(missing))
+            return {}
+        found = {}
+        for full, key in missing.items():
+            entry = entries.get(full)
+            if entry is None:
+                continue
+            raw, remaining = entry
+            value = loads(raw)
+            self.local.set(full, value, ttl=min(self.ttl, remaining) if remaining else None)
+            found[key] = value
+        self._count(hits=len(found), misses=len(missing) - len(found))
+        return found
+
+    def get(self, key, default=None):
+        found = self.get_many([key])
+        return found.get(key, default)
+
+    def get_many(self, keys) -> dict:
+        """key -> value for the keys found at either level."""
+        found, missing = self._local_lookup(keys)
+        found.update(self._load(missing))
+        return found
+
+    async def aget(self, key, default=None):
+        found = await self.aget_many([key])
+        return found.get(key, default)
+
+    async def aget_many(self, keys) -> dict:
+        found, missing = self._local_lookup(keys)
+        if missing and self.backend is not None:
+            found.update(await run_in_threadpool(self._load, missing))
+        return found
+
+    # ---- writes ----
+    def _prepare(self, entries):
+        stored = []
+        for key, value, ttl in entries:
+            ttl = self.ttl if ttl is None else ttl
+            if ttl <= 0:
+                continue
+            full = self._key(key)
+            self.local.set(full, value, ttl=ttl)
+            stored.append((full, value, ttl))
+        return stored
+
+    def _store(self, stored: list):
+        backend = self.backend
+        if not stored or backend is None:
+            return
+        try:
+            backend.set_many([(full, dumps(value), ttl) for full, value, ttl in stored])
+        except Exception:
+            self._count(errors=1)
+
+    def set(self, key, value, ttl=None):
+        self._store(self._prepare([(key, value, ttl)]))
+
+    def set_many(self, entries):
+        """Store (key, value, ttl) triples; ttl None means the cache default."""
+        self._store(self._prepare(entries))
+
+    async def aset(self, key, value, ttl=None):
+        await self.aset_many([(key, value, ttl)])
+
+    async def aset_many(self, entries):
+        stored = self._prepare(entries)
+        if stored and self.backend is not None:
+            await run_in_threadpool(self._store, stored)
+
+    # ---- invalidation ----
+    def evict_local(self, full_prefix: str) -> int:
+        """Drop this worker's copies of keys under ``full_prefix`` (namespace included)."""
+        if not full_prefix.startswith(f"{self.namespace}:"):
+            return 0
+        return self.local.delete_prefix(full_prefix)
+
+    def invalidate(self, prefix: str = ""):
+        """Drop keys starting with ``prefix`` at both levels, in every worker."""
+        full_prefix = self._key(prefix)
+        self.evict_local(full_prefix)
+        backend = self.backend
+        if backend is None:
+            return
+        try:
+            backend.delete_prefix(full_prefix)
+            backend.publish(full_prefix)
+            _stats["invalidations_sent"] += 1
+        except Exception as e:
+            self._count(errors=1)
+            print(f"⚠️ Cache invalidation of {full_prefix!r} failed:", e)
+
+    def clear(self):
+        self.invalidate("")
+
+    def __len__(self):
+        return len(self.local)
+
+    def stats(self):
+        local = self.local.stats()
+        with self._lock:
+            shared_hits, shared_misses, errors = self.shared_hits, self.shared_misses, self.shared_errors
+        lookups = local["hits"] + local["misses"]
+        hits = local["hits"] + shared_hits
+        shared_lookups = shared_hits + shared_misses
+        return {
+            "size": local["size"],
+            "maxsize": local["maxsize"],
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": local["evictions"],
+            "expirations": local["expirations"],
+            "levels": {
+                "local": {"hits": local["hits"], "misses": local["misses"], "hit_ratio": local["hit_ratio"]},
+                "shared": {
+                    "backend": self.backend.name if self.backend is not None else None,
+                    "hits": shared_hits,
+                    "misses": shared_misses,
+                    "hit_ratio": round(shared_hits / shared_lookups, 4) if shared_lookups else 0.0,
+                    "errors": errors,
+                },
+            },
+        }
+
+
+def invalidate(namespace: str, prefix: str = ""):
+    """``invalidate`` on the process-wide cache for ``namespace``, for modules that don't own it."""
+    for cache in list(_caches):
+        if cache.namespace == namespace and cache._backend is None:
+            cache.invalidate(prefix)
+            return
+
+
+# ---------------- Lifecycle ----------------
+def _listen(subscription):
+    while not _stopping.is_set():
+        try:
+            prefixes = subscription.poll(CACHE_INVALIDATION_POLL)
+        except Exception as e:
+            if _stopping.is_set():
+                return
+            print("⚠️ Cache invalidation listener error:", e)
+            _stopping.wait(1)
+            continue
+        for prefix in prefixes:
+            _stats["invalidations_received"] += 1
+            for cache in list(_caches):
+                if cache._backend is None:
+                    cache.evict_local(prefix)
+
+
+def init_shared_cache(url: str = None):
+    """Connect the shared tier and start the invalidation listener. Called from ``main.lifespan``."""
+    global _backend, _subscription, _listener
+    url = SHARED_CACHE_URL if url is None else url
+    if not url:
+        return
+    try:
+        backend = make_backend(url)
+        subscription = backend.subscribe()
+    except Exception as e:
+        print(f"⚠️ Shared cache unavailable, using per-worker caches only: {e}")
+        return
+    _backend, _subscription = backend, subscription
+    _stopping.clear()
+    _listener = threading.Thread(target=_listen, args=(subscription,), name="cache-invalidations", daemon=True)
+    _listener.start()
+    print(f"✅ Shared cache ready ({backend.name})")
+
+
+def close_shared_cache():
+    global _backend, _subscription, _listener
+    if _backend is None:
+        return
+    _stopping.set()
+    _subscription.close()
+    _listener.join(timeout=CACHE_INVALIDATION_POLL + 2)
+    _backend.close()
+    _backend = _subscription = _listener = None
+
+
+def shared_cache_stats():
+    return {
+        "backend": _backend.name if _backend is not None else None,
+        **_stats,
+        "caches": {cache.namespace: cache.stats() for cache in sorted(_caches, key=lambda c: c.namespace)
+                   if cache._backend is None},
+    }
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.responses import FastJSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.attractions import fetch_attractions_page
+from app.location import lookup_country
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.weather import build_weather_payload, describe_error, fetch_current_weather
+import asyncio
+import os
+import time
+
+router = APIRouter(prefix="/snapshot", tags=["Snapshot"])
+
+# Per-source time budgets in seconds. Weather waits for the country lookup
+# (it needs the country's coordinates), so its budget starts after that.
+SNAPSHOT_COUNTRY_TIMEOUT = float(os.getenv("SNAPSHOT_COUNTRY_TIMEOUT", "3"))
+SNAPSHOT_WEATHER_TIMEOUT = float(os.getenv("SNAPSHOT_WEATHER_TIMEOUT", "3"))
+SNAPSHOT_ATTRACTIONS_TIMEOUT = float(os.getenv("SNAPSHOT_ATTRACTIONS_TIMEOUT", "3"))
+
+
+def _error_message(exc: BaseException) -> str:
+    if isinstance(exc, asyncio.TimeoutError):
+        return "Timed out"
+    return describe_error(exc)
+
+
+async def _timed(name: str, coro, timeout: float, timings: dict):
+    started = time.perf_counter()
+    try:
+        return await asyncio.wait_for(coro, timeout)
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _location_and_weather(country_name: str, timings: dict, errors: dict):
+    try:
+        location = await _timed("location", lookup_country(country_name), SNAPSHOT_COUNTRY_TIMEOUT, timings)
+    except Exception as e:
+        errors["location"] = _error_message(e)
+        errors["weather"] = "Skipped: country lookup failed"
+        return None, None, e
+
+    lat, lng = (location.get("latlng") or [None, None])[:2]
+    if lat is None or lng is None:
+        errors["weather"] = "No coordinates for this country"
+        return location, None, None
+    try:
+        current = await _timed("weather", fetch_current_weather(lat, lng), SNAPSHOT_WEATHER_TIMEOUT, timings)
+    except Exception as e:
+        errors["weather"] = _error_message(e)
+        return location, None, None
+    return location, build_weather_payload(lat, lng, current), None
+
+
+async def _attractions(country_name: str, limit: int, timings: dict, errors: dict):
+    try:
+        return await _timed(
+            "attractions",
+            run_in_threadpool(fetch_attractions_page, country_name, None, limit),
+            SNAPSHOT_ATTRACTIONS_TIMEOUT,
+            timings,
+        )
+    except Exception as e:
+        errors["attractions"] = _error_message(e)
+        return [], None
+
+
+# ---------------- Country snapshot ----------------
+@router.get("/{country_name}")
+async def get_snapshot(country_name: str, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Country info, current weather at its coordinates and the first page of
+    attractions in one call. The attractions query runs alongside the
+    country -> weather chain; a source that fails or times out is reported
+    under ``errors`` and left null/empty instead of failing the request.
+    """
+    timings = {}
+    errors = {}
+    started = time.perf_counter()
+
+    (location, weather, location_error), (attractions, next_cursor) = await asyncio.gather(
+        _location_and_weather(country_name, timings, errors),
+        _attractions(country_name, limit, timings, errors),
+    )
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+
+    # Unknown country and nothing stored for it: a plain 404
+    if isinstance(location_error, HTTPException) and location_error.status_code in (400, 404) and not attractions:
+        raise location_error
+
+    return FastJSONResponse({
+        "country": country_name,
+        "location": location,
+        "weather": weather,
+        "attractions": attractions,
+        "next_cursor": next_cursor,
+        "errors": errors,
+        "timings_ms": timings,
+    })
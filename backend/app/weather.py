@@ -1,16 +1,226 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
-import requests
+from fastapi import APIRouter, HTTPException, Query, Request
+from app.responses import FastJSONResponse
+from pydantic import BaseModel, Field
+from typing import List
+from app.shared_cache import SharedCache
+from app.http_cache import cached_json
+from app.http_client import UpstreamBusy, http_get
+from datetime import datetime, timezone
+import asyncio
+import httpx
+import os
+import time
 
 router = APIRouter(prefix="/weather", tags=["Weather"])
 
-OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
 
+# Requests are bucketed on a lat/lng grid: 1 decimal place ≈ 11 km cells
+WEATHER_GRID_PRECISION = int(os.getenv("WEATHER_GRID_PRECISION", "1"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "4096"))
+# Used when the upstream omits time/interval, or its interval already ended
+WEATHER_FALLBACK_TTL = float(os.getenv("WEATHER_FALLBACK_TTL", "900"))
+WEATHER_MIN_TTL = float(os.getenv("WEATHER_MIN_TTL", "60"))
+# Batch endpoint: max points per request, max locations per upstream call
+WEATHER_BATCH_MAX_POINTS = int(os.getenv("WEATHER_BATCH_MAX_POINTS", "200"))
+WEATHER_BATCH_CHUNK = int(os.getenv("WEATHER_BATCH_CHUNK", "50"))
 
+weather_cache = SharedCache("weather", maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_FALLBACK_TTL)
+_inflight = {}
+_fill_tasks = set()  # keeps running upstream fetches referenced
+_stats = {"upstream_calls": 0, "coalesced": 0, "deduplicated": 0}
+
+
+# ---------------- Pydantic models ----------------
+class Coordinate(BaseModel):
+    # Out-of-range (or nan) points are refused here rather than sent upstream in a shared chunk
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+
+
+class WeatherBatchRequest(BaseModel):
+    points: List[Coordinate]
+
+
+# ---------------- Helpers ----------------
+def weather_cell(lat: float, lng: float) -> tuple:
+    """Grid cell a coordinate falls in; also the point sent upstream."""
+    return (round(lat, WEATHER_GRID_PRECISION), round(lng, WEATHER_GRID_PRECISION))
+
+
+def seconds_until_next_interval(current: dict) -> float:
+    """
+    Open-Meteo reports current weather for an interval starting at ``time``
+    (GMT) and lasting ``interval`` seconds. Cache until the next one starts.
+    """
+    try:
+        started = datetime.strptime(current["time"], "%Y-%m-%dT%H:%M").replace(tzinfo=timezone.utc)
+        ends_at = started.timestamp() + float(current["interval"])
+    except (KeyError, TypeError, ValueError):
+        return WEATHER_FALLBACK_TTL
+    return max(ends_at - time.time(), WEATHER_MIN_TTL)
+
+
+def build_weather_payload(lat: float, lng: float, current: dict) -> dict:
+    return {
+        "latitude": lat,
+        "longitude": lng,
+        "temperature": current.get("temperature"),
+        "windspeed": current.get("windspeed"),
+        "winddirection": current.get("winddirection"),
+        "time": current.get("time"),
+        "weathercode": current.get("weathercode"),
+    }
+
+
+async def _fetch_cells(cells: list) -> list:
+    """
+    One upstream call for up to WEATHER_BATCH_CHUNK cells using Open-Meteo's
+    comma-separated multi-location query. Returns ``current_weather`` per cell
+    (None where the upstream had nothing), in order.
+
+    Open-Meteo rejects the whole call when one location is bad, so a 4xx
+    for several cells is retried in halves; only the rejected cells then
+    get the error, as an exception in their slot.
+    """
+    params = {
+        "latitude": ",".join(str(cell[0]) for cell in cells),
+        "longitude": ",".join(str(cell[1]) for cell in cells),
+        "current_weather": "true",
+    }
+
+    _stats["upstream_calls"] += 1
+    response = await http_get(OPEN_METEO_URL, upstream="open_meteo", params=params)
+    if 400 <= response.status_code < 500 and response.status_code != 429:
+        if len(cells) == 1:
+            return [HTTPException(status_code=400, detail="Weather API rejected this location")]
+        half = len(cells) // 2
+        parts = await asyncio.gather(_fetch_cells(cells[:half]), _fetch_cells(cells[half:]), return_exceptions=True)
+        return [
+            value
+            for part, size in zip(parts, (half, len(cells) - half))
+            for value in (part if not isinstance(part, BaseException) else [part] * size)
+        ]
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail="Error fetching weather data from API")
+
+    data = response.json()
+    locations = data if isinstance(data, list) else [data]
+    if len(locations) != len(cells):
+        raise HTTPException(status_code=500, detail="Unexpected response from weather API")
+    return [location.get("current_weather") or None for location in locations]
+
+
+async def _fill_cells(missing: list, owned: dict):
+    """Fetch ``missing`` upstream in chunks and resolve their in-flight futures."""
+    try:
+        chunks = [missing[i:i + WEATHER_BATCH_CHUNK] for i in range(0, len(missing), WEATHER_BATCH_CHUNK)]
+        outcomes = await asyncio.gather(*(_fetch_cells(chunk) for chunk in chunks), return_exceptions=True)
+        fresh = []
+        for chunk, outcome in zip(chunks, outcomes):
+            for i, cell in enumerate(chunk):
+                if isinstance(outcome, BaseException):
+                    owned[cell].set_exception(outcome)
+                elif isinstance(outcome[i], BaseException):
+                    owned[cell].set_exception(outcome[i])
+                elif outcome[i] is None:
+                    owned[cell].set_exception(HTTPException(status_code=404, detail="Weather data not found"))
+                else:
+                    owned[cell].set_result(outcome[i])
+                    fresh.append((cell, outcome[i], seconds_until_next_interval(outcome[i])))
+        await weather_cache.aset_many(fresh)
+    except Exception as e:
+        for future in owned.values():
+            if not future.done():
+                future.set_exception(e)
+    finally:
+        for cell in missing:
+            _inflight.pop(cell, None)
+        for future in owned.values():
+            if future.done() and not future.cancelled():
+                future.exception()  # mark retrieved when nobody else was waiting
+
+
+async def fetch_weather_cells(cells: list) -> dict:
+    """
+    Current weather for each distinct cell: cache first, then any in-flight
+    request for the cell, then upstream in chunks. Maps cell -> current
+    weather dict, or the exception that cell failed with.
+
+    The upstream fetch runs in its own task, so a caller that is cancelled
+    (e.g. by a timeout) doesn't cancel it for the others waiting on it.
+    """
+    cells = list(dict.fromkeys(cells))
+    results = await weather_cache.aget_many(cells)
+    waiting = {}
+    missing = []
+    for cell in cells:
+        if cell in results:
+            continue
+        if cell in _inflight:
+            _stats["coalesced"] += 1
+            waiting[cell] = _inflight[cell]
+        else:
+            missing.append(cell)
+
+    if missing:
+        loop = asyncio.get_running_loop()
+        owned = {cell: loop.create_future() for cell in missing}
+        _inflight.update(owned)
+        task = asyncio.create_task(_fill_cells(missing, owned))
+        _fill_tasks.add(task)
+        task.add_done_callback(_fill_tasks.discard)
+        waiting.update(owned)
+
+    for cell, future in waiting.items():
+        try:
+            results[cell] = await asyncio.shield(future)
+        except Exception as e:
+            results[cell] = e
+    return results
+
+
+async def fetch_current_weather(lat: float, lng: float) -> dict:
+    """
+    Current weather for the grid cell containing (lat, lng). Served from the
+    cache while the upstream interval is current; concurrent misses for the
+    same cell share one upstream request.
+    """
+    cell = weather_cell(lat, lng)
+    result = (await fetch_weather_cells([cell]))[cell]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def describe_error(exc: Exception) -> str:
+    if isinstance(exc, HTTPException):
+        return exc.detail
+    if isinstance(exc, httpx.HTTPError):
+        return "External API request failed"
+    return f"Unexpected error: {str(exc)}"
+
+
+# ---------------- Cache stats ----------------
+@router.get("/cache/stats")
+def get_cache_stats():
+    cache = weather_cache.stats()
+    return {
+        "cache": cache,
+        "grid_precision": WEATHER_GRID_PRECISION,
+        "upstream_calls": _stats["upstream_calls"],
+        "coalesced": _stats["coalesced"],
+        "deduplicated": _stats["deduplicated"],
+        "upstream_calls_saved": cache["hits"] + _stats["coalesced"] + _stats["deduplicated"],
+    }
+
+
+# ---------------- Current weather ----------------
 @router.get("/")
-def get_weather(
-    lat: float = Query(..., description="Latitude of the location"),
-    lng: float = Query(..., description="Longitude of the location")
+async def get_weather(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90, description="Latitude of the location"),
+    lng: float = Query(..., ge=-180, le=180, description="Longitude of the location")
 ):
     """
     Fetch current weather for given latitude and longitude.
@@ -19,35 +229,44 @@ def get_weather(
         if lat is None or lng is None:
             raise HTTPException(status_code=400, detail="Latitude and longitude are required")
 
-        params = {
-            "latitude": lat,
-            "longitude": lng,
-            "current_weather": True,
-        }
+        current = await fetch_current_weather(lat, lng)
+        # Fresh until the upstream publishes its next reading
+        return cached_json(
+            request, {"weather": build_weather_payload(lat, lng, current)}, seconds_until_next_interval(current)
+        )
 
-        response = requests.get(OPEN_METEO_URL, params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Error fetching weather data from API")
+    except (HTTPException, UpstreamBusy):
+        raise
+    except httpx.HTTPError:
+        raise HTTPException(status_code=500, detail="External API request failed")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-        data = response.json()
-        current = data.get("current_weather", {})
 
-        if not current:
-            raise HTTPException(status_code=404, detail="Weather data not found")
+# ---------------- Batch weather ----------------
+@router.post("/batch")
+async def get_weather_batch(batch: WeatherBatchRequest):
+    """
+    Current weather for many points in one call. Points are de-duplicated by
+    grid cell and fetched with as few upstream requests as possible. Results
+    come back in input order; a failed point carries an ``error`` instead of
+    ``weather``.
+    """
+    if not batch.points:
+        raise HTTPException(status_code=400, detail="At least one point is required")
+    if len(batch.points) > WEATHER_BATCH_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {WEATHER_BATCH_MAX_POINTS} points per request")
 
-        weather_data = {
-            "latitude": lat,
-            "longitude": lng,
-            "temperature": current.get("temperature"),
-            "windspeed": current.get("windspeed"),
-            "winddirection": current.get("winddirection"),
-            "time": current.get("time"),
-            "weathercode": current.get("weathercode"),
-        }
+    cells = [weather_cell(p.lat, p.lng) for p in batch.points]
+    _stats["deduplicated"] += len(cells) - len(set(cells))
+    by_cell = await fetch_weather_cells(cells)
 
-        return JSONResponse({"weather": weather_data})
+    results = []
+    for point, cell in zip(batch.points, cells):
+        current = by_cell[cell]
+        if isinstance(current, Exception):
+            results.append({"latitude": point.lat, "longitude": point.lng, "error": describe_error(current)})
+        else:
+            results.append({"weather": build_weather_payload(point.lat, point.lng, current)})
 
-    except requests.exceptions.RequestException:
-        raise HTTPException(status_code=500, detail="External API request failed")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    return FastJSONResponse({"results": results})
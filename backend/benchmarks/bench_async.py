@@ -0,0 +1,101 @@
+"""
+Compare the legacy sync request path with the async one.
+
+Both variants serve ``GET /weather/`` against the same local Open-Meteo stub
+that adds a fixed upstream delay. The sync variant reproduces the previous
+handler (``def`` + blocking ``requests.get`` on FastAPI's threadpool); the
+async variant mounts the real ``app.weather`` router on the shared
+``httpx.AsyncClient``.
+
+While weather traffic runs, a light probe load hits ``GET /probe``, a sync
+handler standing in for a pooled database query. On the sync path the slow
+upstream calls occupy the threadpool and the probe queues behind them.
+
+    python -m benchmarks.bench_async --requests 1000 --concurrency 200 --delay 0.5
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET", "bench")
+
+import requests
+from fastapi import FastAPI, HTTPException, Query
+
+from app import http_client, weather
+from benchmarks.common import StubServer, asgi_request, open_meteo_stub, print_table, run_load, summarize
+
+PROBE_WORK = 0.005  # seconds of blocking work per probe request
+
+
+def add_probe(app):
+    @app.get("/probe")
+    def probe():
+        time.sleep(PROBE_WORK)
+        return {"ok": True}
+
+    return app
+
+
+def build_sync_app(upstream_url):
+    app = FastAPI()
+    session = requests.Session()
+
+    @app.get("/weather/")
+    def get_weather(lat: float = Query(...), lng: float = Query(...)):
+        response = session.get(upstream_url, params={"latitude": lat, "longitude": lng, "current_weather": True})
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail="Error fetching weather data from API")
+        return {"weather": response.json().get("current_weather")}
+
+    return add_probe(app)
+
+
+def build_async_app(upstream_url):
+    weather.OPEN_METEO_URL = upstream_url
+    app = FastAPI()
+    app.include_router(weather.router)
+    return add_probe(app)
+
+
+async def drive(app, args):
+    async def send_weather(i):
+        # Distinct weather cells so the async path cannot answer from its cache
+        status, _, _ = await asgi_request(app, "GET", "/weather/", f"lat={-80 + (i % 1600) * 0.1:.1f}&lng={i // 1600}")
+        return status == 200
+
+    async def send_probe(i):
+        status, _, _ = await asgi_request(app, "GET", "/probe")
+        return status == 200
+
+    weather_task = asyncio.create_task(run_load(send_weather, args.requests, args.concurrency))
+    probe_results = await run_load(send_probe, args.probes, 4)
+    return await weather_task, probe_results
+
+
+async def main(args):
+    with StubServer({"/v1/forecast": open_meteo_stub}, delay=args.delay) as stub:
+        upstream = f"{stub.url}/v1/forecast"
+        rows = []
+
+        for name, build in (("sync", build_sync_app), ("async", build_async_app)):
+            http_client.init_http_client()
+            try:
+                weather_results, probe_results = await drive(build(upstream), args)
+            finally:
+                await http_client.close_http_client()
+            rows.append({"path": name, "endpoint": "/weather/", **summarize(*weather_results)})
+            rows.append({"path": name, "endpoint": "/probe", **summarize(*probe_results)})
+
+    print(f"upstream delay={args.delay * 1000:.0f}ms  weather concurrency={args.concurrency}")
+    print_table(rows, ["path", "endpoint", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="weather requests per variant")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--probes", type=int, default=200, help="probe requests per variant")
+    parser.add_argument("--delay", type=float, default=0.5, help="upstream latency in seconds")
+    asyncio.run(main(parser.parse_args()))
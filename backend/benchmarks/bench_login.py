@@ -0,0 +1,141 @@
+"""
+Login storm: bcrypt inline on the request threadpool versus the dedicated
+hashing process pool.
+
+Both variants serve ``POST /auth/login`` for one seeded user while a light
+probe load hits ``GET /probe``, a sync handler running ``SELECT 1`` on the
+database pool. The inline variant reproduces the previous handler (``def``
++ ``bcrypt.checkpw`` on a threadpool worker); the pool variant mounts the
+real ``app.auth`` router, which hashes in ``HASH_WORKERS`` processes and
+answers 429 once ``HASH_QUEUE_LIMIT`` hashes are pending.
+
+Needs DATABASE_URL; the bench user is removed afterwards.
+
+    python -m benchmarks.bench_login --logins 400 --concurrency 100 --rounds 10
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+
+os.environ.setdefault("JWT_SECRET", "bench")
+
+import anyio.to_thread
+import bcrypt
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+
+from app import auth, database, hashing
+from benchmarks.common import asgi_request, print_table, run_load, summarize
+
+EMAIL = "bench-login@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+def add_probe(app):
+    @app.get("/probe")
+    def probe():
+        with database.db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.fetchone()
+            cur.close()
+        return {"ok": True}
+
+    return app
+
+
+def build_inline_app():
+    app = FastAPI()
+
+    @app.post("/auth/login")
+    def login_user(user: auth.LoginRequest):
+        user_data = auth._load_credentials(user.email)
+        if not user_data or not bcrypt.checkpw(user.password.encode(), user_data[1].encode()):
+            raise HTTPException(status_code=400, detail="Invalid email or password")
+        return {"ok": True}
+
+    return add_probe(app)
+
+
+def build_pool_app():
+    app = FastAPI()
+    app.include_router(auth.router)
+
+    @app.exception_handler(hashing.HashPoolBusy)
+    async def busy(request, exc):
+        return JSONResponse(status_code=429, content={}, headers={"Retry-After": str(exc.retry_after)})
+
+    return add_probe(app)
+
+
+async def drive(app, args):
+    statuses = collections.Counter()
+    body = json.dumps({"email": EMAIL, "password": PASSWORD}).encode()
+
+    async def send_login(i):
+        status, _, _ = await asgi_request(app, "POST", "/auth/login", headers=[("Content-Type", "application/json")], body=body)
+        statuses[status] += 1
+        return status == 200
+
+    async def send_probe(i):
+        status, _, _ = await asgi_request(app, "GET", "/probe")
+        return status == 200
+
+    login_task = asyncio.create_task(run_load(send_login, args.logins, args.concurrency))
+    await asyncio.sleep(0.2)  # let the storm build up before probing
+    probe_results = await run_load(send_probe, args.probes, 2)
+    return await login_task, probe_results, statuses
+
+
+async def main(args):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 40
+    database.init_pool()
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(args.rounds)).decode()
+    with database.db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO users (email, password_hash) VALUES (%s, %s) "
+            "ON CONFLICT (email) DO UPDATE SET password_hash = EXCLUDED.password_hash;",
+            (EMAIL, password_hash),
+        )
+        conn.commit()
+        cur.close()
+
+    rows = []
+    try:
+        for name, build in (("inline", build_inline_app), ("pool", build_pool_app)):
+            if name == "pool":
+                hashing.init_hash_pool()
+                await asyncio.sleep(1)  # workers are spawned, not forked
+            try:
+                (login_results, probe_results, statuses) = await drive(build(), args)
+            finally:
+                hashing.close_hash_pool()
+            login = summarize(*login_results)
+            rows.append({
+                "variant": name, "endpoint": "/auth/login", **login,
+                "ok_per_s": round(statuses[200] / login_results[2], 1), "429s": statuses[429],
+            })
+            rows.append({"variant": name, "endpoint": "/probe", **summarize(*probe_results)})
+    finally:
+        with database.db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM users WHERE email = %s;", (EMAIL,))
+            conn.commit()
+            cur.close()
+        database.close_pool()
+
+    print(f"bcrypt rounds={args.rounds}  login concurrency={args.concurrency}  "
+          f"hash workers={hashing.HASH_WORKERS}  queue limit={hashing.HASH_QUEUE_LIMIT}")
+    print_table(rows, ["variant", "endpoint", "requests", "errors", "ok_per_s", "429s", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--probes", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost of the seeded user's hash")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,125 @@
+"""
+Query times for the hot lookups before and after the schema migrations'
+indexes, on a synthetic data set (1M attractions by default).
+
+Runs in a throwaway schema of the database in DATABASE_URL, which is
+dropped afterwards. Point it at a scratch database, never production.
+
+    DATABASE_URL=postgresql://localhost/scratch python -m benchmarks.bench_schema --rows 1000000
+"""
+import argparse
+import os
+import random
+import time
+
+import psycopg2
+
+from app.migrations import MIGRATIONS
+from benchmarks.common import percentile, print_table
+
+SCHEMA = "bench_schema"
+COUNTRIES = 200
+
+QUERIES = {
+    "attractions by country": (
+        "SELECT id, name, lat, lng, description, image1, image2, image3, image4, status "
+        "FROM attractions WHERE country = %s;",
+        lambda rows, users: (f"Country {random.randrange(COUNTRIES)}",),
+    ),
+    "attraction by (country, name)": (
+        "SELECT id FROM attractions WHERE country = %s AND name = %s;",
+        lambda rows, users: _attraction_key(random.randrange(1, rows + 1)),
+    ),
+    "favorite by (user, attraction)": (
+        "SELECT id FROM favorites WHERE user_id = %s AND attraction_id = %s;",
+        lambda rows, users: (random.randrange(1, users + 1), random.randrange(1, rows + 1)),
+    ),
+    "favorites of a user": (
+        "SELECT f.id, a.name FROM favorites f JOIN attractions a ON f.attraction_id = a.id WHERE f.user_id = %s;",
+        lambda rows, users: (random.randrange(1, users + 1),),
+    ),
+}
+
+
+def _attraction_key(i):
+    return (f"Country {i % COUNTRIES}", f"Attraction {i}")
+
+
+def seed(cur, rows, users, favorites):
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA};")
+    for version, name, sql in MIGRATIONS:
+        if version in (1, 2):
+            cur.execute(sql)
+    cur.execute("""
+        INSERT INTO users (email, password_hash)
+        SELECT 'user' || g || '@example.com', 'x' FROM generate_series(1, %s) g;
+    """, (users,))
+    cur.execute(f"""
+        INSERT INTO attractions (country, name, lat, lng, description, image1)
+        SELECT 'Country ' || (g %% {COUNTRIES}), 'Attraction ' || g,
+               random() * 180 - 90, random() * 360 - 180,
+               repeat('Lorem ipsum ', 20), 'https://images.example.com/' || g
+        FROM generate_series(1, %s) g;
+    """, (rows,))
+    cur.execute("""
+        INSERT INTO favorites (user_id, attraction_id)
+        SELECT 1 + (g %% %s), 1 + (g * 7919 %% %s) FROM generate_series(1, %s) g;
+    """, (users, rows, favorites))
+    cur.execute("ANALYZE;")
+
+
+def measure(cur, rows, users, iterations):
+    results = {}
+    for label, (sql, params) in QUERIES.items():
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            cur.execute(sql, params(rows, users))
+            cur.fetchall()
+            timings.append(time.perf_counter() - started)
+        results[label] = timings
+    return results
+
+
+def main(args):
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        started = time.perf_counter()
+        seed(cur, args.rows, args.users, args.favorites)
+        print(f"Seeded {args.rows} attractions, {args.favorites} favorites in {time.perf_counter() - started:.1f}s")
+
+        before = measure(cur, args.rows, args.users, args.iterations)
+        started = time.perf_counter()
+        for version, name, sql in MIGRATIONS:
+            if version > 2:
+                cur.execute(sql)
+        cur.execute("ANALYZE;")
+        print(f"Applied index migrations in {time.perf_counter() - started:.1f}s")
+        after = measure(cur, args.rows, args.users, args.iterations)
+
+        table = []
+        for label in QUERIES:
+            table.append({
+                "query": label,
+                "before_p50_ms": round(percentile(before[label], 50) * 1000, 2),
+                "before_p95_ms": round(percentile(before[label], 95) * 1000, 2),
+                "after_p50_ms": round(percentile(after[label], 50) * 1000, 2),
+                "after_p95_ms": round(percentile(after[label], 95) * 1000, 2),
+            })
+        print_table(table, ["query", "before_p50_ms", "before_p95_ms", "after_p50_ms", "after_p95_ms"])
+    finally:
+        if not args.keep:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--favorites", type=int, default=200_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the bench schema for inspection")
+    main(parser.parse_args())
@@ -0,0 +1,138 @@
+"""
+Attraction search (GET /attractions/search) on a synthetic data set (1M
+attractions by default): the GIN full-text index and pg_trgm fallback
+versus an ILIKE scan, with a p95 target per query shape. Exits 1 if a
+target is missed.
+
+Runs in a throwaway schema of the database in DATABASE_URL, which is
+dropped afterwards. Point it at a scratch database, never production.
+
+    DATABASE_URL=postgresql://localhost/scratch python -m benchmarks.bench_search --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+
+from benchmarks.common import percentile, print_table, scoped_database_url
+
+SCHEMA = "bench_search"
+
+PLACES = ["Temple", "Tower", "Museum", "Cathedral", "Palace", "Castle", "Bridge", "Garden", "Market", "Fortress",
+          "Lighthouse", "Monastery", "Gallery", "Harbour", "Waterfall", "Canyon", "Mosque", "Pagoda", "Abbey", "Square"]
+ADJECTIVES = ["Golden", "Royal", "Ancient", "Grand", "Old", "Silver", "Sacred", "Imperial", "Hidden", "Great",
+              "Crystal", "Northern", "Emerald", "Marble", "Painted", "Sunken", "Whispering", "Jade", "Iron", "Twin"]
+WORDS = ["historic", "landmark", "built", "century", "views", "famous", "visitors", "architecture", "restored",
+         "stone", "river", "city", "museum", "collection", "gardens", "festival", "pilgrims", "sunset", "harbour",
+         "empire", "dynasty", "baroque", "gothic", "ruins", "UNESCO", "heritage", "mountain", "coast", "island", "valley"]
+
+# (label, q, country, p95 target in ms); {n} is a row number that exists
+QUERIES = [
+    ("rare word", "belvedere", None, 50),
+    ("frequent word", "whispering", None, 100),
+    ("common word", "temple", None, 150),
+    ("two words, prefix", "golden pago", None, 50),
+    ("description word", "baroque", None, 150),
+    ("country filter", "castle", "Country 7", 50),
+    ("name number", "{n}", None, 50),
+    ("typo (fuzzy)", "belvedre", None, 250),
+]
+
+
+def seed(cur, rows):
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+    from app.migrations import run_migrations  # reads DATABASE_URL at import
+    run_migrations()
+    cur.execute(f"SET search_path TO {SCHEMA}, public;")
+    cur.execute("""
+        INSERT INTO attractions (country, name, lat, lng, description)
+        SELECT 'Country ' || (g %% 200),
+               (%(adjectives)s::text[])[1 + floor(random() * 20)::int] || ' '
+                   || (%(places)s::text[])[1 + floor(random() * 20)::int] || ' ' || g
+                   || CASE WHEN g %% 10000 = 0 THEN ' Belvedere' ELSE '' END,
+               random() * 140 - 70, random() * 360 - 180,
+               (SELECT string_agg((%(words)s::text[])[1 + floor(random() * 30)::int], ' ')
+                FROM generate_series(1, 12 + (g %% 3)))
+        FROM generate_series(1, %(rows)s) g;
+    """, {"rows": rows, "adjectives": ADJECTIVES, "places": PLACES, "words": WORDS})
+    # Flushes the GIN pending list, as autovacuum would after a bulk load
+    cur.execute("VACUUM ANALYZE attractions;")
+
+
+def measure(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(args):
+    database_url = os.environ["DATABASE_URL"]
+    os.environ["DATABASE_URL"] = scoped_database_url(database_url, SCHEMA)
+    from app.attractions import search_attractions
+
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    cur = conn.cursor()
+    missed = False
+    try:
+        started = time.perf_counter()
+        seed(cur, args.rows)
+        print(f"Seeded {args.rows} attractions in {time.perf_counter() - started:.1f}s")
+
+        table = []
+        for label, q, country, target_ms in QUERIES:
+            q = q.format(n=args.rows // 2 + 1)
+            mode = None
+
+            def indexed():
+                nonlocal mode
+                results, mode, _ = search_attractions(q, country, limit=21)
+                return results
+
+            def scan():
+                cur.execute(
+                    "SELECT id FROM attractions WHERE (name ILIKE %(p)s OR description ILIKE %(p)s)"
+                    + (" AND country = %(country)s" if country else "") + " ORDER BY id LIMIT 21;",
+                    {"p": f"%{q}%", "country": country},
+                )
+                return cur.fetchall()
+
+            hits = len(indexed())
+            timings = measure(indexed, args.iterations)
+            scan_timings = measure(scan, max(3, args.iterations // 5)) if args.compare_scan else []
+            p95 = percentile(timings, 95) * 1000
+            ok = p95 <= target_ms
+            missed |= not ok
+            table.append({
+                "query": label,
+                "mode": mode,
+                "hits": hits,
+                "p50_ms": round(percentile(timings, 50) * 1000, 2),
+                "p95_ms": round(p95, 2),
+                "target_ms": target_ms,
+                "scan_p50_ms": round(percentile(scan_timings, 50) * 1000, 2) if scan_timings else "-",
+                "status": "ok" if ok else "MISSED",
+            })
+        print_table(table, ["query", "mode", "hits", "p50_ms", "p95_ms", "target_ms", "scan_p50_ms", "status"])
+    finally:
+        if not args.keep:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+        conn.close()
+    if missed:
+        print("❌ Latency target missed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--no-compare-scan", dest="compare_scan", action="store_false",
+                        help="skip the ILIKE scan comparison")
+    parser.add_argument("--keep", action="store_true", help="keep the bench schema for inspection")
+    main(parser.parse_args())
@@ -0,0 +1,81 @@
+"""
+Serialization time and bytes on the wire for one large country listing
+(5,000 attractions with descriptions and four image URLs each).
+
+Compares the stdlib-backed JSONResponse with the app's FastJSONResponse, then
+the size and CPU cost of each content coding CompressionMiddleware can pick.
+
+    python -m benchmarks.bench_serialization --rows 5000
+"""
+import argparse
+import gzip
+import random
+import time
+
+from fastapi.responses import JSONResponse
+
+from app.responses import FastJSONResponse, orjson
+from benchmarks.common import percentile, print_table
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+WORDS = "museum castle ancient river view tower old town square market bridge cathedral garden".split()
+
+
+def make_listing(rows):
+    random.seed(1)
+    attractions = []
+    for i in range(1, rows + 1):
+        attractions.append({
+            "id": i,
+            "name": f"{random.choice(WORDS).title()} {random.choice(WORDS).title()} {i}",
+            "lat": random.uniform(-60, 60),
+            "lng": random.uniform(-180, 180),
+            "description": " ".join(random.choice(WORDS) for _ in range(40)),
+            "images": [f"https://images.unsplash.com/photo-{random.getrandbits(48):x}?w=1080&q=80" for _ in range(4)],
+            "status": "available",
+        })
+    return {"country": "Benchland", "attractions": attractions, "next_cursor": None}
+
+
+def timed(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return result, round(percentile(timings, 50) * 1000, 2)
+
+
+def main(args):
+    content = make_listing(args.rows)
+    rows = []
+
+    body, ms = timed(lambda: JSONResponse(content).body, args.iterations)
+    rows.append({"step": "serialize: stdlib json", "p50_ms": ms, "bytes": len(body)})
+    body, ms = timed(lambda: FastJSONResponse(content).body, args.iterations)
+    label = "orjson" if orjson is not None else "stdlib fallback"
+    rows.append({"step": f"serialize: FastJSONResponse ({label})", "p50_ms": ms, "bytes": len(body)})
+
+    for level in (6, 9):
+        out, ms = timed(lambda: gzip.compress(body, compresslevel=level), args.iterations)
+        rows.append({"step": f"compress: gzip level {level}", "p50_ms": ms, "bytes": len(out)})
+    if brotli is not None:
+        for quality in (4, 11):
+            out, ms = timed(lambda: brotli.compress(body, quality=quality), max(1, args.iterations // (5 if quality > 9 else 1)))
+            rows.append({"step": f"compress: brotli quality {quality}", "p50_ms": ms, "bytes": len(out)})
+    else:
+        print("brotli not installed; skipping br rows")
+
+    print(f"{args.rows} attractions")
+    print_table(rows, ["step", "p50_ms", "bytes"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,124 @@
+"""
+Radius and viewport queries with the grid_cell index versus a full scan of
+the lat/lng columns, on a synthetic data set (1M attractions by default).
+
+Runs in a throwaway schema of the database in DATABASE_URL, which is
+dropped afterwards. Point it at a scratch database, never production.
+
+    DATABASE_URL=postgresql://localhost/scratch python -m benchmarks.bench_spatial --rows 1000000
+"""
+import argparse
+import os
+import random
+import time
+
+import psycopg2
+
+from app.geo import HAVERSINE_SQL, cells_for_bbox, lng_ranges, radius_bbox
+from app.migrations import MIGRATIONS
+from benchmarks.common import percentile, print_table
+
+SCHEMA = "bench_spatial"
+
+# Full scan: the same filter the endpoints apply, minus the grid cell list
+FULL_SCAN_SQL = f"""
+    SELECT id, {HAVERSINE_SQL} AS distance_km FROM attractions
+    WHERE lat BETWEEN %(min_lat)s AND %(max_lat)s AND ({{lng}}) {{radius}}
+    ORDER BY distance_km LIMIT %(limit)s;
+"""
+GRID_SQL = f"""
+    SELECT id, {HAVERSINE_SQL} AS distance_km FROM attractions
+    WHERE grid_cell = ANY(%(cells)s) AND lat BETWEEN %(min_lat)s AND %(max_lat)s AND ({{lng}}) {{radius}}
+    ORDER BY distance_km LIMIT %(limit)s;
+"""
+
+
+def seed(cur, rows):
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA};")
+    for version, name, sql in MIGRATIONS:
+        cur.execute(sql)
+    # Cluster around "cities" so dense areas look like real data
+    cur.execute("""
+        INSERT INTO attractions (country, name, lat, lng)
+        SELECT 'Country ' || (g %% 200), 'Attraction ' || g,
+               greatest(-89.9, least(89.9, c.lat + (random() - 0.5) * 2)),
+               ((c.lng + (random() - 0.5) * 2 + 540)::numeric %% 360 - 180)::float
+        FROM generate_series(1, %s) g
+        JOIN (
+            SELECT i, random() * 140 - 70 AS lat, random() * 360 - 180 AS lng FROM generate_series(0, 999) i
+        ) c ON c.i = g %% 1000;
+    """, (rows,))
+    cur.execute("ANALYZE;")
+
+
+def _query(sql, lat, lng, bbox, radius_km, limit):
+    min_lat, min_lng, max_lat, max_lng = bbox
+    params = {"lat": lat, "lng": lng, "min_lat": min_lat, "max_lat": max_lat, "limit": limit,
+              "radius": radius_km, "cells": cells_for_bbox(*bbox)}
+    lng_clauses = []
+    for i, (lo, hi) in enumerate(lng_ranges(min_lng, max_lng)):
+        params[f"lng_lo{i}"], params[f"lng_hi{i}"] = lo, hi
+        lng_clauses.append(f"lng BETWEEN %(lng_lo{i})s AND %(lng_hi{i})s")
+    radius = f"AND {HAVERSINE_SQL} <= %(radius)s" if radius_km is not None else ""
+    return sql.format(lng=" OR ".join(lng_clauses), radius=radius), params
+
+
+def measure(cur, sql, cases):
+    timings = []
+    for lat, lng, bbox, radius_km in cases:
+        query, params = _query(sql, lat, lng, bbox, radius_km, 100)
+        started = time.perf_counter()
+        cur.execute(query, params)
+        cur.fetchall()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(args):
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        started = time.perf_counter()
+        seed(cur, args.rows)
+        print(f"Seeded {args.rows} attractions in {time.perf_counter() - started:.1f}s")
+
+        scenarios = {}
+        for radius_km in (5, 50, 250):
+            cases = []
+            for _ in range(args.iterations):
+                lat, lng = random.uniform(-60, 60), random.uniform(-180, 180)
+                cases.append((lat, lng, radius_bbox(lat, lng, radius_km), radius_km))
+            scenarios[f"radius {radius_km} km"] = cases
+        cases = []
+        for _ in range(args.iterations):
+            lat, lng = random.uniform(-60, 60), random.uniform(-180, 180)
+            cases.append((lat, lng, (lat - 2, lng - 3, lat + 2, lng + 3), None))
+        scenarios["viewport 4x6 deg"] = cases
+
+        table = []
+        for label, cases in scenarios.items():
+            cur.execute("SET enable_indexscan = off; SET enable_bitmapscan = off;")
+            full = measure(cur, FULL_SCAN_SQL, cases)
+            cur.execute("RESET enable_indexscan; RESET enable_bitmapscan;")
+            grid = measure(cur, GRID_SQL, cases)
+            table.append({
+                "query": label,
+                "scan_p50_ms": round(percentile(full, 50) * 1000, 2),
+                "scan_p95_ms": round(percentile(full, 95) * 1000, 2),
+                "grid_p50_ms": round(percentile(grid, 50) * 1000, 2),
+                "grid_p95_ms": round(percentile(grid, 95) * 1000, 2),
+            })
+        print_table(table, ["query", "scan_p50_ms", "scan_p95_ms", "grid_p50_ms", "grid_p95_ms"])
+    finally:
+        if not args.keep:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the bench schema for inspection")
+    main(parser.parse_args())
@@ -0,0 +1,253 @@
+"""Shared helpers for the benchmark scripts: stub upstreams, load driver, stats."""
+import asyncio
+import json
+import multiprocessing
+import time
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+
+def scoped_database_url(url: str, schema: str) -> str:
+    """Same database, with every connection's search_path set to ``schema`` (then public, for extensions)."""
+    sep = "&" if "?" in url else "?"
+    return f"{url}{sep}options={quote(f'-csearch_path={schema},public')}"
+
+
+# ---------------- Stub upstream server ----------------
+async def _handle_connection(reader, writer, routes, delay):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if int(headers.get("content-length", 0)):
+                await reader.readexactly(int(headers["content-length"]))
+
+            parsed = urlparse(target)
+            query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+            for prefix, handler in routes.items():
+                if parsed.path.startswith(prefix):
+                    status, body = handler(parsed.path, query)
+                    break
+            else:
+                status, body = 404, {"error": "not found"}
+            if delay:
+                await asyncio.sleep(delay)
+
+            payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+            content_type = "application/octet-stream" if isinstance(body, bytes) else "application/json"
+            writer.write(
+                f"HTTP/1.1 {status} OK\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+def _serve(routes, delay, port_queue):
+    async def main():
+        server = await asyncio.start_server(
+            lambda r, w: _handle_connection(r, w, routes, delay), "127.0.0.1", 0, backlog=4096
+        )
+        port_queue.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+
+class StubServer:
+    """
+    Local HTTP server standing in for restcountries / Open-Meteo / Unsplash.
+
+    ``routes`` maps a path prefix to ``handler(path, query) -> (status, body)``
+    where ``body`` is JSON-serializable (or raw bytes). Every response is
+    delayed by ``delay`` seconds to simulate upstream latency. The server runs
+    in a child process so it does not compete with the app for the GIL.
+    """
+
+    def __init__(self, routes, delay=0.0):
+        self.routes = routes
+        self.delay = delay
+        self.port = None
+        self._process = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        ctx = multiprocessing.get_context("fork")
+        port_queue = ctx.Queue()
+        self._process = ctx.Process(target=_serve, args=(self.routes, self.delay, port_queue), daemon=True)
+        self._process.start()
+        self.port = port_queue.get(timeout=10)
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join()
+
+
+def open_meteo_stub(path, query):
+    lats = str(query.get("latitude", "0")).split(",")
+    lngs = str(query.get("longitude", "0")).split(",")
+    results = [
+        {
+            "latitude": float(lat),
+            "longitude": float(lng),
+            "current_weather": {
+                "temperature": 21.5,
+                "windspeed": 7.2,
+                "winddirection": 180,
+                "weathercode": 1,
+                "time": time.strftime("%Y-%m-%dT%H:00", time.gmtime()),
+                "interval": 900,
+            },
+        }
+        for lat, lng in zip(lats, lngs)
+    ]
+    return 200, results[0] if len(results) == 1 else results
+
+
+def restcountries_stub(countries):
+    """
+    Handler for /v3.1/name/<country> and /v3.1/all. ``countries`` maps a
+    country name to its (lat, lng).
+    """
+    def record(name, latlng):
+        return {
+            "name": {"common": name},
+            "capital": [f"{name} City"],
+            "flags": {"svg": f"https://flags.example.com/{name}.svg"},
+            "currencies": {"XXX": {}},
+            "languages": {"xx": "Examplish"},
+            "latlng": list(latlng),
+            "region": "Benchmark",
+            "population": 1_000_000,
+        }
+
+    def handler(path, query):
+        if path.rstrip("/").endswith("/all"):
+            return 200, [record(name, latlng) for name, latlng in countries.items()]
+        name = unquote(path.rsplit("/", 1)[-1])
+        if name not in countries:
+            return 404, {"status": 404, "message": "Not Found"}
+        return 200, [record(name, countries[name])]
+
+    return handler
+
+
+def unsplash_stub(path, query):
+    per_page = int(query.get("per_page", 4))
+    term = query.get("query", "x").replace(" ", "-")
+    return 200, {"results": [{"urls": {"regular": f"https://images.example.com/{term}/{i}.jpg"}} for i in range(per_page)]}
+
+
+# ---------------- Load driver ----------------
+async def asgi_request(app, method, path, query="", headers=(), body=b""):
+    """
+    Call an ASGI app in-process without a client library.
+    Returns (status, response_headers, body). Cheap enough that the driver
+    does not dominate CPU time on small machines.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    sent = False
+    status = None
+    response_headers = []
+    chunks = []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.Event().wait()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = [(k.decode(), v.decode()) for k, v in message.get("headers", [])]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, response_headers, b"".join(chunks)
+
+
+async def run_load(send, total, concurrency):
+    """
+    Call ``await send(i)`` ``total`` times with at most ``concurrency`` in flight.
+    Returns (latencies_in_seconds, error_count, elapsed_seconds).
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                ok = await send(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def print_table(rows, columns):
+    """Print ``rows`` (list of dicts) as an aligned text table."""
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in columns))
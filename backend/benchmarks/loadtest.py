@@ -0,0 +1,391 @@
+"""
+End-to-end load test: boots the app under uvicorn against a local Postgres
+schema, with restcountries / Open-Meteo / Unsplash replaced by local stub
+servers, seeds synthetic data and drives a weighted mix of realistic
+requests. Reports throughput and p50/p95/p99 per endpoint and compares them
+against a stored baseline.
+
+Everything lives in a throwaway schema (``loadtest``) of the database in
+DATABASE_URL, dropped afterwards. Point it at a scratch database.
+
+    # record a baseline on this machine
+    python -m benchmarks.loadtest --save-baseline benchmarks/baseline.json
+    # later: fail (exit 1) if p95 or throughput regressed by more than 25%
+    python -m benchmarks.loadtest --baseline benchmarks/baseline.json --tolerance 0.25
+
+Runs are reproducible for a given --seed: the data set and the request mix
+are generated from it. Baselines are only comparable on the same machine.
+
+Normal traffic comes from --clients distinct addresses (X-Forwarded-For,
+trusted from localhost by uvicorn). --abusive-concurrency adds one client
+hammering the upstream-backed endpoints alongside the measured mix; compare
+p99 with and without --no-rate-limit to see what admission control buys.
+
+    python -m benchmarks.loadtest --abusive-concurrency 32
+    python -m benchmarks.loadtest --abusive-concurrency 32 --no-rate-limit
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import bcrypt
+import httpx
+import psycopg2
+
+from benchmarks.common import (
+    StubServer, open_meteo_stub, print_table, restcountries_stub, scoped_database_url, summarize,
+    unsplash_stub,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA = "loadtest"
+PASSWORD = "loadtest-password"
+ABUSER_ADDRESS = "10.66.6.6"
+
+# Seeded countries and the point their attractions cluster around
+COUNTRIES = {
+    "France": (46.0, 2.0), "Italy": (42.8, 12.8), "Spain": (40.0, -4.0), "Japan": (36.0, 138.0),
+    "Peru": (-10.0, -76.0), "Kenya": (1.0, 38.0), "Canada": (60.0, -95.0), "India": (20.0, 77.0),
+    "Brazil": (-10.0, -55.0), "Egypt": (27.0, 30.0), "Norway": (62.0, 10.0), "Mexico": (23.0, -102.0),
+    "Thailand": (15.0, 100.0), "Greece": (39.0, 22.0), "Chile": (-30.0, -71.0), "Vietnam": (16.2, 107.8),
+    "Morocco": (32.0, -5.0), "Iceland": (65.0, -18.0), "Fiji": (-18.0, 179.0), "Nepal": (28.0, 84.0),
+}
+
+
+# ---------------- Setup ----------------
+def seed(database_url, args):
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+    conn.close()
+
+    scoped = scoped_database_url(database_url, SCHEMA)
+    os.environ["DATABASE_URL"] = scoped
+    from app.migrations import run_migrations  # reads DATABASE_URL at import
+    run_migrations()
+
+    conn = psycopg2.connect(scoped)
+    cur = conn.cursor()
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(args.bcrypt_rounds)).decode()
+    cur.execute("SELECT setseed(%s);", (args.seed / 2 ** 31,))
+    cur.execute("""
+        INSERT INTO users (email, password_hash)
+        SELECT 'user' || g || '@loadtest.example.com', %s FROM generate_series(1, %s) g;
+    """, (password_hash, args.users))
+    for country, (lat, lng) in COUNTRIES.items():
+        cur.execute("""
+            INSERT INTO attractions (country, name, lat, lng, description, image1, image2, image3, image4)
+            SELECT %(country)s, %(country)s || ' sight ' || g,
+                   %(lat)s + (random() - 0.5) * 6, ((%(lng)s + (random() - 0.5) * 6 + 540)::numeric %% 360 - 180)::float,
+                   repeat('A well known local landmark. ', 8),
+                   'https://images.example.com/' || g || '/1.jpg', 'https://images.example.com/' || g || '/2.jpg',
+                   'https://images.example.com/' || g || '/3.jpg', 'https://images.example.com/' || g || '/4.jpg'
+            FROM generate_series(1, %(rows)s) g;
+        """, {"country": country, "lat": lat, "lng": lng, "rows": args.attractions_per_country})
+    cur.execute("""
+        INSERT INTO favorites (user_id, attraction_id)
+        SELECT u.id, a.id
+        FROM users u
+        CROSS JOIN LATERAL (
+            SELECT id FROM attractions
+            WHERE id > (u.id * 7919) %% (SELECT max(id) FROM attractions)
+            ORDER BY id LIMIT %s
+        ) a
+        ON CONFLICT DO NOTHING;
+    """, (args.favorites_per_user,))
+    conn.commit()
+    conn.autocommit = True
+    cur.execute("ANALYZE;")
+    conn.close()
+    return scoped
+
+
+def drop_schema(database_url):
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    conn.cursor().execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+    conn.close()
+
+
+def start_app(env, port):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("app exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("app did not start within 60s")
+
+
+# ---------------- Traffic mix ----------------
+def _country(rnd):
+    return rnd.choice(list(COUNTRIES))
+
+
+def _near(rnd, spread=3.0):
+    lat, lng = COUNTRIES[_country(rnd)]
+    return round(lat + rnd.uniform(-spread, spread), 4), round(((lng + rnd.uniform(-spread, spread) + 540) % 360) - 180, 4)
+
+
+def _auth(ctx, rnd):
+    return {"Authorization": f"Bearer {rnd.choice(ctx['tokens'])}"}
+
+
+def _client_address(rnd, clients):
+    n = rnd.randrange(clients)
+    return f"10.0.{n // 256}.{n % 256}"
+
+
+# name -> (weight, build(rnd, ctx) -> (method, url, kwargs), acceptable statuses)
+SCENARIOS = {
+    "GET /attractions/{country}": (25, lambda rnd, ctx: ("GET", f"/attractions/{_country(rnd)}", {}), {200}),
+    "GET /attractions/{country}?fields": (
+        10, lambda rnd, ctx: ("GET", f"/attractions/{_country(rnd)}", {"params": {"fields": "id,name,lat,lng"}}), {200}),
+    "GET /attractions/nearby": (
+        10, lambda rnd, ctx: ("GET", "/attractions/nearby",
+                              {"params": dict(zip(("lat", "lng"), _near(rnd)), radius_km=50, limit=50)}), {200}),
+    "GET /location/{country}": (10, lambda rnd, ctx: ("GET", f"/location/{_country(rnd)}", {}), {200}),
+    "GET /weather/": (15, lambda rnd, ctx: ("GET", "/weather/", {"params": dict(zip(("lat", "lng"), _near(rnd)))}), {200}),
+    "GET /snapshot/{country}": (10, lambda rnd, ctx: ("GET", f"/snapshot/{_country(rnd)}", {}), {200}),
+    "GET /favorites/": (10, lambda rnd, ctx: ("GET", "/favorites/", {"headers": _auth(ctx, rnd)}), {200}),
+    "POST /favorites/": (
+        3, lambda rnd, ctx: ("POST", "/favorites/",
+                             {"headers": _auth(ctx, rnd), "json": {"attraction_id": rnd.randint(1, ctx["max_attraction_id"])}}),
+        {200, 400}),  # 400: already a favorite
+    "GET /images/{query}": (
+        5, lambda rnd, ctx: ("GET", f"/images/{_country(rnd)} landmark {rnd.randint(1, 50)}", {}), {200}),
+    "POST /auth/login": (
+        2, lambda rnd, ctx: ("POST", "/auth/login",
+                             {"json": {"email": f"user{rnd.randint(1, ctx['users'])}@loadtest.example.com",
+                                       "password": PASSWORD}}),
+        {200, 429}),  # 429: hashing queue full is the intended back-pressure
+}
+
+
+async def drive(client, ctx, args, total, record):
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[n][0] for n in names]
+    results = {name: ([], 0) for name in names}
+    counter = iter(range(total))
+
+    async def worker(worker_id):
+        rnd = random.Random(args.seed * 1000 + worker_id)
+        for _ in counter:
+            name = rnd.choices(names, weights)[0]
+            _, build, ok_statuses = SCENARIOS[name]
+            method, url, kwargs = build(rnd, ctx)
+            kwargs.setdefault("headers", {})["X-Forwarded-For"] = _client_address(rnd, args.clients)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                ok = response.status_code in ok_statuses
+            except httpx.HTTPError:
+                ok = False
+            if record:
+                latencies, errors = results[name]
+                latencies.append(time.perf_counter() - started)
+                results[name] = (latencies, errors + (not ok))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    return results, time.perf_counter() - started
+
+
+# One client ignoring limits: cache-busting image searches, weather and country lookups
+ABUSE = [
+    lambda rnd: f"/images/abuse {rnd.randrange(10 ** 9)}",
+    lambda rnd: f"/weather/?lat={rnd.uniform(-60, 60):.3f}&lng={rnd.uniform(-180, 180):.3f}",
+    lambda rnd: f"/location/{_country(rnd)}",
+]
+
+
+async def abuse(base_url, args, stop):
+    """Hammer upstream-backed endpoints from one address until ``stop`` is set. Returns status counts."""
+    statuses = Counter()
+    limits = httpx.Limits(max_connections=args.abusive_concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30,
+                                 headers={"X-Forwarded-For": ABUSER_ADDRESS}) as client:
+        async def worker(worker_id):
+            rnd = random.Random(args.seed * 7 + worker_id)
+            while not stop.is_set():
+                try:
+                    response = await client.get(rnd.choice(ABUSE)(rnd))
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError:
+                    statuses["error"] += 1
+
+        await asyncio.gather(*(worker(i) for i in range(args.abusive_concurrency)))
+    return statuses
+
+
+# ---------------- Reporting ----------------
+def build_report(results, elapsed, args, abuser=None):
+    endpoints = {name: summarize(latencies, errors, elapsed) for name, (latencies, errors) in results.items() if latencies}
+    all_latencies = [x for latencies, _ in results.values() for x in latencies]
+    overall = summarize(all_latencies, sum(errors for _, errors in results.values()), elapsed)
+    return {
+        "meta": {k: getattr(args, k) for k in ("requests", "concurrency", "seed", "users", "attractions_per_country",
+                                               "favorites_per_user", "upstream_delay", "bcrypt_rounds", "clients",
+                                               "abusive_concurrency", "rate_limit")},
+        "overall": overall,
+        "endpoints": endpoints,
+        **({"abuser": {str(status): count for status, count in abuser.items()}} if abuser else {}),
+    }
+
+
+def compare(report, baseline, tolerance, floor_ms):
+    """Rows comparing p95 and throughput with the baseline, and whether anything regressed."""
+    rows = []
+    regressed = False
+    pairs = [("overall", report["overall"], baseline.get("overall"))]
+    pairs += [(name, stats, baseline.get("endpoints", {}).get(name)) for name, stats in report["endpoints"].items()]
+    for name, current, base in pairs:
+        if not base:
+            rows.append({"endpoint": name, "status": "new"})
+            continue
+        p95_limit = max(base["p95_ms"] * (1 + tolerance), base["p95_ms"] + floor_ms)
+        bad_p95 = current["p95_ms"] > p95_limit
+        bad_rps = name == "overall" and current["rps"] < base["rps"] * (1 - tolerance)
+        bad_errors = current["errors"] > base["errors"] + max(1, 0.01 * current["requests"])
+        regressed |= bad_p95 or bad_rps or bad_errors
+        rows.append({
+            "endpoint": name,
+            "p95_ms": current["p95_ms"],
+            "base_p95_ms": base["p95_ms"],
+            "p95_change": f"{(current['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%" if base["p95_ms"] else "n/a",
+            "rps": current["rps"],
+            "base_rps": base["rps"],
+            "status": "REGRESSED" if (bad_p95 or bad_rps or bad_errors) else "ok",
+        })
+    return rows, regressed
+
+
+# ---------------- Main ----------------
+async def run(base_url, ctx, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {"Accept-Encoding": "gzip, br"}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, headers=headers, timeout=30) as client:
+        for i in range(min(args.login_users, ctx["users"])):
+            response = await client.post("/auth/login", json={"email": f"user{i + 1}@loadtest.example.com", "password": PASSWORD})
+            response.raise_for_status()
+            ctx["tokens"].append(response.json()["access_token"])
+
+        await drive(client, ctx, args, args.warmup, record=False)
+        stop = asyncio.Event()
+        abuser = asyncio.create_task(abuse(base_url, args, stop)) if args.abusive_concurrency else None
+        results, elapsed = await drive(client, ctx, args, args.requests, record=True)
+        stop.set()
+    return results, elapsed, (await abuser if abuser else None)
+
+
+def main(args):
+    database_url = os.environ["DATABASE_URL"]
+    routes = {
+        "/v3.1/": restcountries_stub(COUNTRIES),
+        "/v1/forecast": open_meteo_stub,
+        "/search/photos": unsplash_stub,
+    }
+    process = None
+    try:
+        started = time.perf_counter()
+        scoped = seed(database_url, args)
+        print(f"Seeded {args.users} users, {args.attractions_per_country * len(COUNTRIES)} attractions "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        with StubServer(routes, delay=args.upstream_delay) as stub:
+            env = {
+                **os.environ,
+                "DATABASE_URL": scoped,
+                "JWT_SECRET": os.environ.get("JWT_SECRET", "loadtest"),
+                "PYTHONPATH": BACKEND_DIR,
+                "RESTCOUNTRIES_URL": f"{stub.url}/v3.1/name/",
+                "RESTCOUNTRIES_ALL_URL": f"{stub.url}/v3.1/all",
+                "OPEN_METEO_URL": f"{stub.url}/v1/forecast",
+                "UNSPLASH_URL": f"{stub.url}/search/photos",
+                "UNSPLASH_ACCESS_KEY": "loadtest",
+                "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+                "RATE_LIMIT_ENABLED": "1" if args.rate_limit else "0",
+            }
+            process = start_app(env, args.port)
+            with psycopg2.connect(scoped) as conn, conn.cursor() as cur:
+                cur.execute("SELECT max(id) FROM attractions;")
+                max_id = cur.fetchone()[0]
+            ctx = {"tokens": [], "users": args.users, "max_attraction_id": max_id}
+            results, elapsed, abuser = asyncio.run(run(f"http://127.0.0.1:{args.port}", ctx, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if not args.keep:
+            drop_schema(database_url)
+
+    report = build_report(results, elapsed, args, abuser)
+    rows = [{"endpoint": name, **stats} for name, stats in sorted(report["endpoints"].items())]
+    rows.append({"endpoint": "overall", **report["overall"]})
+    print(f"{args.requests} requests, concurrency {args.concurrency}, upstream delay {args.upstream_delay * 1000:.0f}ms")
+    print_table(rows, ["endpoint", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"])
+    if abuser:
+        print(f"Abusive client ({args.abusive_concurrency} connections, rate limit {'on' if args.rate_limit else 'off'}): "
+              f"{sum(abuser.values())} requests, " + ", ".join(f"{status}: {n}" for status, n in sorted(abuser.items(), key=str)))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows, regressed = compare(report, baseline, args.tolerance, args.floor_ms)
+        print(f"\nAgainst {args.baseline} (tolerance {args.tolerance:.0%}, floor {args.floor_ms}ms):")
+        print_table(rows, ["endpoint", "p95_ms", "base_p95_ms", "p95_change", "rps", "base_rps", "status"])
+        if regressed:
+            print("❌ Performance regression")
+            sys.exit(1)
+        print("✅ No regression")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--login-users", type=int, default=50, help="distinct tokens used by authenticated requests")
+    parser.add_argument("--attractions-per-country", type=int, default=2000)
+    parser.add_argument("--favorites-per-user", type=int, default=20)
+    parser.add_argument("--upstream-delay", type=float, default=0.05, help="stub upstream latency in seconds")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="cost of the seeded password hashes")
+    parser.add_argument("--clients", type=int, default=200, help="distinct client addresses in the normal mix")
+    parser.add_argument("--abusive-concurrency", type=int, default=0,
+                        help="connections of one abusive client running alongside the measured mix")
+    parser.add_argument("--no-rate-limit", dest="rate_limit", action="store_false",
+                        help="start the app with RATE_LIMIT_ENABLED=0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="write this run's report as JSON")
+    parser.add_argument("--save-baseline", help="write this run's report as the new baseline")
+    parser.add_argument("--baseline", help="compare against this baseline report")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95/throughput regression")
+    parser.add_argument("--floor-ms", type=float, default=5.0, help="ignore p95 increases smaller than this")
+    parser.add_argument("--keep", action="store_true", help="keep the loadtest schema for inspection")
+    main(parser.parse_args())
@@ -0,0 +1,22 @@
+import argparse
+import json
+import sys
+
+from app.bulk_import import import_attractions
+from app.database import db_connection
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load attractions from a JSON Lines or CSV file.")
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="defaults to the file extension")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+    if args.path == "-":
+        source = sys.stdin
+    else:
+        source = open(args.path, newline="", encoding="utf-8")
+
+    with source, db_connection() as conn:
+        result = import_attractions(conn, source, fmt)
+    print(json.dumps(result, indent=2))
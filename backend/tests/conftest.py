@@ -0,0 +1,4 @@
+import os
+
+# app.security reads JWT_SECRET at import time
+os.environ.setdefault("JWT_SECRET", "test-secret")
@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from app import attractions
+from app.main import app
+from app.shared_cache import SharedCache
+
+
+def test_warm_up_fills_summary_and_first_pages(monkeypatch):
+    cache = SharedCache("attractions", ttl=60)
+    reads = []
+    monkeypatch.setattr(attractions, "attractions_cache", cache)
+    monkeypatch.setattr(attractions, "_summary_signature", lambda: (3, datetime(2026, 1, 1, tzinfo=timezone.utc)))
+    monkeypatch.setattr(attractions, "fetch_summaries", lambda: [
+        {"country": c, "count": n, "bbox": [0, 0, 1, 1], "centroid": {"lat": 0.5, "lng": 0.5},
+         "last_modified": "2026-01-01T00:00:00+00:00"}
+        for c, n in (("France", 30), ("Peru", 12), ("Chad", 1))
+    ])
+    monkeypatch.setattr(attractions, "attractions_version", lambda country, primary=False: 3)
+    monkeypatch.setattr(attractions, "fetch_page_and_version",
+                        lambda country, after, limit, selected: reads.append(country) or ([{"id": 1}], None, 3))
+
+    assert attractions.warm_attractions_cache(top_n=2) == 2
+    assert reads == ["France", "Peru"]
+    # The default listing request is now served from the cache
+    key = attractions._page_cache_key("Peru", None, attractions.DEFAULT_PAGE_SIZE, list(attractions.ATTRACTION_COLUMNS))
+    assert cache.get(key)["content"]["attractions"] == [{"id": 1}]
+    assert cache.get(attractions.SUMMARY_CACHE_KEY)["content"]["count"] == 3
+
+    # A write drops the country's pages and the summary, not other countries
+    attractions.invalidate_country("Peru")
+    assert cache.get(key) is None and cache.get(attractions.SUMMARY_CACHE_KEY) is None
+    france = attractions._page_cache_key("France", None, attractions.DEFAULT_PAGE_SIZE, list(attractions.ATTRACTION_COLUMNS))
+    assert cache.get(france) is not None
+
+
+def test_page_is_not_cached_when_a_write_lands_while_loading(monkeypatch):
+    cache = SharedCache("attractions", ttl=60)
+    versions = iter([3, 4, 4, 4])
+    monkeypatch.setattr(attractions, "attractions_cache", cache)
+    monkeypatch.setattr(attractions, "attractions_version", lambda country, primary=False: next(versions))
+    seen = iter([3, 4])
+    monkeypatch.setattr(attractions, "fetch_page_and_version",
+                        lambda country, after, limit, selected: ([{"id": 1}], None, next(seen)))
+    selected = list(attractions.ATTRACTION_COLUMNS)
+    key = attractions._page_cache_key("Peru", None, 10, selected)
+
+    # Version 3 when the load started, 4 once the page was stored: the page may predate the write
+    entry = attractions._load_page("Peru", None, 10, selected, next(versions))
+    assert entry["etag"] == attractions._page_etag("Peru", 3, None, 10, selected)
+    assert cache.get(key) is None
+
+    attractions._load_page("Peru", None, 10, selected, next(versions))
+    assert cache.get(key)["etag"] == attractions._page_etag("Peru", 4, None, 10, selected)
+
+
+def test_pages_and_summary_from_a_lagging_replica_are_not_cached(monkeypatch):
+    cache = SharedCache("attractions", ttl=60)
+    replica = {"version": 4, "last_modified": "2026-01-01T00:00:00+00:00"}
+    monkeypatch.setattr(attractions, "attractions_cache", cache)
+    monkeypatch.setattr(attractions, "attractions_version", lambda country, primary=False: 5)
+    monkeypatch.setattr(attractions, "fetch_page_and_version",
+                        lambda country, after, limit, selected: ([{"id": 1}], None, replica["version"]))
+    monkeypatch.setattr(attractions, "_summary_signature", lambda: (1, datetime(2026, 1, 2, tzinfo=timezone.utc)))
+    monkeypatch.setattr(attractions, "fetch_summaries", lambda: [
+        {"country": "Peru", "count": 1, "bbox": [0, 0, 1, 1], "centroid": {"lat": 0.5, "lng": 0.5},
+         "last_modified": replica["last_modified"]}
+    ])
+    client = TestClient(app)
+    selected = list(attractions.ATTRACTION_COLUMNS)
+    key = attractions._page_cache_key("Peru", None, attractions.DEFAULT_PAGE_SIZE, selected)
+
+    # The replica is one write behind the primary: served, with an ETag for what it saw, but not cached
+    response = client.get("/attractions/Peru")
+    assert response.headers["etag"] == attractions._page_etag("Peru", 4, None, attractions.DEFAULT_PAGE_SIZE, selected)
+    assert cache.get(key) is None
+    assert client.get("/attractions/summary").status_code == 200
+    assert cache.get(attractions.SUMMARY_CACHE_KEY) is None
+
+    # Caught up
+    replica.update(version=5, last_modified="2026-01-02T00:00:00+00:00")
+    client.get("/attractions/Peru")
+    client.get("/attractions/summary")
+    assert cache.get(key) is not None and cache.get(attractions.SUMMARY_CACHE_KEY) is not None
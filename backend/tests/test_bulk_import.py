@@ -0,0 +1,90 @@
+import asyncio
+
+import anyio.to_thread
+import pytest
+
+from app.bulk_import import InvalidRecord, import_attractions, iter_csv, iter_jsonl, iter_stream_lines, to_row
+
+
+def test_stream_lines_split_across_chunks():
+    async def chunks():
+        for chunk in [b'{"a":', b'1}\n{"b"', b":2}\r\n", "é".encode()[:1], "é".encode()[1:] + b"\n", b"tail"]:
+            yield chunk
+
+    async def main():
+        stream = chunks()
+        return await anyio.to_thread.run_sync(lambda: list(iter_stream_lines(stream)))
+
+    assert asyncio.run(main()) == ['{"a":1}\n', '{"b":2}\n', "é\n", "tail"]
+
+
+def test_line_separators_inside_json_strings_do_not_split_records():
+    record = '{"country": "France", "name": "Louvre", "lat": 48.86, "lng": 2.33, "description": "a\u2028b\u2029c\x85d"}\n'
+
+    async def chunks():
+        yield record.encode()
+
+    async def main():
+        stream = chunks()
+        return await anyio.to_thread.run_sync(lambda: list(iter_stream_lines(stream)))
+
+    lines = asyncio.run(main())
+    assert lines == [record]
+    (_, parsed), = iter_jsonl(lines)
+    assert to_row(parsed)[4] == "a\u2028b\u2029c\x85d"
+
+
+def test_records_are_validated():
+    lines = ['{"country": "France", "name": "Louvre", "lat": 48.86, "lng": "2.33"}\n', "\n", "oops\n"]
+    (first_line, first), (bad_line, bad) = iter_jsonl(lines)
+    assert to_row(first) == ("France", "Louvre", 48.86, 2.33, None, None, None, None, None, "available")
+    assert bad_line == 3
+    with pytest.raises(InvalidRecord):
+        to_row(bad)
+
+    (_, record), = iter_csv(["country,name,lat,lng,status\n", '"Spain","Sagrada, Familia",41.4,x,open\n'])
+    with pytest.raises(InvalidRecord, match="lat and lng"):
+        to_row(record)
+
+
+class RecordingConnection:
+    """Stands in for psycopg2: keeps what would be COPYed, inserts all of it."""
+
+    def __init__(self):
+        self.copied = []
+        self.rowcount = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.rowcount = len(self.copied)
+
+    def copy_expert(self, sql, buf):
+        self.copied.extend(buf.read().splitlines())
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_values_the_table_would_reject_are_invalid_records():
+    lines = [
+        '{"country": "France", "name": "Louvre", "lat": 48.86, "lng": 2.33}\n',
+        '{"country": "France", "name": "%s", "lat": 48.85, "lng": 2.35}\n' % ("x" * 201),
+        '{"country": "France", "name": "Eiffel Tower", "lat": "nan", "lng": 2.29}\n',
+        '{"country": "France", "name": "Notre-Dame", "lat": 48.85, "lng": 2.35}\n',
+    ]
+    conn = RecordingConnection()
+    result = import_attractions(conn, lines)
+
+    assert result["received"] == 4 and result["inserted"] == 2 and result["invalid"] == 2
+    assert [e["line"] for e in result["errors"]] == [2, 3]
+    assert len(conn.copied) == 2
+    with pytest.raises(InvalidRecord, match="lat and lng"):
+        to_row({"country": "Peru", "name": "Machu Picchu", "lat": -13.16, "lng": float("inf")})
@@ -0,0 +1,102 @@
+import asyncio
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware, choose_encoding
+from app.responses import FastJSONResponse, dumps
+
+
+def build_app():
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    def big():
+        return FastJSONResponse({"items": [{"id": i, "name": f"Attraction {i}"} for i in range(200)]},
+                                headers={"ETag": '"v1"'})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"line {i}\n" * 50 for i in range(20)), media_type="text/plain")
+
+    @app.get("/photo")
+    def photo():
+        return Response(b"\xff\xd8" * 1000, media_type="image/jpeg")
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    return app
+
+
+def test_choose_encoding_honours_q_values():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("br;q=0.2, gzip;q=0.8") == "gzip"
+    assert choose_encoding("br;q=0, gzip;q=0") is None
+    assert choose_encoding("*") == "br"
+    assert choose_encoding("") is None
+
+
+def test_large_responses_are_compressed_and_etag_weakened():
+    pytest.importorskip("brotli")
+    client = TestClient(build_app())
+    plain = dumps({"items": [{"id": i, "name": f"Attraction {i}"} for i in range(200)]})
+
+    response = client.get("/big", headers={"Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.content == plain  # the test client decodes br
+
+    raw = client.get("/big", headers={"Accept-Encoding": "gzip"}).headers
+    assert raw["content-encoding"] == "gzip" and int(raw["content-length"]) < len(plain)
+
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip, br"}).headers
+    identity = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers and identity.headers["etag"] == '"v1"'
+
+
+def test_compressed_bodies_decode_to_the_original():
+    brotli = pytest.importorskip("brotli")
+    app = build_app()
+    plain = dumps({"items": [{"id": i, "name": f"Attraction {i}"} for i in range(200)]})
+
+    async def fetch(path, encoding):
+        messages = []
+        requested = []
+
+        async def receive():
+            if requested:  # streaming responses wait here for a disconnect
+                await asyncio.Event().wait()
+            requested.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+                 "headers": [(b"accept-encoding", encoding.encode())], "http_version": "1.1", "scheme": "http",
+                 "server": ("test", 80), "client": ("test", 1), "root_path": "", "app": app}
+        await app(scope, receive, send)
+        headers = dict(messages[0]["headers"])
+        return headers, b"".join(m.get("body", b"") for m in messages[1:])
+
+    # Raw ASGI messages, so nothing between the middleware and the assertions decodes the body
+    headers, body = asyncio.run(fetch("/big", "br"))
+    assert headers[b"content-encoding"] == b"br" and int(headers[b"content-length"]) == len(body)
+    assert brotli.decompress(body) == plain
+
+    headers, body = asyncio.run(fetch("/stream", "br"))
+    assert headers[b"content-encoding"] == b"br" and b"content-length" not in headers
+    assert brotli.decompress(body) == b"".join(f"line {i}\n".encode() * 50 for i in range(20))
+
+    headers, body = asyncio.run(fetch("/stream", "gzip"))
+    assert gzip.decompress(body) == b"".join(f"line {i}\n".encode() * 50 for i in range(20))
+
+    headers, body = asyncio.run(fetch("/photo", "br"))
+    assert b"content-encoding" not in headers and body == b"\xff\xd8" * 1000
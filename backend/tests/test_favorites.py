@@ -0,0 +1,25 @@
+import pytest
+from fastapi import HTTPException
+
+from app.favorites import EXPANDED_FAVORITE_COLUMNS, FAVORITE_CONVERT, _id_list
+from app.pagination import build_rows, parse_fields, select_list
+
+
+def test_batch_ids_are_validated_and_deduplicated():
+    assert _id_list({"attraction_ids": [3, 1, 3]}, "attraction_ids") == [3, 1]
+    assert _id_list({}, "ids", required=False) == []
+    for payload in ({}, {"attraction_ids": []}, {"attraction_ids": [1, "2"]}, {"attraction_ids": [True]}):
+        with pytest.raises(HTTPException):
+            _id_list(payload, "attraction_ids")
+    for out_of_range in (0, -1, 2**31):
+        with pytest.raises(HTTPException, match="between 1 and"):
+            _id_list({"attraction_ids": [1, out_of_range]}, "attraction_ids")
+    with pytest.raises(HTTPException, match="At most"):
+        _id_list({"attraction_ids": list(range(10_000))}, "attraction_ids")
+
+
+def test_expanded_favorites_carry_the_attraction_record():
+    selected = parse_fields("lat,lng,images", EXPANDED_FAVORITE_COLUMNS)
+    assert select_list(selected, EXPANDED_FAVORITE_COLUMNS) == "f.id, a.lat, a.lng, a.image1, a.image2, a.image3, a.image4"
+    rows = build_rows([(7, 48.8, 2.3, "a.jpg", None, "c.jpg", None)], selected, EXPANDED_FAVORITE_COLUMNS, FAVORITE_CONVERT)
+    assert rows == [{"id": 7, "lat": 48.8, "lng": 2.3, "images": ["a.jpg", "c.jpg"]}]
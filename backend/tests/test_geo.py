@@ -0,0 +1,33 @@
+import random
+
+from app.geo import cells_for_bbox, grid_cell, haversine_km, lng_ranges, radius_bbox
+
+
+def test_bbox_cells_cover_points_inside():
+    random.seed(7)
+    for _ in range(200):
+        lat, lng = random.uniform(-89, 89), random.uniform(-180, 180)
+        min_lat, min_lng, max_lat, max_lng = radius_bbox(lat, lng, 75)
+        cells = set(cells_for_bbox(min_lat, min_lng, max_lat, max_lng))
+        assert grid_cell(lat, lng) in cells
+        # A point 70 km due east/west/north/south is inside the circle and its cell is covered
+        for bearing_lat, bearing_lng in ((70 / 111.32, 0), (0, 0.6)):
+            other_lat, other_lng = lat + bearing_lat, ((lng + bearing_lng + 180) % 360) - 180
+            if haversine_km(lat, lng, other_lat, other_lng) <= 75:
+                assert grid_cell(other_lat, other_lng) in cells
+
+
+def test_antimeridian_box_is_split():
+    min_lat, min_lng, max_lat, max_lng = radius_bbox(-17.5, 179.9, 30)
+    assert min_lng > max_lng
+    assert lng_ranges(min_lng, max_lng) == [(min_lng, 180.0), (-180.0, max_lng)]
+    cells = set(cells_for_bbox(min_lat, min_lng, max_lat, max_lng))
+    assert grid_cell(-17.5, 179.9) in cells and grid_cell(-17.5, -179.9) in cells
+    assert grid_cell(-17.5, 0) not in cells
+
+
+def test_edges_and_large_boxes():
+    assert grid_cell(90, 180) == grid_cell(89.99, 179.99)
+    assert radius_bbox(89.5, 10, 100)[1:4:2] == (-180.0, 180.0)
+    assert cells_for_bbox(-80, -170, 80, 170) is None
+    assert round(haversine_km(48.8584, 2.2945, 48.8606, 2.3376), 2) == 3.16
@@ -0,0 +1,31 @@
+import asyncio
+
+from app import hashing
+
+
+def test_hash_and_check_in_process_pool(monkeypatch):
+    monkeypatch.setattr(hashing, "BCRYPT_ROUNDS", 4)
+    monkeypatch.setattr(hashing, "HASH_WORKERS", 1)
+    hashing.init_hash_pool()
+    try:
+        async def main():
+            hashed = await hashing.hash_password("s3cret")
+            return hashed, await hashing.check_password("s3cret", hashed), await hashing.check_password("nope", hashed)
+
+        hashed, good, bad = asyncio.run(main())
+    finally:
+        hashing.close_hash_pool()
+    assert hashed.startswith("$2b$04$") and good and not bad
+
+
+def test_full_queue_is_rejected(monkeypatch):
+    monkeypatch.setattr(hashing, "BCRYPT_ROUNDS", 4)
+    monkeypatch.setattr(hashing, "HASH_QUEUE_LIMIT", 2)
+
+    async def main():
+        return await asyncio.gather(*(hashing.hash_password("pw") for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    busy = [r for r in results if isinstance(r, hashing.HashPoolBusy)]
+    assert len(busy) == 3 and all(r.retry_after >= 1 for r in busy)
+    assert hashing.hash_stats()["pending"] == 0
@@ -0,0 +1,29 @@
+from starlette.requests import Request
+
+from app.http_cache import cached_json, make_etag, not_modified
+
+
+def request_with(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+
+def test_body_etag_and_conditional_get():
+    first = cached_json(request_with(), {"a": 1}, max_age=120)
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "public, max-age=120"
+    assert etag == cached_json(request_with(), {"a": 1}, max_age=120).headers["etag"]
+
+    for header in (etag, f'"other", W/{etag}', "*"):
+        response = cached_json(request_with(header), {"a": 1}, max_age=120)
+        assert response.status_code == 304 and response.body == b""
+        assert response.headers["etag"] == etag
+    assert cached_json(request_with(etag), {"a": 2}, max_age=120).status_code == 200
+
+
+def test_version_etag_skips_the_body():
+    etag = make_etag("attractions", "Peru", 7, None, 100, "id,name")
+    assert etag != make_etag("attractions", "Peru", 8, None, 100, "id,name")
+    assert not_modified(request_with(), etag, 60) is None
+    assert not_modified(request_with(etag), etag, 60).status_code == 304
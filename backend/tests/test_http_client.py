@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app import http_client
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """/flaky: 503 for the first two hits; /slow: sleeps 0.5 s; /down: always 500; else 200."""
+
+    hits = {}
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        self.hits[path] = self.hits.get(path, 0) + 1
+        if path == "/slow":
+            time.sleep(0.5)
+        status = 200
+        if path == "/down" or (path == "/flaky" and self.hits[path] <= 2):
+            status = 500 if path == "/down" else 503
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    StubHandler.hits = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def run(coro_fn):
+    async def main():
+        http_client.init_http_client()
+        try:
+            return await coro_fn()
+        finally:
+            await http_client.close_http_client()
+
+    return asyncio.run(main())
+
+
+def test_retries_with_backoff_then_succeeds(stub, monkeypatch):
+    policy = http_client.Upstream("stub", retries=2, backoff_base=0.01)
+    monkeypatch.setitem(http_client.UPSTREAMS, "stub", policy)
+
+    response = run(lambda: http_client.http_get(f"{stub}/flaky", upstream="stub"))
+    assert response.status_code == 200
+    assert StubHandler.hits["/flaky"] == 3
+    assert policy.retried == 2 and policy.failures == 0
+    assert policy.latency.count == 3
+
+
+def test_timeout_is_per_upstream(stub, monkeypatch):
+    monkeypatch.setitem(http_client.UPSTREAMS, "stub", http_client.Upstream("stub", timeout=0.1, retries=0))
+    started = time.perf_counter()
+    with pytest.raises(httpx.TimeoutException):
+        run(lambda: http_client.http_get(f"{stub}/slow", upstream="stub"))
+    assert time.perf_counter() - started < 0.4
+
+
+def test_circuit_opens_fails_fast_and_recovers(stub, monkeypatch):
+    policy = http_client.Upstream("stub", retries=0, failure_threshold=2, reset_timeout=0.2)
+    monkeypatch.setitem(http_client.UPSTREAMS, "stub", policy)
+
+    async def scenario():
+        for _ in range(2):
+            assert (await http_client.http_get(f"{stub}/down", upstream="stub")).status_code == 500
+        assert policy.state == "open"
+        with pytest.raises(http_client.CircuitOpenError):
+            await http_client.http_get(f"{stub}/down", upstream="stub")
+
+        await asyncio.sleep(0.25)
+        assert policy.state == "half_open"
+        assert (await http_client.http_get(f"{stub}/flaky", upstream="stub")).status_code == 503
+        assert policy.state == "open"  # failed trial re-opens
+
+        await asyncio.sleep(0.25)
+        assert (await http_client.http_get(f"{stub}/ok", upstream="stub")).status_code == 200
+        assert policy.state == "closed"
+
+    run(scenario)
+    assert StubHandler.hits["/down"] == 2
+    assert policy.short_circuited >= 1
+
+
+def test_concurrency_cap_sheds_instead_of_queueing(stub, monkeypatch):
+    policy = http_client.Upstream("stub", retries=0, max_concurrent=2)
+    monkeypatch.setitem(http_client.UPSTREAMS, "stub", policy)
+
+    async def scenario():
+        calls = [http_client.http_get(f"{stub}/slow", upstream="stub") for _ in range(3)]
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    started = time.perf_counter()
+    results = run(scenario)
+    assert sum(isinstance(r, http_client.UpstreamBusy) for r in results) == 1
+    assert StubHandler.hits["/slow"] == 2 and time.perf_counter() - started < 0.9
+    assert policy.shed == 1 and policy.in_flight == 0 and policy.failures == 0
@@ -0,0 +1,138 @@
+import asyncio
+import io
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import http_client, image_proxy
+from app.image_proxy import ThumbnailCache
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def jpeg(width, height):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(out, "JPEG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def origin():
+    """Local HTTP server standing in for the image CDN; counts requests per path."""
+    body = jpeg(1200, 800)
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            if self.path.startswith("/moved/"):
+                self.send_response(302)
+                self.send_header("Location", self.path.replace("/moved/", "/", 1))
+                self.end_headers()
+                return
+            if self.path == "/elsewhere":
+                self.send_response(302)
+                self.send_header("Location", "http://169.254.169.254/latest/meta-data")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            if self.path != "/unsized.jpg":  # HTTP/1.0: the body then ends when the connection closes
+                self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", hits
+    server.shutdown()
+
+
+def test_thumbnails_are_fetched_once_and_served_from_disk(monkeypatch, tmp_path, origin):
+    base_url, hits = origin
+    monkeypatch.setattr(image_proxy, "thumbnail_cache", ThumbnailCache(str(tmp_path), 10 * 1024 * 1024))
+    monkeypatch.setattr(image_proxy, "IMAGE_PROXY_ALLOWED_HOSTS", {"*"})
+    monkeypatch.setattr(image_proxy, "_image_url", lambda attraction_id, n: f"{base_url}/photo-{attraction_id}-{n}.jpg")
+
+    async def scenario():
+        http_client.init_http_client()
+        try:
+            return await asyncio.gather(*(image_proxy.get_thumbnail(1, 1, w) for w in (100, 300, 5000)))
+        finally:
+            await http_client.close_http_client()
+
+    results = asyncio.run(scenario())
+    assert hits == ["/photo-1-1.jpg"]  # concurrent misses share one origin fetch
+    assert image_proxy._locks == {}
+    widths = [Image.open(path).size for path, _, _, _ in results]
+    assert widths == [(160, 107), (320, 213), (640, 427)]
+    assert all(media_type == "image/jpeg" for _, _, media_type, _ in results)
+    assert [cached for _, _, _, cached in results].count(False) == 1
+
+    from app.main import app
+    client = TestClient(app)
+    response = client.get("/images/proxy/1/1?w=300", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200 and hits == ["/photo-1-1.jpg"]
+    assert response.headers["x-cache"] == "hit"
+    assert response.headers["cache-control"] == f"public, max-age={365 * 86400}, immutable"
+    assert "content-encoding" not in response.headers
+    assert Image.open(io.BytesIO(response.content)).size == (320, 213)
+    again = client.get("/images/proxy/1/1?w=300", headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_disk_cache_evicts_least_recently_served(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_bytes=3500)
+    for i, url in enumerate(("a", "b", "c")):
+        cache.store(url, {160: (bytes([i]) * 1000, ".jpg")})
+        os.utime(cache.lookup(url, 160)[0], (1000 + i, 1000 + i))
+    # Serving "a" makes it recent, so "b" goes when "d" pushes the total over budget
+    os.utime(cache.lookup("a", 160)[0])
+    cache.store("d", {160: (b"d" * 1000, ".jpg")})
+    assert [cache.lookup(url, 160) is not None for url in "abcd"] == [True, False, True, True]
+    assert cache.stats()["bytes"] == 3000 and cache.evictions == 1
+
+    # Identical bytes from another URL share one blob
+    cache.store("e", {160: (b"d" * 1000, ".jpg")})
+    assert cache.lookup("e", 160)[0] == cache.lookup("d", 160)[0]
+
+
+def test_only_allowed_hosts_are_fetched(monkeypatch):
+    monkeypatch.setattr(image_proxy, "IMAGE_PROXY_ALLOWED_HOSTS", {"images.unsplash.com"})
+    assert image_proxy.host_allowed("https://images.unsplash.com/photo-1?w=1080")
+    assert not image_proxy.host_allowed("http://169.254.169.254/latest/meta-data")
+    assert not image_proxy.host_allowed("file:///etc/passwd")
+    assert image_proxy.pick_width(1) == 160 and image_proxy.pick_width(161) == 320 and image_proxy.pick_width(9999) == 640
+
+
+def test_origin_redirects_and_size_are_checked(monkeypatch, origin):
+    base_url, hits = origin
+    host = base_url.split("//")[1].split(":")[0]
+    monkeypatch.setattr(image_proxy, "IMAGE_PROXY_ALLOWED_HOSTS", {host})
+
+    async def fetch(path):
+        http_client.init_http_client()
+        try:
+            return await image_proxy._fetch_original(f"{base_url}{path}")
+        except HTTPException as e:
+            return e
+        finally:
+            await http_client.close_http_client()
+
+    data, content_type = asyncio.run(fetch("/moved/photo.jpg"))
+    assert content_type == "image/jpeg" and hits == ["/moved/photo.jpg", "/photo.jpg"]
+    denied = asyncio.run(fetch("/elsewhere"))
+    assert denied.status_code == 403 and hits[-1] == "/elsewhere"
+
+    # Over the cap by Content-Length, and while streaming a body without one
+    monkeypatch.setattr(image_proxy, "IMAGE_PROXY_MAX_ORIGIN_BYTES", len(data) - 1)
+    for path in ("/photo.jpg", "/unsized.jpg"):
+        too_large = asyncio.run(fetch(path))
+        assert too_large.status_code == 502 and too_large.detail == "Image too large"
@@ -0,0 +1,76 @@
+import asyncio
+from contextlib import contextmanager
+
+import httpx
+
+from app import attractions, http_client, image_service
+from app.shared_cache import SharedCache
+
+
+def test_lookup_layers_and_background_fill(monkeypatch):
+    persisted = {}
+    filled = {}
+    upstream_queries = []
+
+    monkeypatch.setattr(image_service, "UNSPLASH_ACCESS_KEY", "key")
+    monkeypatch.setattr(image_service, "_load_cached", lambda key: persisted.get(key))
+    monkeypatch.setattr(image_service, "_store_cached", lambda key, urls: persisted.__setitem__(key, urls))
+    monkeypatch.setattr(image_service, "_fill_attraction_images", lambda i, urls: filled.__setitem__(i, urls))
+    image_service.image_lru.clear()
+
+    def handler(request):
+        upstream_queries.append(request.url.params["query"])
+        return httpx.Response(200, json={"results": [{"urls": {"regular": "https://img/1"}}]})
+
+    async def scenario():
+        http_client.init_http_client(transport=httpx.MockTransport(handler))
+        image_service.start_image_worker()
+        try:
+            assert await image_service.lookup_images("Eiffel Tower") == ["https://img/1"]
+            image_service.image_lru.clear()
+            # Served from the persistent table, not Unsplash
+            assert await image_service.lookup_images("  eiffel   tower ") == ["https://img/1"]
+
+            assert await asyncio.to_thread(image_service.enqueue_image_fill, 7, "Louvre")
+            await image_service._queue.join()
+        finally:
+            await image_service.stop_image_worker()
+            await http_client.close_http_client()
+
+    asyncio.run(scenario())
+    assert upstream_queries == ["Eiffel Tower", "Louvre"]
+    assert image_service.image_stats()["db_hits"] == 1
+    assert filled == {7: ["https://img/1"]}
+
+
+def test_filled_images_invalidate_the_country_pages_and_summary(monkeypatch):
+    class UpdatedRow:
+        def cursor(self):
+            return self
+
+        def execute(self, sql, params=None):
+            pass
+
+        def fetchone(self):
+            return ("Peru",)
+
+        def commit(self):
+            pass
+
+        def close(self):
+            pass
+
+    @contextmanager
+    def connection(readonly=False):
+        yield UpdatedRow()
+
+    cache = SharedCache("attractions", ttl=60)
+    monkeypatch.setattr(attractions, "attractions_cache", cache)
+    monkeypatch.setattr(image_service, "db_connection", connection)
+    cache.set("Peru:None:500:id,name", {"etag": "a"})
+    cache.set("Chad:None:500:id,name", {"etag": "b"})
+    cache.set(attractions.SUMMARY_CACHE_KEY, {"etag": "c"})
+
+    image_service._fill_attraction_images(7, ["https://images.unsplash.com/a.jpg"])
+    assert cache.get("Peru:None:500:id,name") is None and cache.get(attractions.SUMMARY_CACHE_KEY) is None
+    assert cache.get("Chad:None:500:id,name") is not None
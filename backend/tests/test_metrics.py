@@ -0,0 +1,38 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.concurrency import run_in_threadpool
+
+from app import metrics
+from app.metrics import Histogram, MetricsMiddleware, record_db_query, render_prometheus
+
+
+def test_histogram_buckets_and_percentiles():
+    h = Histogram(buckets=(0.1, 0.2, 0.5))
+    for value in (0.05, 0.15, 0.15, 0.4, 2.0):
+        h.observe(value)
+    assert h.cumulative() == [(0.1, 1), (0.2, 3), (0.5, 4), ("+Inf", 5)]
+    assert 0.1 <= h.percentile(50) <= 0.2
+    assert h.summary()["count"] == 5
+
+
+def test_middleware_reports_route_db_time_and_server_timing():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        # DB work happens on the threadpool, in a copy of the request context
+        await run_in_threadpool(record_db_query, 0.002)
+        record_db_query(0.001)
+        return {"id": item_id}
+
+    client = TestClient(app)
+    for i in range(3):
+        response = client.get(f"/items/{i}")
+    assert response.headers["server-timing"].startswith("app;dur=")
+    assert 'db;dur=3.0;desc="2 queries"' in response.headers["server-timing"]
+
+    text = render_prometheus()
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 3' in text
+    assert "http_requests_in_flight 0" in text
+    assert metrics.db_query_latency.count >= 6
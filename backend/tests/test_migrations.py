@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from app import database
+from app.migrations import rebuild_table, run_migrations
+
+# A throwaway database: this test drops and recreates tables in it
+SCRATCH_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def _query(sql, params=None):
+    with database.db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall() if cur.description else None
+        conn.commit()
+        cur.close()
+    return rows
+
+
+@pytest.mark.skipif(not SCRATCH_URL, reason="set TEST_DATABASE_URL to a throwaway database")
+def test_dropped_table_is_recreated_with_its_derived_state(monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_URL", SCRATCH_URL)
+    run_migrations()
+    _query("INSERT INTO attractions (country, name, lat, lng) VALUES ('Zedland', 'Tower', 1, 2) "
+           "ON CONFLICT DO NOTHING;")
+    version = _query("SELECT version FROM attraction_versions WHERE country = 'Zedland';")[0][0]
+
+    rebuild_table("attractions")
+
+    assert _query("SELECT count(*) FROM attractions;") == [(0,)]
+    assert _query("SELECT count(*) FROM attraction_summaries;") == [(0,)]
+    assert _query("SELECT version FROM attraction_versions WHERE country = 'Zedland';")[0][0] > version
+    # Triggers and generated columns came back with the table
+    _query("INSERT INTO attractions (country, name, lat, lng) VALUES ('Zedland', 'Tower', 1, 2);")
+    assert _query("SELECT attraction_count FROM attraction_summaries WHERE country = 'Zedland';") == [(1,)]
+    assert _query("SELECT grid_cell IS NOT NULL FROM attractions;") == [(True,)]
+    assert run_migrations() == []
+
+    # favorites references attractions, so it was rebuilt with its foreign key
+    foreign_keys = "SELECT count(*) FROM pg_constraint WHERE conrelid = 'favorites'::regclass AND contype = 'f';"
+    assert _query(foreign_keys) == [(2,)]
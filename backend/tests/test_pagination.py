@@ -0,0 +1,39 @@
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import (
+    build_rows, decode_cursor, decode_offset_cursor, encode_cursor, encode_offset_cursor, page, parse_fields,
+)
+
+COLUMNS = {"id": ("id",), "name": ("name",), "images": ("image1", "image2")}
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+    assert decode_cursor(None) is None
+    for bad in ("not-a-cursor", encode_cursor("x")):
+        with pytest.raises(HTTPException):
+            decode_cursor(bad)
+
+
+def test_projection_and_paging():
+    selected = parse_fields("images", COLUMNS)
+    assert selected == ["id", "images"]
+    with pytest.raises(HTTPException):
+        parse_fields("id,secret", COLUMNS)
+
+    rows = [(1, "a", None), (2, "b", "c"), (3, None, None)]
+    items = build_rows(rows, selected, COLUMNS, {"images": lambda imgs: [i for i in imgs if i]})
+    assert items[1] == {"id": 2, "images": ["b", "c"]}
+
+    first, cursor = page(items, 2)
+    assert [i["id"] for i in first] == [1, 2] and decode_cursor(cursor) == 2
+    assert page(items, 3) == (items, None)
+
+
+def test_offset_cursor_carries_state_and_caps_depth():
+    assert decode_offset_cursor(encode_offset_cursor(40, mode="fuzzy"), 1000) == (40, {"mode": "fuzzy"})
+    assert decode_offset_cursor(None, 1000) == (0, {})
+    for bad in (encode_offset_cursor(-1), encode_cursor(5), encode_offset_cursor(2000)):
+        with pytest.raises(HTTPException):
+            decode_offset_cursor(bad, 1000)
@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+from psycopg2 import extensions
+
+from app.database import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, *args):
+        if self.conn.broken:
+            raise Exception("server closed the connection unexpectedly")
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.status
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    pool = ConnectionPool(connect, **kwargs)
+    pool.open()
+    return pool, created
+
+
+def test_connections_are_reused():
+    pool, created = make_pool(min_size=1, max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert len(created) == 1
+    assert pool.stats()["checkouts"] == 2
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(min_size=0, max_size=1, timeout=0.05)
+    conn = pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    pool.putconn(conn)
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiter_gets_returned_connection():
+    pool, _ = make_pool(min_size=0, max_size=1, timeout=2)
+    conn = pool.getconn()
+    got = []
+    t = threading.Thread(target=lambda: got.append(pool.getconn()))
+    t.start()
+    pool.putconn(conn)
+    t.join()
+    assert got == [conn]
+    assert pool.stats()["in_use"] == 1
+
+
+def test_open_transaction_rolled_back_on_return():
+    pool, _ = make_pool(min_size=1, max_size=1)
+    with pool.connection() as conn:
+        conn.status = extensions.TRANSACTION_STATUS_INTRANS
+    assert conn.rollbacks == 1
+
+
+def test_stale_connection_replaced():
+    pool, created = make_pool(min_size=1, max_size=1, check_after=0)
+    created[0].broken = True
+    with pool.connection() as conn:
+        assert conn is not created[0]
+    assert created[0].closed
+    assert pool.stats()["discarded"] == 1
+    assert pool.stats()["size"] == 1
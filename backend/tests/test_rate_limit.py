@@ -0,0 +1,62 @@
+import jwt
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from app.rate_limit import RateLimiter, RateLimitMiddleware, client_id, parse_rules
+from app.security import ALGORITHM, JWT_SECRET
+
+
+def test_rules_and_token_bucket_refill():
+    rules = parse_rules("/images/=1/10, /images/proxy/=50/500,/weather=2")
+    assert [r[0] for r in rules] == ["/images/proxy/", "/images/", "/weather"]
+    limiter = RateLimiter(rules)
+    assert limiter.rule_for("/images/proxy/3/1")[0] == "/images/proxy/"
+    assert limiter.rule_for("/attractions/France") is None
+
+    weather = limiter.rule_for("/weather/")
+    assert [limiter.acquire(weather, "ip:a", now=100.0) for _ in range(2)] == [0.0, 0.0]
+    assert limiter.acquire(weather, "ip:a", now=100.0) == 0.5  # empty; 2 tokens/s
+    assert limiter.acquire(weather, "ip:b", now=100.0) == 0.0  # other clients have their own bucket
+    assert limiter.acquire(weather, "ip:a", now=100.6) == 0.0
+    assert limiter.stats()["rules"][2] == {"prefix": "/weather", "rate": 2.0, "burst": 2.0, "allowed": 4, "limited": 1,
+                                           "refunded": 0}
+
+
+def test_middleware_answers_429_with_retry_after():
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=RateLimiter(parse_rules("/images/=0.5/2")))
+
+    @app.get("/images/{query}")
+    def images(query: str):
+        return {"query": query}
+
+    @app.get("/attractions/")
+    def attractions():
+        return {}
+
+    client = TestClient(app)
+    statuses = [client.get("/images/paris").status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    limited = client.get("/images/paris")
+    assert limited.headers["retry-after"] == "2" and "Too many requests" in limited.json()["detail"]
+    assert all(client.get("/attractions/").status_code == 200 for _ in range(5))  # no rule, no limit
+
+    token = jwt.encode({"user_id": 7}, JWT_SECRET, algorithm=ALGORITHM)
+    assert client_id({"headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("10.0.0.1", 1)}) == "user:7"
+    assert client_id({"headers": [(b"authorization", b"Bearer junk")], "client": ("10.0.0.1", 1)}) == "ip:10.0.0.1"
+    assert client.get("/images/paris", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+
+def test_cache_hits_give_their_token_back():
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=RateLimiter(parse_rules("/images/proxy/=0.5/2")))
+
+    @app.get("/images/proxy/{n}")
+    def proxy(n: int):
+        return Response(b"jpeg", media_type="image/jpeg", headers={"X-Cache": "hit" if n == 1 else "miss"})
+
+    client = TestClient(app)
+    # A page full of already-cached thumbnails never runs the bucket dry...
+    assert all(client.get("/images/proxy/1").status_code == 200 for _ in range(20))
+    # ...while origin fetches still do
+    assert [client.get("/images/proxy/2").status_code for _ in range(3)] == [200, 200, 429]
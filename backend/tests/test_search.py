@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from app import attractions, database
+from app.attractions import prefix_tsquery, search_terms
+from app.migrations import run_migrations
+
+# A throwaway database; see test_migrations
+SCRATCH_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def test_query_terms_and_prefix_tsquery():
+    terms = search_terms("Eiffel  tow!! & 'x' | (y)")
+    assert terms == ["eiffel", "tow", "x", "y"]
+    # Only the word being typed is a prefix; operators in user input can't reach to_tsquery
+    assert prefix_tsquery(terms) == "eiffel & tow & x & y:*"
+    assert search_terms("__ --") == []
+
+
+@pytest.mark.skipif(not SCRATCH_URL, reason="set TEST_DATABASE_URL to a throwaway database")
+def test_capped_ranking_pages_the_same_candidates(monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_URL", SCRATCH_URL)
+    run_migrations()
+    conn = database.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO attractions (country, name, lat, lng, description)
+        SELECT 'Zedland', 'Museum ' || g, 1, 2, repeat('museum ', g % 5 + 1) FROM generate_series(1, 30) g
+        ON CONFLICT DO NOTHING;
+    """)
+    conn.commit()
+    try:
+        monkeypatch.setattr(attractions, "SEARCH_RANK_CANDIDATES", 10)
+        pages = [attractions.search_attractions("museum", "Zedland", 4, offset) for offset in (0, 4, 8)]
+        ids = [r["id"] for results, _, _ in pages for r in results]
+        assert len(ids) == len(set(ids)) == 10  # no overlap or gaps between pages
+        assert all(truncated for _, _, truncated in pages)
+
+        monkeypatch.setattr(attractions, "SEARCH_RANK_CANDIDATES", 100)
+        assert attractions.search_attractions("museum", "Zedland", 4, 0)[2] is False
+    finally:
+        cur.execute("DELETE FROM attractions WHERE country = 'Zedland';")
+        conn.commit()
+        conn.close()
@@ -0,0 +1,38 @@
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from app import security
+
+
+def _token(user_id=1, exp_in=60):
+    return jwt.encode({"user_id": user_id, "exp": time.time() + exp_in}, security.JWT_SECRET, algorithm=security.ALGORITHM)
+
+
+def test_verified_tokens_are_cached_until_expiry():
+    security.token_cache.clear()
+    token = _token(exp_in=1)
+    before = security.auth_stats()["verifications"]
+    assert security.get_current_user(f"Bearer {token}") == 1
+    assert security.get_current_user(f"Bearer {token}") == 1
+    assert security.auth_stats()["verifications"] == before + 1
+
+    time.sleep(1.1)
+    with pytest.raises(HTTPException, match="Token expired"):
+        security.verify_token(token)
+
+
+def test_revoked_and_forged_tokens_are_rejected():
+    token = _token(user_id=2)
+    assert security.verify_token(token)["user_id"] == 2
+    security.revoke_token(token)
+    with pytest.raises(HTTPException, match="revoked"):
+        security.verify_token(token)
+
+    forged = jwt.encode({"user_id": 3}, "not-the-secret", algorithm="HS256")
+    with pytest.raises(HTTPException, match="Invalid token"):
+        security.verify_token(forged)
+    with pytest.raises(HTTPException):
+        security.get_current_user(forged)
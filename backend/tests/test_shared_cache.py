@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app.shared_cache import RedisBackend, SQLiteBackend, SharedCache
+
+
+def _two_workers(make_backend):
+    """Two "workers": separate local LRUs and backend handles on one shared store."""
+    first, second = make_backend(), make_backend()
+    return (SharedCache("attractions", ttl=60, backend=first), SharedCache("attractions", ttl=60, backend=second),
+            second.subscribe())
+
+
+def _check_sharing_and_invalidation(worker_a, worker_b, subscription):
+    worker_a.set("France:0", {"attractions": ["Louvre"]})
+    worker_a.set("Spain:0", {"attractions": ["Alhambra"]})
+
+    assert worker_b.get("France:0") == {"attractions": ["Louvre"]}  # from the shared level
+    assert worker_b.get("France:0") == {"attractions": ["Louvre"]}  # now local
+    levels = worker_b.stats()["levels"]
+    assert (levels["local"]["hits"], levels["shared"]["hits"]) == (1, 1)
+
+    worker_a.invalidate("France:")
+    # B still holds a local copy until the message arrives
+    assert worker_b.local.get("attractions:France:0") is not None
+    for prefix in subscription.poll(1):
+        worker_b.evict_local(prefix)
+    assert worker_b.get("France:0") is None
+    assert worker_b.get("Spain:0") == {"attractions": ["Alhambra"]}
+
+
+def test_sqlite_backend_shares_entries_and_invalidations(tmp_path):
+    path = str(tmp_path / "cache.db")
+    _check_sharing_and_invalidation(*_two_workers(lambda: SQLiteBackend(path)))
+
+
+def test_redis_backend_with_stand_in_server():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    _check_sharing_and_invalidation(*_two_workers(lambda: RedisBackend(fakeredis.FakeRedis(server=server))))
+
+
+def test_async_api_and_backend_failures_degrade_to_local(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"))
+    cache = SharedCache("weather", ttl=60, backend=backend)
+
+    async def main():
+        await cache.aset_many([((48.9, 2.3), {"temperature": 12}, None), ((1.0, 2.0), {"temperature": 30}, 0)])
+        return await cache.aget_many([(48.9, 2.3), (1.0, 2.0)])
+
+    assert asyncio.run(main()) == {(48.9, 2.3): {"temperature": 12}}  # ttl 0 is not stored
+
+    backend.close()
+    backend.get_many = lambda keys: (_ for _ in ()).throw(OSError("backend down"))
+    assert cache.get("missing") is None
+    assert cache.stats()["levels"]["shared"]["errors"] == 1
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from app import http_client, location, snapshot, weather
+
+COUNTRY = {"name": {"common": "Peru"}, "capital": ["Lima"], "latlng": [-10.0, -76.0], "region": "Americas"}
+
+
+def run_snapshot(monkeypatch, handler, attractions_delay):
+    def fake_page(country_name, after, limit):
+        time.sleep(attractions_delay)
+        return [{"id": 1, "name": "Machu Picchu"}], None
+
+    monkeypatch.setattr(snapshot, "fetch_attractions_page", fake_page)
+    monkeypatch.setattr(snapshot, "SNAPSHOT_ATTRACTIONS_TIMEOUT", 0.5)
+    location.country_cache.clear()
+    weather.weather_cache.clear()
+
+    async def main():
+        http_client.init_http_client(transport=httpx.MockTransport(handler))
+        try:
+            started = time.perf_counter()
+            response = await snapshot.get_snapshot("Peru", limit=10)
+            return json.loads(response.body), time.perf_counter() - started
+        finally:
+            await http_client.close_http_client()
+
+    return asyncio.run(main())
+
+
+def test_sources_run_concurrently(monkeypatch):
+    async def handler(request):
+        await asyncio.sleep(0.1)
+        if "restcountries" in request.url.host:
+            return httpx.Response(200, json=[COUNTRY])
+        return httpx.Response(200, json={"current_weather": {"temperature": 18.0, "time": "2030-01-01T00:00", "interval": 900}})
+
+    body, elapsed = run_snapshot(monkeypatch, handler, attractions_delay=0.2)
+    assert body["location"]["capital"] == "Lima"
+    assert body["weather"]["temperature"] == 18.0
+    assert body["attractions"] == [{"id": 1, "name": "Machu Picchu"}]
+    assert body["errors"] == {}
+    # country (0.1) -> weather (0.1) alongside attractions (0.2), not 0.4 in sequence
+    assert elapsed < 0.35
+
+
+def test_failed_and_slow_sources_degrade(monkeypatch):
+    async def handler(request):
+        if "restcountries" in request.url.host:
+            return httpx.Response(200, json=[COUNTRY])
+        return httpx.Response(503)
+
+    body, elapsed = run_snapshot(monkeypatch, handler, attractions_delay=1.0)
+    assert body["location"]["name"] == "Peru"
+    assert body["weather"] is None and "weather" in body["errors"]
+    assert body["attractions"] == [] and body["errors"]["attractions"] == "Timed out"
+    assert elapsed < 0.9
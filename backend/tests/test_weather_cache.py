@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app import http_client, weather
+
+
+def current_weather(interval_start):
+    return {
+        "temperature": 20.0,
+        "windspeed": 5.0,
+        "winddirection": 90,
+        "weathercode": 0,
+        "time": time.strftime("%Y-%m-%dT%H:%M", time.gmtime(interval_start)),
+        "interval": 900,
+    }
+
+
+def run_with_upstream(handler, coro_fn):
+    async def main():
+        http_client.init_http_client(transport=httpx.MockTransport(handler))
+        try:
+            return await coro_fn()
+        finally:
+            await http_client.close_http_client()
+
+    weather.weather_cache.clear()
+    return asyncio.run(main())
+
+
+def test_concurrent_misses_in_one_cell_share_a_request():
+    calls = []
+
+    async def handler(request):
+        calls.append(dict(request.url.params))
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"current_weather": current_weather(time.time())})
+
+    async def scenario():
+        first = await asyncio.gather(
+            weather.fetch_current_weather(48.8566, 2.3722),
+            weather.fetch_current_weather(48.8812, 2.3688),
+            weather.fetch_current_weather(48.9099, 2.4101),
+        )
+        again = await weather.fetch_current_weather(48.9, 2.4)
+        return first, again
+
+    first, again = run_with_upstream(handler, scenario)
+    assert len(calls) == 1
+    assert calls[0]["latitude"] == "48.9" and calls[0]["longitude"] == "2.4"
+    assert first[0] is first[1] is first[2] is again
+
+
+def test_cache_expires_with_upstream_interval():
+    started = time.time() - 600
+    ttl = weather.seconds_until_next_interval(current_weather(started))
+    assert 240 <= ttl <= 300 + 60
+
+    stale = weather.seconds_until_next_interval(current_weather(time.time() - 3600))
+    assert stale == weather.WEATHER_MIN_TTL
+    assert weather.seconds_until_next_interval({}) == weather.WEATHER_FALLBACK_TTL
+
+
+def test_batch_dedupes_cells_and_reports_failures_per_point(monkeypatch):
+    monkeypatch.setattr(weather, "WEATHER_BATCH_CHUNK", 3)
+    monkeypatch.setitem(http_client.UPSTREAMS, "open_meteo", http_client.Upstream("open_meteo", retries=0))
+    calls = []
+
+    async def handler(request):
+        lats = request.url.params["latitude"].split(",")
+        calls.append(lats)
+        if "10.0" in lats:  # the upstream refuses the whole call over one location
+            return httpx.Response(400, json={"error": True, "reason": "Latitude must be in range"})
+        body = [{"current_weather": current_weather(time.time())} for _ in lats]
+        return httpx.Response(200, json=body if len(body) > 1 else body[0])
+
+    cells = [(1.0, 1.0), (2.0, 2.0), (1.0, 1.0), (10.0, 10.0), (3.0, 3.0), (4.0, 4.0)]
+    results = run_with_upstream(handler, lambda: weather.fetch_weather_cells(cells))
+
+    # 5 distinct cells in chunks of 3; the rejected chunk is retried in halves until the bad cell is alone
+    assert sorted(len(c) for c in calls) == [1, 1, 1, 2, 2, 3]
+    assert ["10.0"] in calls
+    assert isinstance(results[(10.0, 10.0)], HTTPException)
+    for cell in ((1.0, 1.0), (2.0, 2.0), (3.0, 3.0), (4.0, 4.0)):
+        assert results[cell]["temperature"] == 20.0  # neighbours of the bad point are unaffected
+
+
+def test_out_of_range_points_are_refused():
+    with pytest.raises(ValidationError):
+        weather.WeatherBatchRequest(points=[{"lat": 48.8, "lng": 2.3}, {"lat": 91, "lng": 0}])
+    with pytest.raises(ValidationError):
+        weather.Coordinate(lat=float("nan"), lng=0)
+
+
+def test_cancelled_caller_does_not_fail_others_waiting_on_its_fetch():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url)
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, json={"current_weather": current_weather(time.time())})
+
+    async def scenario():
+        owner = asyncio.create_task(weather.fetch_current_weather(10.0, 20.0))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(weather.fetch_current_weather(10.0, 20.0))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        result = await waiter
+        return owner, result
+
+    owner, result = run_with_upstream(handler, scenario)
+    assert owner.cancelled()
+    assert result["temperature"] == 20.0
+    assert len(calls) == 1